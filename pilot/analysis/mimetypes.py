@@ -1,13 +1,26 @@
+import os
+import csv
 import logging
 import mimetypes
 import puremagic
-try:
-    import pandas as pd
-except ImportError:
-    pd = None
 
 log = logging.getLogger(__name__)
 
+# Each read_head or read_tail call returns at most this many bytes. This caps
+# single reads, not the total for a file: detect_type tries detectors in turn
+# and several of them read the file, and puremagic does its own small reads.
+# Files are identified by magic bytes, footers, or a small sample of text,
+# never by loading the whole dataset.
+MAX_SNIFF_BYTES = 2 ** 16
+
+PARQUET_MAGIC = b'PAR1'
+# Feather V2 is the Arrow IPC file format, V1 has its own magic
+ARROW_MAGIC = b'ARROW1'
+FEATHER_V1_MAGIC = b'FEA1'
+HDF5_SIGNATURE = b'\x89HDF\r\n\x1a\n'
+# The HDF5 superblock may start at any of these offsets
+HDF5_SIGNATURE_OFFSETS = [0, 512, 1024, 2048, 4096, 8192, 16384, 32768]
+
 
 def detect_type(url, functions=None):
     """This function mimics mimetypes.guess_type, but attempts to open the
@@ -22,6 +35,24 @@ def detect_type(url, functions=None):
             log.debug('Attempt to guess mimetype with {} failed'.format(name))
 
 
+def read_head(filename, num_bytes, offset=0):
+    """Read at most num_bytes starting at offset, capped by MAX_SNIFF_BYTES"""
+    num_bytes = min(num_bytes, MAX_SNIFF_BYTES)
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        return f.read(num_bytes)
+
+
+def read_tail(filename, num_bytes):
+    """Read at most the last num_bytes of a file, capped by MAX_SNIFF_BYTES
+    """
+    num_bytes = min(num_bytes, MAX_SNIFF_BYTES)
+    with open(filename, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - num_bytes, 0))
+        return f.read(num_bytes)
+
+
 def general_mimetype(url):
     mt, _ = mimetypes.guess_type(url, strict=True)
     return mt
@@ -32,38 +63,56 @@ def puremagic_mimetype(url):
 
 
 def detect_parquet(url):
-    if not pd.read_parquet(url).empty:
+    """Parquet files start and end with 'PAR1'"""
+    magic_len = len(PARQUET_MAGIC)
+    if (read_head(url, magic_len) == PARQUET_MAGIC and
+            read_tail(url, magic_len) == PARQUET_MAGIC):
         return 'application/x-parquet'
 
 
 def detect_feather(url):
-    if not pd.read_feather(url).empty:
-        return 'application/x-feather'
+    """Feather files start and end with either 'ARROW1' (V2) or 'FEA1' (V1)
+    """
+    for magic in [ARROW_MAGIC, FEATHER_V1_MAGIC]:
+        if (read_head(url, len(magic)) == magic and
+                read_tail(url, len(magic)) == magic):
+            return 'application/x-feather'
 
 
 def detect_hdf(url):
-    store = pd.HDFStore(url, 'r')
-    keys = store.keys()
-    store.close()
-    if len(keys) > 0:
-        return 'application/x-hdf'
+    """HDF5 files have an 8 byte signature at the start of the superblock"""
+    for offset in HDF5_SIGNATURE_OFFSETS:
+        sig = read_head(url, len(HDF5_SIGNATURE), offset=offset)
+        if len(sig) < len(HDF5_SIGNATURE):
+            return None
+        if sig == HDF5_SIGNATURE:
+            return 'application/x-hdf'
 
 
 def detect_delimiter_separated_values(filename):
-    """Attempts to check for csv or tsv mimetypes"""
-    df = pd.read_csv(filename)
-    if len(df.columns) > 1:
+    """Attempts to check for csv or tsv mimetypes by sniffing the delimiter
+    of a sample from the start of the file."""
+    sample = read_head(filename, MAX_SNIFF_BYTES)
+    if len(sample) == MAX_SNIFF_BYTES:
+        # Drop the last partial line, it may be cut off mid-character
+        sample = sample[:sample.rfind(b'\n') + 1]
+    text = sample.decode('utf-8')
+    if not text.strip():
+        return None
+    dialect = csv.Sniffer().sniff(text, delimiters=',\t')
+    header = next(csv.reader(text.splitlines(), dialect))
+    if len(header) < 2:
+        return None
+    if dialect.delimiter == ',':
         return 'text/csv'
-    if len(df.columns) == 1:
-        if df.columns[0].count('\t') >= 1:
-            return 'text/tab-separated-values'
+    if dialect.delimiter == '\t':
+        return 'text/tab-separated-values'
 
 
 def get_text_or_binary(filename):
     """Read the first 1024 and attempt to decode it in utf-8. If this succeeds,
     the file is determined to be text. If not, its binary."""
-    with open(filename, 'rb') as f:
-        chunk = f.read(1024)
+    chunk = read_head(filename, 1024)
     try:
         chunk.decode('utf-8')
         return 'text/plain'
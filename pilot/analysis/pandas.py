@@ -1,9 +1,19 @@
+import os
+import csv
 import logging
+import itertools
 import pandas as pd
 import numpy
 import tableschema
 import tabulator.exceptions
 
+from pilot.analysis import streaming
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 
 log = logging.getLogger(__name__)
 
@@ -26,21 +36,196 @@ TSV_LABELS = {
     'reference': 'Link to resource definition'
 }
 
+# Csv and tsv files this size or larger are analyzed in chunks, instead of
+# being loaded into memory all at once.
+CHUNKED_ANALYSIS_MIN_BYTES = 2 ** 28
+# Only this many columns are included in field definitions
+MAX_FIELD_DEFINITIONS = 10
+# Parquet row groups are decoded to compute mean, std, percentiles and top
+# values until this many (uncompressed) bytes have been sampled.
+PARQUET_SAMPLE_BYTES = 2 ** 26
+
+
+class DelimitedFile:
+    """
+    A handle on a csv or tsv file which is shared by each step of analysis.
+    The file is parsed by pandas at most once, and the head of the file is
+    read at most once for both the preview byte count and tableschema type
+    inference.
+    """
+    PREVIEW_ROWS = 11
+    # Tableschema infers types from the header plus this many rows
+    INFER_ROWS = 100
+    # Rows read at a time when the file is streamed in chunks
+    CHUNKSIZE = 100000
+
+    def __init__(self, filename, sep=','):
+        self.filename = filename
+        self.sep = sep
+        self._dataframe = None
+        self._head_lines = None
+
+    @property
+    def dataframe(self):
+        if self._dataframe is None:
+            self._dataframe = pd.read_csv(self.filename, sep=self.sep)
+        return self._dataframe
+
+    def iter_chunks(self, chunksize=None, usecols=None):
+        """Read the file one dataframe of chunksize rows at a time"""
+        with pd.read_csv(self.filename, sep=self.sep,
+                         chunksize=chunksize or self.CHUNKSIZE,
+                         usecols=usecols) as reader:
+            yield from reader
+
+    @property
+    def head_lines(self):
+        """The header and first rows of the file as raw lines"""
+        if self._head_lines is None:
+            num_lines = max(self.PREVIEW_ROWS, self.INFER_ROWS + 1)
+            with open(self.filename) as fp:
+                self._head_lines = list(itertools.islice(fp, num_lines))
+        return self._head_lines
+
+    def get_preview_byte_count(self, num_rows=PREVIEW_ROWS):
+        return sum(len(line) for line in self.head_lines[:num_rows])
+
+    def get_sample_rows(self):
+        """The header and first rows, split into fields"""
+        return list(csv.reader(self.head_lines, delimiter=self.sep))
+
 
 def analyze_tsv(filename):
-    metadata = analyze(pd.read_csv(filename, sep='\t'))
-    metadata = add_extended_metadata(filename, metadata)
-    return metadata
+    return analyze_delimited(DelimitedFile(filename, sep='\t'))
 
 
 def analyze_csv(filename):
-    metadata = analyze(pd.read_csv(filename))
-    metadata = add_extended_metadata(filename, metadata)
+    return analyze_delimited(DelimitedFile(filename, sep=','))
+
+
+def analyze_delimited(delimited_file, chunked=None):
+    """Analyze a csv or tsv. Files of CHUNKED_ANALYSIS_MIN_BYTES or larger
+    are streamed in chunks unless ``chunked`` is explicitly set."""
+    if chunked is None:
+        chunked = (os.path.getsize(delimited_file.filename) >=
+                   CHUNKED_ANALYSIS_MIN_BYTES)
+    if chunked:
+        metadata = analyze_chunked(delimited_file)
+    else:
+        metadata = analyze(delimited_file.dataframe)
+    metadata = add_extended_metadata(delimited_file, metadata)
     return metadata
 
 
-def analyze_parquet(filename):
-    return analyze(pd.read_parquet(filename))
+def analyze_parquet(filename, sample_bytes=None):
+    """Analyze a parquet file using the row counts and column statistics in
+    its footer, which gives numrows, numcols, and the count, min and max of
+    each column without reading any data. Row groups spread evenly through
+    the file are then decoded, up to ``sample_bytes`` (PARQUET_SAMPLE_BYTES
+    by default), for mean, std, percentiles and top values. Small files are
+    sampled entirely. Pass sample_bytes=0 to only read the footer."""
+    if pyarrow is None:
+        return analyze(pd.read_parquet(filename))
+    sample_bytes = (PARQUET_SAMPLE_BYTES if sample_bytes is None
+                    else sample_bytes)
+    parquet_file = pyarrow.parquet.ParquetFile(filename)
+    metadata = parquet_file.metadata
+    schema = parquet_file.schema_arrow
+    pandas_meta = schema.pandas_metadata or {}
+    index_columns = [c for c in pandas_meta.get('index_columns', [])
+                     if isinstance(c, str)]
+    fields = [f for f in schema if f.name not in index_columns]
+    columns = [f.name for f in fields[:MAX_FIELD_DEFINITIONS]]
+
+    accumulators = {c: streaming.ColumnAccumulator(c) for c in columns}
+    for row_group in get_parquet_sample_row_groups(metadata, sample_bytes):
+        chunk = parquet_file.read_row_group(row_group, columns=columns)
+        chunk = chunk.to_pandas()
+        for name, accumulator in accumulators.items():
+            accumulator.update(chunk[name])
+
+    column_metadata = []
+    for field in fields[:MAX_FIELD_DEFINITIONS]:
+        is_numeric = (pyarrow.types.is_integer(field.type) or
+                      pyarrow.types.is_floating(field.type))
+        accumulator = accumulators[field.name]
+        stats = accumulator.describe().to_dict() if accumulator.kinds else {}
+        footer_stats = get_parquet_column_statistics(metadata, field.name)
+        if not is_numeric:
+            footer_stats.pop('min', None)
+            footer_stats.pop('max', None)
+            sampled = accumulator.categorical.count
+            if 'count' in footer_stats and sampled and 'freq' in stats:
+                # Scale the top value frequency up to the whole file
+                stats['freq'] = round(stats['freq'] * footer_stats['count'] /
+                                      sampled)
+        stats.update(footer_stats)
+        pandas_info = pd.Series(stats,
+                                dtype='float64' if is_numeric else object)
+        df_metadata = {'name': field.name}
+        df_metadata.update(get_pandas_field_metadata(
+            {field.name: pandas_info}, field.name))
+        column_metadata.append(df_metadata)
+
+    return {
+        'name': 'Data Dictionary',
+        'numrows': metadata.num_rows,
+        'numcols': len(fields),
+        'field_definitions': column_metadata,
+        'labels': TSV_LABELS
+    }
+
+
+def get_parquet_sample_row_groups(metadata, sample_bytes):
+    """Pick row groups spaced evenly through a parquet file, totaling no more
+    than sample_bytes."""
+    num_groups = metadata.num_row_groups
+    sizes = [metadata.row_group(i).total_byte_size for i in range(num_groups)]
+    if not num_groups or not sum(sizes):
+        return []
+    num_samples = min(num_groups, sample_bytes * num_groups // sum(sizes))
+    candidates = numpy.unique(
+        numpy.linspace(0, num_groups - 1, num_samples).round().astype(int))
+    row_groups, total = [], 0
+    for row_group in candidates:
+        if total + sizes[row_group] > sample_bytes:
+            break
+        total += sizes[row_group]
+        row_groups.append(int(row_group))
+    return row_groups
+
+
+def get_parquet_column_statistics(metadata, column_name):
+    """Combine the statistics of a top level column from every row group in
+    a parquet footer. Returns a dict with count, min and max, leaving out any
+    of those not recorded in every row group."""
+    leaf_paths = [metadata.schema.column(i).path
+                  for i in range(metadata.num_columns)]
+    if column_name not in leaf_paths:
+        # Nested columns have no statistics of their own
+        return {}
+    column_index = leaf_paths.index(column_name)
+    count, vmin, vmax = 0, [], []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        stats = row_group.column(column_index).statistics
+        if stats is None:
+            return {}
+        if count is not None and stats.has_null_count:
+            count += row_group.num_rows - stats.null_count
+        else:
+            count = None
+        if vmin is not None and stats.has_min_max:
+            vmin.append(stats.min)
+            vmax.append(stats.max)
+        else:
+            vmin = vmax = None
+    footer_stats = {}
+    if count is not None:
+        footer_stats['count'] = count
+    if vmin:
+        footer_stats.update({'min': min(vmin), 'max': max(vmax)})
+    return footer_stats
 
 
 def analyze_feather(filename):
@@ -75,7 +260,7 @@ def analyze(pd_dataframe):
     pandas_info = pd_dataframe.describe(include='all')
 
     column_metadata = []
-    for column in pd_dataframe.columns.tolist()[:10]:
+    for column in pd_dataframe.columns.tolist()[:MAX_FIELD_DEFINITIONS]:
         # df_metadata = column.copy()
         # col_name = column['name']
         df_metadata = {'name': column}
@@ -93,14 +278,53 @@ def analyze(pd_dataframe):
     return dataframe_metadata
 
 
+def analyze_chunked(delimited_file, chunksize=None):
+    """Produce the same metadata as analyze(), but stream the file in chunks
+    so memory use stays bounded regardless of file size. Count, mean, std,
+    min and max are exact. Percentiles, unique values and the top common
+    value and its frequency are estimated for large files. See
+    pilot.analysis.streaming for details."""
+    header = delimited_file.get_sample_rows()[0]
+    columns = header[:MAX_FIELD_DEFINITIONS]
+    accumulators = [streaming.ColumnAccumulator(c) for c in columns]
+    numrows = 0
+    for chunk in delimited_file.iter_chunks(chunksize, usecols=columns):
+        numrows += len(chunk.index)
+        for accumulator in accumulators:
+            accumulator.update(chunk[accumulator.name])
+
+    column_metadata = []
+    for accumulator in accumulators:
+        pandas_info = {accumulator.name: accumulator.describe()}
+        df_metadata = {'name': accumulator.name}
+        df_metadata.update(get_pandas_field_metadata(pandas_info,
+                                                     accumulator.name))
+        column_metadata.append(df_metadata)
+
+    return {
+        'name': 'Data Dictionary',
+        'numrows': numrows,
+        'numcols': len(header),
+        'field_definitions': column_metadata,
+        'labels': TSV_LABELS
+    }
+
+
 def add_extended_metadata(filename, metadata):
     """Update the given metadata dict with additional tableschema metadata.
     This is only available for files that can be read by tableschema, which are
     only tsvs and csvs. Tableschema doesn't add much, but it could be handy
-    if it can detect extended types like locations."""
-    metadata['previewbytes'] = get_preview_byte_count(filename)
+    if it can detect extended types like locations. ``filename`` may also be
+    a DelimitedFile, in which case its sampled rows are re-used."""
+    if isinstance(filename, DelimitedFile):
+        delimited_file = filename
+    else:
+        delimited_file = DelimitedFile(filename)
+    metadata['previewbytes'] = delimited_file.get_preview_byte_count()
     try:
-        ts_info = tableschema.Schema(tableschema.infer(filename)).descriptor
+        inferred = tableschema.infer(delimited_file.get_sample_rows(),
+                                     limit=delimited_file.INFER_ROWS)
+        ts_info = tableschema.Schema(inferred).descriptor
 
         new_field_definitions = []
         for m, ts in zip(metadata['field_definitions'], ts_info['fields']):
@@ -115,8 +339,7 @@ def add_extended_metadata(filename, metadata):
 def get_preview_byte_count(filename, num_rows=11):
     """Count and return number of bytes for the first 11 rows in the given
     filename. Useful for preview."""
-    with open(filename) as fp:
-        return sum([len(fp.readline()) for x in range(num_rows)])
+    return DelimitedFile(filename).get_preview_byte_count(num_rows)
 
 
 def get_pandas_field_metadata(pandas_col_metadata, field_name):
@@ -133,7 +356,7 @@ def get_pandas_field_metadata(pandas_col_metadata, field_name):
     metadata = {
         'name': field_name,
         'type': 'string' if str(pmeta.dtype) == 'object' else str(pmeta.dtype),
-        'count': int(pmeta['count']),
+        'count': pmeta.get('count', numpy.nan),
         'top': pmeta.get('top', numpy.nan),
 
         # string statistics
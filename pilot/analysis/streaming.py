@@ -0,0 +1,298 @@
+"""
+Mergeable accumulators for computing column statistics over a dataframe one
+chunk at a time. Each accumulator uses a fixed amount of memory regardless of
+how many rows are fed into it, and two accumulators built over different
+chunks can be merged into one.
+
+Exact statistics are kept for count, mean, standard deviation (Welford/Chan),
+min and max. Quantiles come from a KLL sketch, the number of unique values
+from a HyperLogLog and the most common value from a Count-Min sketch.
+"""
+import math
+import numpy
+import pandas as pd
+
+NUMERIC_KINDS = 'iuf'
+
+
+def hash_values(series):
+    """Return a uint64 hash for each value in a pandas series. Numbers are
+    hashed as they are, anything else by its string representation."""
+    if series.dtype.kind not in NUMERIC_KINDS:
+        series = series.astype(str)
+    return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+
+def bit_length(values):
+    """Vectorized int.bit_length() for an array of uint64 values"""
+    values = values.astype(numpy.uint64)
+    high = (values >> numpy.uint64(32)).astype(numpy.float64)
+    low = (values & numpy.uint64(0xFFFFFFFF)).astype(numpy.float64)
+    # frexp returns the exponent e where x = m * 2**e and 0.5 <= m < 1, which
+    # for a positive integer is its bit length. Exact for 32 bit values.
+    return numpy.where(high > 0, numpy.frexp(high)[1] + 32,
+                       numpy.frexp(low)[1])
+
+
+class KLLSketch:
+    """A KLL quantile sketch. Keeps roughly 3 * k values no matter how many
+    are added. Quantiles are exact until more than k values are added."""
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.compactors = [numpy.empty(0)]
+        # Fixed seed, so analyzing the same file produces the same metadata
+        self.rng = numpy.random.default_rng(seed)
+
+    def capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def update(self, values):
+        values = numpy.asarray(values, dtype=numpy.float64)
+        self.compactors[0] = numpy.concatenate([self.compactors[0], values])
+        self.compress()
+
+    def compress(self):
+        level = 0
+        while level < len(self.compactors):
+            if len(self.compactors[level]) >= self.capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(numpy.empty(0))
+                items = numpy.sort(self.compactors[level])
+                keep = items[len(items) - len(items) % 2:]
+                offset = self.rng.integers(2)
+                promoted = items[offset:len(items) - len(keep):2]
+                self.compactors[level] = keep
+                self.compactors[level + 1] = numpy.concatenate(
+                    [self.compactors[level + 1], promoted])
+                # Capacities shift when a level is added, start over
+                level = 0
+                continue
+            level += 1
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(numpy.empty(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = numpy.concatenate(
+                [self.compactors[level], items])
+        self.compress()
+
+    def quantile(self, q):
+        if len(self.compactors) == 1:
+            if not len(self.compactors[0]):
+                return numpy.nan
+            # Nothing has been compacted, answer exactly like pandas does
+            return float(numpy.quantile(self.compactors[0], q))
+        values = numpy.concatenate(self.compactors)
+        weights = numpy.concatenate([numpy.full(len(c), 2 ** level)
+                                     for level, c in
+                                     enumerate(self.compactors)])
+        order = numpy.argsort(values)
+        cumulative = numpy.cumsum(weights[order])
+        idx = numpy.searchsorted(cumulative, q * cumulative[-1])
+        return float(values[order][min(idx, len(values) - 1)])
+
+
+class HyperLogLog:
+    """Estimates the number of distinct values using 2**p one byte
+    registers."""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = numpy.zeros(self.m, dtype=numpy.uint8)
+
+    def update_hashes(self, hashes):
+        p = numpy.uint64(self.p)
+        idx = (hashes >> numpy.uint64(64 - self.p)).astype(numpy.int64)
+        # Set a sentinel bit so the rank never exceeds 64 - p + 1
+        rest = (hashes << p) | numpy.uint64(1 << (self.p - 1))
+        rank = (65 - bit_length(rest)).astype(numpy.uint8)
+        numpy.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other):
+        numpy.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / numpy.sum(
+            numpy.power(2.0, -self.registers.astype(numpy.float64)))
+        zeros = int(numpy.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return self.m * math.log(self.m / zeros)
+        return raw
+
+
+class CountMinSketch:
+    """Estimates how often values occur, never under-counting."""
+
+    # Odd multipliers for deriving independent hashes for each row
+    MULTIPLIERS = [0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F,
+                   0x165667B19E3779F9, 0xD6E8FEB86659FD93]
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = numpy.zeros((depth, width), dtype=numpy.int64)
+
+    def indexes(self, hashes):
+        for row in range(self.depth):
+            mixed = hashes * numpy.uint64(self.MULTIPLIERS[row])
+            yield row, ((mixed >> numpy.uint64(32)) %
+                        numpy.uint64(self.width)).astype(numpy.int64)
+
+    def update_hashes(self, hashes, counts):
+        for row, idx in self.indexes(hashes):
+            numpy.add.at(self.table[row], idx, counts)
+
+    def estimate_hashes(self, hashes):
+        return numpy.min([self.table[row][idx]
+                          for row, idx in self.indexes(hashes)], axis=0)
+
+    def merge(self, other):
+        self.table += other.table
+
+
+class NumericAccumulator:
+    """Count, mean, standard deviation, min, max and quantiles of numbers"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = numpy.nan
+        self.max = numpy.nan
+        self.sketch = KLLSketch()
+
+    def update(self, values):
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if not len(values):
+            return
+        mean = values.mean()
+        self.combine(len(values), mean, float(((values - mean) ** 2).sum()),
+                     values.min(), values.max())
+        self.sketch.update(values)
+
+    def combine(self, count, mean, m2, vmin, vmax):
+        """Chan's parallel form of Welford's algorithm"""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = numpy.nanmin([self.min, vmin])
+        self.max = numpy.nanmax([self.max, vmax])
+
+    def merge(self, other):
+        if other.count:
+            self.combine(other.count, other.mean, other.m2, other.min,
+                         other.max)
+            self.sketch.merge(other.sketch)
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return numpy.nan
+        # Sample standard deviation, same as pandas
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+class CategoricalAccumulator:
+    """Count, approximate unique count and approximate most common value"""
+
+    def __init__(self, num_candidates=32):
+        self.count = 0
+        self.num_candidates = num_candidates
+        self.hll = HyperLogLog()
+        self.cms = CountMinSketch()
+        self.candidates = []
+
+    def update(self, series):
+        series = series.dropna()
+        if series.empty:
+            return
+        self.count += len(series)
+        counts = series.value_counts()
+        hashes = hash_values(counts.index.to_series())
+        self.hll.update_hashes(hashes)
+        self.cms.update_hashes(hashes, counts.to_numpy())
+        top = slice(0, self.num_candidates)
+        self.update_candidates(zip(hashes[top], counts.index[top]))
+
+    def update_candidates(self, new_candidates):
+        """Track the values most likely to be the most common. Candidates are
+        (hash, value) tuples."""
+        candidates = dict(self.candidates)
+        candidates.update(new_candidates)
+        hashes = numpy.fromiter(candidates.keys(), dtype=numpy.uint64)
+        estimates = self.cms.estimate_hashes(hashes)
+        ranked = sorted(zip(estimates, hashes), key=lambda c: -c[0])
+        self.candidates = [(h, candidates[h])
+                           for _, h in ranked[:self.num_candidates]]
+
+    def merge(self, other):
+        self.count += other.count
+        self.hll.merge(other.hll)
+        self.cms.merge(other.cms)
+        self.update_candidates(other.candidates)
+
+    @property
+    def unique(self):
+        return int(round(self.hll.estimate())) if self.count else numpy.nan
+
+    @property
+    def top(self):
+        return str(self.candidates[0][1]) if self.candidates else numpy.nan
+
+    @property
+    def frequency(self):
+        if not self.candidates:
+            return numpy.nan
+        top_hash = numpy.array([self.candidates[0][0]], dtype=numpy.uint64)
+        return int(self.cms.estimate_hashes(top_hash)[0])
+
+
+class ColumnAccumulator:
+    """Statistics for a single column, fed one pandas series at a time. The
+    column is treated as numeric until a chunk with non-numeric values is
+    seen, after which it is summarized like a string column."""
+
+    def __init__(self, name):
+        self.name = name
+        self.kinds = set()
+        self.numeric = NumericAccumulator()
+        self.categorical = CategoricalAccumulator()
+
+    def update(self, series):
+        self.kinds.add(series.dtype.kind)
+        if series.dtype.kind in NUMERIC_KINDS:
+            self.numeric.update(series.dropna().to_numpy())
+        self.categorical.update(series)
+
+    def merge(self, other):
+        self.kinds |= other.kinds
+        self.numeric.merge(other.numeric)
+        self.categorical.merge(other.categorical)
+
+    @property
+    def is_numeric(self):
+        return bool(self.kinds) and self.kinds <= set(NUMERIC_KINDS)
+
+    def describe(self):
+        """Returns a series in the same form as a column of pandas
+        describe()"""
+        if self.is_numeric:
+            num = self.numeric
+            return pd.Series({
+                'count': num.count, 'mean': num.mean, 'std': num.std,
+                'min': num.min, '25%': num.sketch.quantile(.25),
+                '50%': num.sketch.quantile(.5),
+                '75%': num.sketch.quantile(.75), 'max': num.max,
+            }, dtype='float64')
+        cat = self.categorical
+        return pd.Series({'count': cat.count, 'unique': cat.unique,
+                          'top': cat.top, 'freq': cat.frequency},
+                         dtype=object)
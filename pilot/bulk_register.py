@@ -0,0 +1,103 @@
+"""
+bulk_register.py reads manifests of dataframes to register with
+PilotClient.register_many(), and keeps a journal of which ones are done.
+The journal is an append-only file of JSON lines, flushed to disk as each
+item finishes, so a run which crashes or is interrupted can be started again
+and will skip everything it already registered.
+"""
+import os
+import csv
+import json
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+MANIFEST_FIELDS = ['dataframe', 'destination', 'metadata']
+
+
+def read_manifest(filename):
+    """
+    Read a CSV manifest with the columns 'dataframe', 'destination' and an
+    optional 'metadata', which is either a path to a JSON file or inline JSON.
+    Relative dataframe and metadata paths are relative to the manifest.
+    Returns a list of dicts, each with the keys in MANIFEST_FIELDS.
+    """
+    base_dir = os.path.dirname(os.path.abspath(filename))
+    rows = []
+    with open(filename, newline='') as fh:
+        for row in csv.DictReader(fh):
+            metadata = (row.get('metadata') or '').strip()
+            if metadata and not metadata.startswith('{'):
+                with open(os.path.join(base_dir, metadata)) as mfh:
+                    metadata = json.load(mfh)
+            elif metadata:
+                metadata = json.loads(metadata)
+            rows.append({
+                'dataframe': os.path.join(base_dir, row['dataframe']),
+                'destination': row.get('destination') or '',
+                'metadata': metadata or {},
+            })
+    return rows
+
+
+class RegisterJournal:
+    """
+    Records the outcome of each item registered by register_many(). Items
+    are identified by their dataframe and destination. States recorded as
+    COMPLETE_STATES are skipped on the next run, anything else is retried.
+    """
+    COMPLETE_STATES = ['ingested', 'unchanged']
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self._states = None
+
+    @staticmethod
+    def get_key(dataframe, destination):
+        return '{}\t{}'.format(os.path.abspath(dataframe), destination or '')
+
+    @property
+    def states(self):
+        if self._states is None:
+            self._states = {}
+            if os.path.exists(self.filename):
+                with open(self.filename) as fh:
+                    for line in fh:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A crash while writing leaves a partial last line
+                            log.debug('Skipping partial journal line {}'
+                                      ''.format(line))
+                            continue
+                        self._states[record['key']] = record
+        return self._states
+
+    def is_complete(self, dataframe, destination):
+        record = self.states.get(self.get_key(dataframe, destination))
+        return bool(record) and record['state'] in self.COMPLETE_STATES
+
+    def record(self, items):
+        """Save the state of report items from register_many(). Each item is
+        a dict with at least a 'dataframe', 'destination' and 'state'."""
+        records = []
+        for item in items:
+            key = self.get_key(item['dataframe'], item['destination'])
+            records.append(dict(key=key, state=item['state'],
+                                subject=item.get('subject'),
+                                error=item.get('error')))
+        with self.lock:
+            with open(self.filename, 'a+b') as fh:
+                if fh.tell():
+                    # Finish a partial line left by a crash before appending
+                    fh.seek(-1, os.SEEK_END)
+                    if fh.read(1) != b'\n':
+                        fh.write(b'\n')
+                for record in records:
+                    fh.write(json.dumps(record).encode('utf-8') + b'\n')
+                fh.flush()
+                os.fsync(fh.fileno())
+            for record in records:
+                self.states[record['key']] = record
@@ -4,10 +4,15 @@ import globus_sdk
 import urllib
 import logging
 import pathlib
+import itertools
+import threading
+import concurrent.futures
 from fair_research_login import NativeClient, LoadError, ScopesMismatch
 from pilot import (
     profile, config, globus_clients, exc, logging_cfg, context, search,
     transfer_log, search_discovery, project as project_module,
+    fingerprint_cache, search_ingest, search_mirror, bulk_register,
+    validation,
 )
 
 logging_cfg.setup_logging()
@@ -42,9 +47,15 @@ class PilotClient(NativeClient):
     *  :py:meth:`.ls`
     *  :py:meth:`.mkdir`
     *  :py:meth:`.get_search_entry`
+    *  :py:meth:`.search`
+    *  :py:meth:`.iter_search`
+    *  :py:meth:`.list_entries`
+    *  :py:meth:`.iter_entries`
     *  :py:meth:`.ingest`
     *  :py:meth:`.ingest_many`
     *  :py:meth:`.ingest_gmeta`
+    *  :py:meth:`.ingest_gmeta_many`
+    *  :py:meth:`.get_ingest_pipeline`
     *  :py:meth:`.delete_entry`
     *  :py:meth:`.upload`
     *  :py:meth:`.download`
@@ -86,6 +97,22 @@ class PilotClient(NativeClient):
     DEFAULT_CLIENT_ID = 'e4d82438-00df-4dbd-ab90-b6258933c335'
     DISALLOWED_FILENAME_SYMBOLS = '.*~$%'
     DEFAULT_CONFIG = '~/.pilot1.cfg'
+    FINGERPRINT_CACHE_SUFFIX = '-fingerprints.db'
+    SEARCH_MIRROR_SUFFIX = '-records.db'
+    TRANSFER_LOG_SUFFIX = '-transfers.db'
+    # Most files in a single transfer task when files are sent individually
+    MAX_TRANSFER_ITEMS = 10000
+    # Files uploaded at once by upload_http(). Kept below the default size of
+    # the connection pool in the shared session.
+    HTTP_UPLOAD_WORKERS = 4
+    # Task ids looked up per request when refreshing transfer statuses
+    TRANSFER_TASK_FILTER_SIZE = 100
+    # Seconds between status checks while waiting for a transfer to finish
+    TRANSFER_WAIT_INTERVAL = 10
+    SEARCH_PAGE_SIZE = 100
+    # Globus Search won't page by offset past this many results, larger
+    # result sets need to be scrolled.
+    SEARCH_MAX_OFFSET = 10000
 
     def __init__(self, config_file=DEFAULT_CONFIG, index_uuid=None):
         # Supplying config by Env is strongest and overrides all others
@@ -116,7 +143,7 @@ class PilotClient(NativeClient):
                          app_name=app_name)
         self.project = project_module.Project(config=self.config)
         self.profile = profile.Profile(config=self.config)
-        self.transfer_log = transfer_log.TransferLog(config=self.config)
+        self._transfer_log = None
 
     def login(self, *args, **kwargs):
         r"""
@@ -215,6 +242,45 @@ class PilotClient(NativeClient):
         return globus_clients.HTTPFileClient(authorizer=auth,
                                              base_url=base_url)
 
+    def get_fingerprint_cache(self):
+        """
+        Returns the local cache of file checksums and analysis, which is kept
+        alongside the config file. Returns None if pilot is running without
+        a config file.
+        """
+        if self.config_file is None:
+            return None
+        base, _ = os.path.splitext(self.config_file)
+        return fingerprint_cache.FingerprintCache(
+            base + self.FINGERPRINT_CACHE_SUFFIX)
+
+    def get_search_mirror(self):
+        """
+        Returns the local mirror of project search records, which is kept
+        alongside the config file. Returns None if pilot is running without
+        a config file. See sync_search_mirror().
+        """
+        if self.config_file is None:
+            return None
+        base, _ = os.path.splitext(self.config_file)
+        return search_mirror.SearchMirror(base + self.SEARCH_MIRROR_SUFFIX)
+
+    @property
+    def transfer_log(self):
+        """
+        The log of Globus Transfer tasks started by pilot, which is kept
+        alongside the config file. Logs are only kept in memory if pilot is
+        running without a config file.
+        """
+        if self._transfer_log is None:
+            filename = None
+            if self.config_file is not None:
+                base, _ = os.path.splitext(self.config_file)
+                filename = base + self.TRANSFER_LOG_SUFFIX
+            self._transfer_log = transfer_log.TransferLog(self.config,
+                                                          filename=filename)
+        return self._transfer_log
+
     def get_group(self, project=None):
         """
         Get the group for a given project.
@@ -611,21 +677,124 @@ class PilotClient(NativeClient):
         sc = self.get_search_client()
         project = project or self.project.current
         index = index or self.get_index(project=project)
-        search_data = {
+        search_data = self.get_search_data(project)
+        search_data.update(custom_params or {})
+        return sc.post_search(index, search_data).data
+
+    def get_search_data(self, project=None):
+        """The default search query for records in a project. See search()
+        """
+        return {
             'q': '*',
             'filters': {
                 'field_name': 'project_metadata.project-slug',
                 'type': 'match_all',
-                'values': [project],
+                'values': [project or self.project.current],
             },
-            'limit': 100,
+            'limit': self.SEARCH_PAGE_SIZE,
             'offset': 0,
             'result_format_version': '2017-09-01',
         }
-        search_data.update(custom_params or {})
-        return sc.post_search(index, search_data).data
 
-    def list_entries(self, path='', project=None, relative=True):
+    def iter_search(self, project=None, index=None, custom_params=None,
+                    page_size=SEARCH_PAGE_SIZE, prefetch=True):
+        """
+        Iterate over every search record in a project, instead of only the
+        first page returned by search(). Records are fetched one page at a
+        time, and with ``prefetch`` the next page is requested while the
+        current one is being consumed. Projects with more than
+        SEARCH_MAX_OFFSET records are scrolled instead of paged by offset.
+        **Parameters**
+        ``project`` (*string*)
+          The project to fetch records for. Defaults to current project
+        ``index`` (*string*)
+          The index to search. Defaults to the project index
+        ``custom_params`` (*dict*)
+          Same as search(), except 'limit' and 'offset' are set for each page
+        ``page_size`` (*int*)
+          Number of records to fetch per request
+        ``prefetch`` (*bool*)
+          Fetch the next page in the background
+        **Examples**
+        >>> for entry in pc.iter_search():
+        >>>     print(entry['subject'])
+        """
+        project = project or self.project.current
+        index = index or self.get_index(project=project)
+        params = dict(custom_params or {})
+
+        def fetch(offset):
+            limit = min(page_size, self.SEARCH_MAX_OFFSET - offset)
+            page_params = dict(params, limit=limit, offset=offset)
+            return self.search(project=project, index=index,
+                               custom_params=page_params)
+
+        page = fetch(0)
+        total = page.get('total')
+        if total is not None and total > self.SEARCH_MAX_OFFSET:
+            yield from self.iter_scroll(project=project, index=index,
+                                        custom_params=params,
+                                        page_size=page_size,
+                                        prefetch=prefetch)
+            return
+        offset = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            while page is not None:
+                entries = page.get('gmeta', [])
+                offset += len(entries)
+                if total is None:
+                    more = len(entries) >= page_size
+                else:
+                    more = bool(entries) and offset < total
+                next_page = None
+                if more and offset < self.SEARCH_MAX_OFFSET:
+                    next_page = pool.submit(fetch, offset) if prefetch else (
+                        lambda offset=offset: fetch(offset))
+                yield from entries
+                page = self._get_page(next_page)
+
+    def iter_scroll(self, project=None, index=None, custom_params=None,
+                    page_size=SEARCH_PAGE_SIZE, prefetch=True):
+        """
+        Iterate over every search record in a project using the Globus
+        Search scroll API, which has no limit on the number of results. See
+        iter_search() for parameters. Offsets and sorting are not supported
+        by scrolling.
+        """
+        sc = self.get_search_client()
+        project = project or self.project.current
+        index = index or self.get_index(project=project)
+        scroll_data = self.get_search_data(project)
+        scroll_data.update(custom_params or {})
+        scroll_data['limit'] = page_size
+        for unsupported in ['offset', 'sort', 'facets', 'boosts']:
+            scroll_data.pop(unsupported, None)
+
+        def fetch(marker):
+            return sc.scroll(index, scroll_data, marker=marker).data
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            page = fetch(None)
+            while page is not None:
+                next_page, marker = None, page.get('marker')
+                if page.get('has_next_page') and marker:
+                    next_page = pool.submit(fetch, marker) if prefetch else (
+                        lambda: fetch(marker))
+                yield from page.get('gmeta', [])
+                page = self._get_page(next_page)
+
+    @staticmethod
+    def _get_page(next_page):
+        """Get a page of results requested by iter_search() or iter_scroll()
+        which is either a future if prefetched, or a function to call."""
+        if next_page is None:
+            return None
+        if isinstance(next_page, concurrent.futures.Future):
+            return next_page.result()
+        return next_page()
+
+    def list_entries(self, path='', project=None, relative=True,
+                     cached=False):
         """Search for files in the given project that match the given path.
         Returns a list of Globus Search GMetaEntries for any matches it finds.
         Paths for files in multi-file collections will return no results,
@@ -640,22 +809,121 @@ class PilotClient(NativeClient):
         ``relative`` (*bool*)
           If True, prepends the path to the project. If False,
           does not prepend path but ensures it's in the project's directory
+        ``cached`` (*bool*)
+          List entries from the local search mirror instead of Globus Search.
+          See sync_search_mirror()
         **Examples**
         Fetch all results in this project:
         >>> pc.list_entries('')
         Fetch results in the 'foo' directory:
         >>> pc.list_entries('foo')
         """
+        return list(self.iter_entries(path, project=project,
+                                      relative=relative, cached=cached))
+
+    def iter_entries(self, path='', project=None, relative=True,
+                     cached=False):
+        """Same as list_entries(), but iterates over matching entries one
+        page of search results at a time so every record in a project can be
+        visited with constant memory."""
         project = project or self.project.current
-        raw = self.search(project=project)
         log.info('Fetching entry list for project {} path {}'.format(project,
                                                                      path))
         path = self.get_path(path, project=project, relative=relative)
-        return [ent for ent in raw['gmeta'] if path in ent.get('subject')]
+        if cached:
+            mirror = self.get_synced_search_mirror(project)
+            try:
+                yield from mirror.iter_entries(project, path)
+            finally:
+                mirror.close()
+            return
+        for ent in self.iter_search(project=project):
+            if path in ent.get('subject'):
+                yield ent
+
+    def sync_search_mirror(self, project=None, full=False):
+        """
+        Bring the local search mirror up to date with Globus Search. The
+        first sync for a project fetches every record. After that, records
+        created or updated since the newest one in the mirror are fetched
+        and compared with the mirror. If any of them are new or changed, or
+        the number of records in search no longer matches the mirror, a full
+        sync is done instead. A full sync compares every subject, so records
+        deleted from search are removed from the mirror even when others were
+        added at the same time.
+        Returns a summary dict with the 'project', number of records
+        'updated' and 'removed', whether the sync was 'full', and the
+        'total' number of records now in the mirror.
+        **Parameters**
+        ``project`` (*string*)
+          The project to sync. Defaults to current project
+        ``full`` (*bool*)
+          Fetch every record, even if the project was synced before
+        **Examples**
+        >>> pc.sync_search_mirror()
+        {'project': 'my-project', 'updated': 1204, 'removed': 1, 'full': True,
+         'total': 1204}
+        """
+        mirror = self.get_search_mirror()
+        if mirror is None:
+            raise exc.PilotClientException(
+                'The search mirror is not available without a config file')
+        project = project or self.project.current
+        started = time.time()
+        try:
+            last_sync = mirror.get_last_sync(project)
+            full = full or last_sync is None or last_sync[1] is None
+            removed = 0
+            if full:
+                updated = mirror.update(project, self.iter_search(project),
+                                        synced=started)
+                removed = mirror.prune(project, started)
+            else:
+                log.debug('Syncing records modified since {}'
+                          ''.format(last_sync[1]))
+                search_filters = [
+                    self.get_search_data(project)['filters'],
+                    {'type': 'range', 'field_name': 'dc.dates.date',
+                     'values': [{'from': last_sync[1], 'to': '*'}]},
+                ]
+                changed = [
+                    entry for entry in self.iter_search(
+                        project, custom_params={'filters': search_filters})
+                    if (mirror.get(entry['subject']) or {}).get('content') !=
+                    entry.get('content', [])
+                ]
+                total = self.search(project, custom_params={'limit': 1})
+                if changed or total.get('total') != mirror.count(project):
+                    # Counts can't show a record was deleted if another was
+                    # added, only comparing every subject can
+                    log.info('Records in {} changed, running a full sync'
+                             ''.format(project))
+                    mirror.close()
+                    return self.sync_search_mirror(project, full=True)
+                updated = 0
+            mirror.set_last_sync(project, started,
+                                 mirror.get_newest_modified(project))
+            return {'project': project, 'updated': updated,
+                    'removed': removed, 'full': full,
+                    'total': mirror.count(project)}
+        finally:
+            mirror.close()
+
+    def get_synced_search_mirror(self, project=None):
+        """Returns the search mirror, syncing the project first if it has
+        never been synced. Raises PilotClientException without a config
+        file."""
+        mirror = self.get_search_mirror()
+        if mirror is None:
+            raise exc.PilotClientException(
+                'The search mirror is not available without a config file')
+        if mirror.get_last_sync(project or self.project.current) is None:
+            self.sync_search_mirror(project)
+        return mirror
 
     def get_full_search_entry(self, path, project=None, relative=True,
                               path_is_sub=False, resolve_collections=True,
-                              precise=True):
+                              precise=True, cached=False):
         """
         Get a search entry for a given resource
         **Parameters**
@@ -680,6 +948,9 @@ class PilotClient(NativeClient):
           If precise=True and the path is my_dir/foo4.txt, None will be
           returned. If precise=False and the path is my_dir/foo4.txt, the
           "my_dir" record will still be returned.
+        ``cached`` (*bool*)
+          Look up the entry in the local search mirror instead of Globus
+          Search. See sync_search_mirror()
         **Examples**
         >>> pc.get_search_entry('foo.txt')
           {'dc': {'creators': [{'creatorName': 'NOAA'}],
@@ -694,24 +965,108 @@ class PilotClient(NativeClient):
             subject = path
         else:
             subject = self.get_subject_url(path, project, relative)
+        if cached:
+            return self.get_cached_search_entry(
+                subject, project=project,
+                resolve_collections=resolve_collections, precise=precise)
         try:
             query_params = dict(result_format_version='2017-09-01')
             return sc.get_subject(self.get_index(project), subject,
                                   query_params=query_params)
         except globus_sdk.SearchAPIError as sapie:
             if sapie.code == 'NotFound.Generic' and resolve_collections:
-                ent = search_discovery.get_sub_in_collection(
-                    subject, self.list_entries(), precise=precise
-                )
-                if ent:
-                    return ent
+                parent = self.get_parent_search_entry(subject, project=project)
+                if parent:
+                    return search_discovery.get_sub_in_collection(
+                        subject, [parent], precise=precise)
+
+    def get_search_entries(self, paths, project=None, relative=True,
+                           precise=True, cached=False):
+        """
+        Look up the search entries for many paths at once. Every record in
+        the project is listed once and indexed, instead of looking up each
+        path separately. Returns a dict of each path to its full search
+        entry, or None if it has no entry.
+        **Parameters**
+        ``paths`` (*list*)
+          Paths to local resources on this project
+        ``project`` (*string*)
+          The project to fetch info for. Defaults to current project
+        ``relative`` (*bool*)
+          If True, prepends the path to the project. If False,
+          does not prepend path but ensures it's in the project's directory
+        ``precise`` (*bool*)
+          Same as get_full_search_entry()
+        ``cached`` (*bool*)
+          List records from the local search mirror. See sync_search_mirror()
+        **Examples**
+        >>> pc.get_search_entries(['foo.txt', 'my_dir/bar.txt'])
+          {'foo.txt': {'subject': ...}, 'my_dir/bar.txt': None}
+        """
+        project = project or self.project.current
+        index = search_discovery.SubjectIndex(
+            self.iter_entries(project=project, cached=cached))
+        subjects = {p: self.get_subject_url(p, project, relative)
+                    for p in paths}
+        entries = index.get_subs(subjects.values(), precise=precise)
+        return {p: entries[sub] for p, sub in subjects.items()}
+
+    def get_cached_search_entry(self, subject, project=None,
+                                resolve_collections=True, precise=True):
+        """Same as get_full_search_entry(), but looks up the subject in the
+        local search mirror."""
+        mirror = self.get_synced_search_mirror(project)
+        try:
+            entry = mirror.get(subject)
+            if entry is None and resolve_collections:
+                parent = mirror.get_parent(subject)
+                if parent:
+                    entry = search_discovery.get_sub_in_collection(
+                        subject, [parent], precise=precise)
+            return entry
+        finally:
+            mirror.close()
+
+    def get_parent_search_entry(self, subject, project=None):
+        """
+        Get the search entry for the closest directory above the given
+        subject which has one, looking up each parent directory in turn up to
+        the base of the project. Returns None if there are no entries. This
+        is how files within multi-file entries are found, with one small
+        request per directory level no matter how large the project is.
+        **Parameters**
+        ``subject`` (*string*)
+          A subject within the project
+        ``project`` (*string*)
+          The project the subject belongs to. Defaults to current project
+        **Examples**
+        >>> pc.get_parent_search_entry(pc.get_subject_url('my_dir/foo.txt'))
+          {'subject': 'globus://<endpoint>/<project_path>/my_dir', ...}
+        """
+        sc = self.get_search_client()
+        project = project or self.project.current
+        index = self.get_index(project)
+        base = self.get_subject_url('', project=project).rstrip('/')
+        query_params = dict(result_format_version='2017-09-01')
+        directory = os.path.dirname(subject.rstrip('/'))
+        while directory.startswith(base):
+            try:
+                return sc.get_subject(index, directory,
+                                      query_params=query_params)
+            except globus_sdk.SearchAPIError as sapie:
+                if sapie.code != 'NotFound.Generic':
+                    raise
+            if os.path.dirname(directory) == directory:
+                break
+            directory = os.path.dirname(directory)
 
     def get_search_entry(self, path, project=None, relative=True,
                          path_is_sub=False, resolve_collections=True,
-                         precise=True):
+                         precise=True, cached=False):
         entry = self.get_full_search_entry(
             path, project=project, relative=relative, path_is_sub=path_is_sub,
-            resolve_collections=resolve_collections, precise=precise
+            resolve_collections=resolve_collections, precise=precise,
+            cached=cached
         )
         if entry:
             return entry['content'][0]
@@ -757,11 +1112,15 @@ class PilotClient(NativeClient):
         return self.ingest_gmeta(gmeta, index)
 
     def ingest_many(self, content_map, group=None, project=None, relative=True,
-                    index=None, dry_run=False, force=False):
+                    index=None, dry_run=False, force=False,
+                    max_batch_bytes=None, max_batch_entries=None,
+                    max_in_flight=None):
         """
         Ingest many entries into search, with paths to entries mapped to
-        content.
-        built-in schema.
+        content. Entries are split into batches which fit within Search's
+        size limits, and batches are ingested concurrently. If any batch
+        fails, the others are still ingested and pilot.exc.IngestFailed is
+        raised with a report for every batch.
         **Parameters**
         ``content_map`` (*dict {short_path: content}*)
           Path to a local resource on this project
@@ -781,6 +1140,12 @@ class PilotClient(NativeClient):
           configured for this project
         ``dry_run`` Do not actually ingest, but attempt to construct a gmeta
           entry and validate it.
+        ``max_batch_bytes`` (*int*) Largest size of a single batch, as json.
+          Defaults to pilot.search.MAX_INGEST_BYTES
+        ``max_batch_entries`` (*int*) Most entries in a single batch.
+          Defaults to pilot.search.MAX_INGEST_ENTRIES
+        ``max_in_flight`` (*int*) Most batches to ingest at the same time.
+          Defaults to IngestPipeline.DEFAULT_MAX_IN_FLIGHT
         **Examples**
         >>> content_map = {}
         >>> content_map['bar/foo.txt'] = pc.gather_metadata('foo.txt', 'bar')
@@ -799,7 +1164,24 @@ class PilotClient(NativeClient):
             log.info('{} entry ingest ABORTED due to dry run.'
                      ''.format(len(content_list)))
             return gmeta
-        return self.ingest_gmeta(gmeta, index)
+        batches = list(search.split_gmeta_list(
+            gmeta, max_bytes=max_batch_bytes or search.MAX_INGEST_BYTES,
+            max_entries=max_batch_entries or search.MAX_INGEST_ENTRIES))
+        log.debug('Ingesting {} entries in {} batches'
+                  ''.format(len(content_list), len(batches)))
+        report = self.ingest_gmeta_many(batches, index=index,
+                                        max_in_flight=max_in_flight)
+        for batch, batch_report in zip(batches, report):
+            batch_report['entries'] = len(batch['ingest_data']['gmeta'])
+        failed = [r for r in report if r['state'] != 'SUCCESS']
+        if failed:
+            errors = ['Batch {} ({} entries): {}'.format(
+                r['batch'], r['entries'], r['error']) for r in failed]
+            raise exc.IngestFailed(
+                '{}/{} ingest batches failed:\n{}'.format(
+                    len(failed), len(report), '\n'.join(errors)),
+                report=report)
+        return True
 
     def ingest_gmeta(self, gmeta, index=None):
         """
@@ -827,26 +1209,57 @@ class PilotClient(NativeClient):
         >>> pc.ingest_entry(gmeta)
         True
         """
-        sc = self.get_search_client()
+        with self.get_ingest_pipeline(index=index) as pipeline:
+            future = pipeline.submit(gmeta)
+        future.result()
+        return True
+
+    def ingest_gmeta_many(self, gmetas, index=None, max_in_flight=None):
+        """
+        Ingest many raw gmeta documents into search, with several ingest
+        tasks running at once. Unlike ingest_gmeta, a failed document does
+        not stop the others. Returns a report for each document in order,
+        see pilot.search_ingest.IngestPipeline.get_report().
+        **Parameters**
+        ``gmetas`` (*iterable of dicts*)
+          Documents in the same form as ingest_gmeta
+        ``index`` (*string*)
+          The index to ingest to. Defaults to configured current project index
+        ``max_in_flight`` (*int*)
+          The most ingest tasks to have submitted but unfinished at once.
+          Defaults to IngestPipeline.DEFAULT_MAX_IN_FLIGHT
+        **Examples**
+        >>> report = pc.ingest_gmeta_many([gmeta1, gmeta2])
+        >>> [r['state'] for r in report]
+        ['SUCCESS', 'SUCCESS']
+        """
+        max_in_flight = (max_in_flight or
+                         search_ingest.IngestPipeline.DEFAULT_MAX_IN_FLIGHT)
+        with self.get_ingest_pipeline(index=index,
+                                      max_in_flight=max_in_flight) as p:
+            for gmeta in gmetas:
+                p.submit(gmeta)
+        return p.get_report()
+
+    def get_ingest_pipeline(self, index=None, **kwargs):
+        """
+        Get a pilot.search_ingest.IngestPipeline for submitting ingest
+        documents and tracking their tasks in the background.
+        **Parameters**
+        ``index`` (*string*)
+          The index to ingest to. Defaults to configured current project index
+        ``kwargs``
+          Passed to IngestPipeline, such as max_in_flight
+        """
         index = index or self.get_index()
-        result = sc.ingest(index, gmeta)
-        pending_states = ['PENDING', 'PROGRESS']
         log.info('Ingesting to {}'.format(index))
-        task_status = sc.get_task(result['task_id'])['state']
-        while task_status in pending_states:
-            log.debug(f'Search task still {task_status}')
-            time.sleep(.2)
-            task_status = sc.get_task(result['task_id'])['state']
-        ingest_task = sc.get_task(result['task_id'])
-        if ingest_task['state'] != 'SUCCESS':
-            log.error(ingest_task.data)
-            raise exc.PilotClientException('Failed to ingest search subject: '
-                                           '{}'.format(ingest_task['message']))
-        return True
+        return search_ingest.IngestPipeline(self.get_search_client(), index,
+                                            **kwargs)
 
     def gather_metadata(self, dataframe, destination, previous_metadata=None,
                         custom_metadata=None, skip_analysis=False,
-                        project=None, foreign_keys=None):
+                        project=None, foreign_keys=None, workers=None,
+                        use_cache=False):
         """Gather metadata on a local file or directory. Returns a new dict
         which combines previous metadata and custom metadata. If skip_analysis
         is True, new analytics won't be attempted and old analytics will be
@@ -867,6 +1280,11 @@ class PilotClient(NativeClient):
           which will be included in search.
         ``project`` (*string*)
           The project to use as the base path. Defaults to current project
+        ``workers`` (*int*) Number of processes to use for hashing and
+          analyzing files in a directory. Defaults to a single process.
+        ``use_cache`` (*bool*) Re-use checksums and analysis from the local
+          fingerprint cache for files which haven't changed since they were
+          last scanned.
         **Examples**
         """
         dframe = self.get_valid_dataframe(dataframe)
@@ -874,16 +1292,17 @@ class PilotClient(NativeClient):
         short_path = self.build_short_path(dframe, destination,
                                            project=project)
         url = self.get_globus_http_url(short_path, project=project)
+        cache = self.get_fingerprint_cache() if use_cache else None
         new_metadata = search.scrape_metadata(
             dframe, url, self.profile, self.project.current,
-            skip_analysis=skip_analysis
+            skip_analysis=skip_analysis, workers=workers, cache=cache
         )
+        if cache is not None:
+            cache.close()
         if foreign_keys:
-            base_sub = self.get_subject_url('', project=project)
-            existing_paths = [e['subject'].replace(base_sub, '').lstrip('/')
-                              for e in self.list_entries('', project=project)]
-            new_files = search.get_foreign_keys(new_metadata['files'],
-                                                foreign_keys, existing_paths)
+            new_files = search.get_foreign_keys(
+                new_metadata['files'], foreign_keys,
+                self.get_existing_paths(project=project))
             for new_file in new_files:
                 d = new_file.get('field_metadata', {}).get('field_definitions')
                 for fdef in d:
@@ -895,6 +1314,14 @@ class PilotClient(NativeClient):
         return search.update_metadata(new_metadata, previous_metadata or {},
                                       custom_metadata or {})
 
+    def get_existing_paths(self, project=None):
+        """Returns a search.ShortnameIndex of the short paths of every record
+        in the project, for resolving foreign key references."""
+        base_sub = self.get_subject_url('', project=project)
+        return search.ShortnameIndex(
+            e['subject'].replace(base_sub, '').lstrip('/')
+            for e in self.iter_entries('', project=project))
+
     def update(self, short_path, user_metadata, dry_run=False):
         prev_metadata = self.get_search_entry(short_path)
         new_metadata = search.update_metadata({}, prev_metadata, user_metadata)
@@ -908,7 +1335,7 @@ class PilotClient(NativeClient):
 
     def register(self, dataframe, destination, metadata=None,
                  update=False, dry_run=False, skip_analysis=False,
-                 foreign_keys=None):
+                 foreign_keys=None, workers=None, use_cache=False):
         """
         Gather metadata on a local search record and register metadata in
         Globus Search. This method assumes either the dataframe already exists
@@ -940,9 +1367,33 @@ class PilotClient(NativeClient):
           which will be included in search.
         ``project`` (*string*)
           The project to use as the base path. Defaults to current project
+        ``workers`` (*int*) Number of processes to use for hashing and
+          analyzing files in a directory. Defaults to a single process.
+        ``use_cache`` (*bool*) Re-use checksums and analysis from the local
+          fingerprint cache for files which haven't changed since they were
+          last scanned.
         **Examples**
         """
         dframe = self.get_valid_dataframe(dataframe)
+        short_path, prev_metadata = self.get_register_target(
+            dframe, destination, update=update, dry_run=dry_run)
+        new_metadata = self.gather_metadata(
+            dframe, destination, previous_metadata=prev_metadata,
+            custom_metadata=metadata or {}, skip_analysis=skip_analysis,
+            foreign_keys=foreign_keys, workers=workers, use_cache=use_cache
+        )
+        return self.finish_register(short_path, new_metadata, prev_metadata,
+                                    dry_run=dry_run)
+
+    def get_register_target(self, dataframe, destination, update=False,
+                            dry_run=False):
+        """
+        Check a dataframe can be registered at the destination, before any
+        metadata is gathered. Raises the same exceptions as register() for a
+        missing destination or an existing record. Returns a tuple of the
+        short path for the new record, and the metadata of the record it
+        replaces, or an empty dict if there isn't one.
+        """
         try:
             self.ls(destination)
         except globus_sdk.TransferAPIError as tapie:
@@ -950,29 +1401,30 @@ class PilotClient(NativeClient):
                 raise exc.DirectoryDoesNotExist(fmt=[destination]) from None
             else:
                 raise exc.GlobusTransferError(tapie.message) from None
-        short_path = self.build_short_path(dframe, destination)
+        short_path = self.build_short_path(dataframe, destination)
         subject = self.get_subject_url(short_path)
-        # Get a list of all entries to check if the new record already exists
-        prev_candidates = self.list_entries()
-        prev_entry = search_discovery.get_sub_in_collection(
-            subject, prev_candidates, precise=False)
+        # Check if the record already exists, or is part of an existing record
+        prev_entry = self.get_full_search_entry(subject, path_is_sub=True,
+                                                precise=False)
         prev_metadata = {}
         if prev_entry:
             log.debug('Previous entry exists: {}'.format(subject))
             if not update and not dry_run:
                 raise exc.RecordExists(prev_entry['content'][0],
                                        fmt=[short_path])
-            # If we hit on another subject, use the previous subject. This
-            # handles two cases: 1. replacing an existing subject 2. Adding
-            # a file to an existing subject, where we should use the top level
-            # subject name of the entry.
-            subject = prev_entry['subject']
+            # If we hit on another subject, the previous metadata is used.
+            # This handles two cases: 1. replacing an existing subject
+            # 2. Adding a file to an existing subject, where we should use
+            # the top level record of the entry.
             prev_metadata = prev_entry['content'][0]
-        new_metadata = self.gather_metadata(
-            dframe, destination, previous_metadata=prev_metadata,
-            custom_metadata=metadata or {}, skip_analysis=skip_analysis,
-            foreign_keys=foreign_keys
-        )
+        return short_path, prev_metadata
+
+    def finish_register(self, short_path, new_metadata, prev_metadata,
+                        dry_run=False):
+        """
+        Ingest metadata gathered for a dataframe, if anything changed since
+        the previous record. Returns the stats for the registration.
+        """
         stats = search.gather_metadata_stats(new_metadata, prev_metadata)
         stats['ingest'] = {}
         if stats['metadata_modified'] is False:
@@ -982,9 +1434,194 @@ class PilotClient(NativeClient):
         stats['ingest'] = self.ingest(short_path, new_metadata)
         return stats
 
+    def register_many(self, manifest, update=False, dry_run=False,
+                      skip_analysis=False, workers=None, scanners=None,
+                      use_cache=False, journal=None, project=None, index=None,
+                      max_batch_bytes=None, max_batch_entries=None,
+                      max_in_flight=None):
+        """
+        Register many dataframes which already exist on the remote endpoint,
+        the same as calling register() on each one. Destinations are checked
+        once each, previous records for every item are found with a single
+        listing of the project, and dataframes are scanned concurrently while
+        finished ones are validated and ingested in batches. A problem with
+        one item does not stop the others. Returns a report with a dict for
+        each manifest row, in order, with the 'dataframe', 'destination',
+        'short_path', 'subject', 'state' and an 'error' message if it failed.
+        States are 'ingested', 'unchanged', 'dry_run', 'failed', or 'skipped'
+        if the journal shows the item was already registered.
+        **Parameters**
+        ``manifest`` (*list*)
+          A list of dicts, each with a 'dataframe' path, a 'destination' and
+          optional 'metadata' dict. See pilot.bulk_register.read_manifest()
+        ``update`` (*bool*) Update existing records. Items with an existing
+          record fail if this is false.
+        ``dry_run`` (*bool*) Scan and validate everything, but do not ingest
+        ``skip_analysis`` (*bool*) Do not analyze the contents of dataframes
+        ``workers`` (*int*) Number of processes to use for hashing and
+          analyzing files in each directory, the same as for register().
+          Defaults to a single process.
+        ``scanners`` (*int*) Number of dataframes to scan at the same time.
+          Defaults to one
+        ``use_cache`` (*bool*) Re-use checksums and analysis from the local
+          fingerprint cache for files which haven't changed since they were
+          last scanned.
+        ``journal`` (*string or RegisterJournal*) Record the outcome of each
+          item in this file, and skip items it shows were already registered
+        ``project`` (*string*)
+          The project to register in. Defaults to current project
+        ``index`` (*uuid string*) Index to ingest to. Defaults to index
+          configured for this project
+        ``max_batch_bytes`` (*int*) Largest size of a single ingest batch.
+          Defaults to pilot.search.MAX_INGEST_BYTES
+        ``max_batch_entries`` (*int*) Most entries in a single ingest batch.
+          Defaults to pilot.search.MAX_INGEST_ENTRIES
+        ``max_in_flight`` (*int*) Most batches to ingest at the same time.
+          Defaults to IngestPipeline.DEFAULT_MAX_IN_FLIGHT
+        **Examples**
+        >>> manifest = pilot.bulk_register.read_manifest('manifest.csv')
+        >>> report = pc.register_many(manifest, journal='manifest.journal')
+        """
+        project = project or self.project.current
+        max_in_flight = (max_in_flight or
+                         search_ingest.IngestPipeline.DEFAULT_MAX_IN_FLIGHT)
+        if isinstance(journal, str):
+            journal = bulk_register.RegisterJournal(journal)
+        report, pending = [], []
+        for row in manifest:
+            item = {'dataframe': row['dataframe'],
+                    'destination': row.get('destination') or '',
+                    'short_path': None, 'subject': None, 'state': None,
+                    'error': None}
+            report.append(item)
+            if journal and journal.is_complete(item['dataframe'],
+                                               item['destination']):
+                item['state'] = 'skipped'
+                continue
+            pending.append((item, row.get('metadata') or {}))
+
+        def fail(item, error):
+            log.debug('Failed to register {}: {}'
+                      ''.format(item['dataframe'], error))
+            item['state'], item['error'] = 'failed', str(error).strip()
+            if journal and not dry_run:
+                journal.record([item])
+
+        dest_errors = {}
+        for destination in sorted({i['destination'] for i, _ in pending}):
+            try:
+                self.ls(destination, project=project)
+            except globus_sdk.TransferAPIError as tapie:
+                if tapie.code == 'ClientError.NotFound':
+                    dest_errors[destination] = exc.DirectoryDoesNotExist(
+                        fmt=[destination])
+                else:
+                    dest_errors[destination] = exc.GlobusTransferError(
+                        tapie.message)
+        scannable = []
+        for item, metadata in pending:
+            try:
+                if item['destination'] in dest_errors:
+                    raise dest_errors[item['destination']]
+                dframe = self.get_valid_dataframe(item['dataframe'])
+                item['short_path'] = self.build_short_path(
+                    dframe, item['destination'], project=project)
+                scannable.append((item, metadata))
+            except (exc.PilotClientException,
+                    exc.FileOrFolderDoesNotExist) as err:
+                fail(item, err)
+
+        previous = self.get_search_entries(
+            [i['short_path'] for i, _ in scannable], project=project,
+            precise=False)
+        to_scan = []
+        for item, metadata in scannable:
+            prev_entry = previous[item['short_path']]
+            # Same as register(), always ingest at the item's own path, even
+            # when the matching record belongs to a parent directory
+            item['subject'] = self.get_subject_url(item['short_path'],
+                                                   project=project)
+            if prev_entry:
+                if not update and not dry_run:
+                    fail(item, exc.RecordExists(prev_entry['content'][0],
+                                                fmt=[item['short_path']]))
+                    continue
+                prev_entry = prev_entry['content'][0]
+            to_scan.append((item, metadata, prev_entry or {}))
+
+        group = self.get_group(project)
+        by_subject = {}
+
+        def scanned_entries(futures):
+            """Yield a gmeta entry for each item as soon as its scan finishes
+            and the result is valid"""
+            for future in concurrent.futures.as_completed(futures):
+                item, prev_metadata = futures[future]
+                try:
+                    new_metadata = future.result()
+                    stats = search.gather_metadata_stats(new_metadata,
+                                                         prev_metadata)
+                    if stats['metadata_modified'] is False:
+                        item['state'] = 'unchanged'
+                        if journal and not dry_run:
+                            journal.record([item])
+                        continue
+                    self.validate_subject(item['subject'])
+                    gmeta = search.get_gmeta_list(
+                        [{'subject': item['subject'],
+                          'content': new_metadata}],
+                        default_visible_to=group, validate=True)
+                except Exception as err:
+                    fail(item, err)
+                    continue
+                if dry_run:
+                    item['state'] = 'dry_run'
+                    continue
+                by_subject.setdefault(item['subject'], []).append(item)
+                yield gmeta['ingest_data']['gmeta'][0]
+
+        submitted = []
+
+        def record_ingested(wait=False):
+            while submitted and (wait or submitted[0][1].done()):
+                items, future = submitted.pop(0)
+                error = future.exception()
+                for item in items:
+                    item['state'] = 'failed' if error else 'ingested'
+                    item['error'] = str(error) if error else None
+                if journal:
+                    journal.record(items)
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=scanners or 1) as pool:
+            futures = {
+                pool.submit(self.gather_metadata, item['dataframe'],
+                            item['destination'],
+                            previous_metadata=prev_metadata,
+                            custom_metadata=metadata,
+                            skip_analysis=skip_analysis, project=project,
+                            workers=workers, use_cache=use_cache):
+                (item, prev_metadata)
+                for item, metadata, prev_metadata in to_scan
+            }
+            batches = search.batch_gmeta_entries(
+                scanned_entries(futures),
+                max_bytes=max_batch_bytes or search.MAX_INGEST_BYTES,
+                max_entries=max_batch_entries or search.MAX_INGEST_ENTRIES)
+            with self.get_ingest_pipeline(
+                    index, max_in_flight=max_in_flight) as pipeline:
+                for batch in batches:
+                    items = [i for e in batch['ingest_data']['gmeta']
+                             for i in by_subject.pop(e['subject'], [])]
+                    submitted.append((items, pipeline.submit(batch)))
+                    record_ingested()
+            record_ingested(wait=True)
+        return report
+
     def upload(self, dataframe, destination, metadata=None, globus=True,
                update=False, dry_run=False, skip_analysis=False, project=None,
-               foreign_keys=None):
+               foreign_keys=None, workers=None, use_cache=False,
+               overlap=False, delta=False, delete_removed=False):
         """
         Register a dataframe in Globus Search then upload it to a relative
         project directory on the configured Globus endpoint.
@@ -1012,6 +1649,24 @@ class PilotClient(NativeClient):
           which will be included in search.
         ``project`` (*string*)
           The project to use as the base path. Defaults to current project
+        ``workers`` (*int*) Number of processes to use for hashing and
+          analyzing files in a directory. Defaults to a single process.
+        ``use_cache`` (*bool*) Re-use checksums and analysis from the local
+          fingerprint cache for files which haven't changed since they were
+          last scanned.
+        ``overlap`` (*bool*) Start the upload as soon as the destination has
+          been checked, and gather metadata while it runs. The record is
+          ingested once both have finished, and not at all if the upload
+          fails. With Globus, this waits for the transfer task to succeed,
+          not only to be submitted. Files are always uploaded in this mode,
+          even if they match the previous record, so it's best suited to new
+          or changed data.
+        ``delta`` (*bool*) When updating a directory, only upload files which
+          are new or differ in length or checksum from the previous record.
+          The files sent are listed in stats['delta']. Not used with overlap.
+        ``delete_removed`` (*bool*) With delta, also delete remote files
+          which were in the previous record but are no longer in the
+          dataframe.
         **Examples**
         # With context `base_path` set to '/projects/'
         # With project `base_path` set to 'my-project'
@@ -1036,47 +1691,291 @@ class PilotClient(NativeClient):
         if not destination:
             raise exc.NoDestinationProvided(fmt=[self.ls('')])
 
-        stats = self.register(
-            dframe, destination, metadata=metadata, update=update,
-            dry_run=dry_run, skip_analysis=skip_analysis,
-            foreign_keys=foreign_keys
+        if overlap and delta:
+            raise exc.PilotClientException(
+                'Overlap and delta uploads cannot be used together, changed '
+                'files are only known once metadata has been gathered.')
+        if delete_removed and not delta:
+            raise exc.PilotClientException(
+                'Removed files can only be deleted with a delta upload.')
+
+        up = self.upload_globus if globus else self.upload_http
+        if overlap and not dry_run:
+            short_path, prev_metadata = self.get_register_target(
+                dframe, destination, update=update)
+            # Check everything which can be checked before gathering metadata,
+            # so a mistake doesn't leave new data described by an old record
+            if metadata:
+                validation.validate_user_provided_metadata(metadata)
+            if foreign_keys:
+                search.check_foreign_keys(
+                    foreign_keys, self.get_existing_paths(project=project))
+            log.debug('Uploading using {} while gathering metadata'
+                      ''.format(up))
+            cancel = threading.Event()
+            up_kwargs = {'project': project}
+            if not globus:
+                up_kwargs['cancel'] = cancel
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+                upload = pool.submit(up, dframe, destination, **up_kwargs)
+                try:
+                    new_metadata = self.gather_metadata(
+                        dframe, destination, previous_metadata=prev_metadata,
+                        custom_metadata=metadata or {},
+                        skip_analysis=skip_analysis,
+                        foreign_keys=foreign_keys, workers=workers,
+                        use_cache=use_cache
+                    )
+                except Exception:
+                    cancel.set()
+                    self.cancel_upload(upload, globus=globus)
+                    raise
+                upload_result = upload.result()
+            if globus:
+                # Submitting the task isn't enough, the record should only
+                # describe data which actually arrived
+                task_id = upload_result.data['task_id']
+                status = self.wait_for_transfer(task_id)
+                if status != 'SUCCEEDED':
+                    raise exc.GlobusTransferError(
+                        'Transfer task {} finished with status {}, the search '
+                        'record was not updated.'.format(task_id, status))
+            stats = self.finish_register(short_path, new_metadata,
+                                         prev_metadata)
+            stats['protocol'] = 'globus' if globus else 'http'
+            stats['upload'] = upload_result
+            return stats
+
+        short_path, prev_metadata = self.get_register_target(
+            dframe, destination, update=update, dry_run=dry_run)
+        new_metadata = self.gather_metadata(
+            dframe, destination, previous_metadata=prev_metadata,
+            custom_metadata=metadata or {}, skip_analysis=skip_analysis,
+            foreign_keys=foreign_keys, workers=workers, use_cache=use_cache
         )
+        only_files, removed = None, []
+        if delta and prev_metadata:
+            only_files, removed = self.get_delta_files(
+                dframe, destination, new_metadata, prev_metadata,
+                project=project)
+            if delete_removed and removed:
+                # Records keep files from earlier versions by default
+                removed_urls = set(self.get_globus_http_url(
+                    os.path.join(destination, path), project=project)
+                    for path in removed)
+                new_metadata['files'] = [f for f in new_metadata['files']
+                                         if f['url'] not in removed_urls]
+        stats = self.finish_register(short_path, new_metadata, prev_metadata,
+                                     dry_run=dry_run)
         stats['protocol'] = 'globus' if globus else 'http'
         stats['upload'] = {}
-        up = self.upload_globus if globus else self.upload_http
-        if not dry_run and stats['files_modified'] is True:
+        if delta and prev_metadata:
+            stats['delta'] = {'modified': only_files, 'removed': removed}
+        if dry_run or stats['files_modified'] is not True:
+            return stats
+        if only_files is None:
             log.debug('Uploading using {}'.format(up))
             stats['upload'] = up(dframe, destination, project=project)
+        elif only_files:
+            # Changed files may need several Globus tasks, so this always
+            # returns a list of results like upload_http
+            up = self.upload_globus_tasks if globus else self.upload_http
+            log.debug('Uploading {} changed files using {}'
+                      ''.format(len(only_files), up))
+            stats['upload'] = up(dframe, destination, project=project,
+                                 only_files=only_files)
+        if delete_removed and removed:
+            self.delete_files([os.path.join(destination, path)
+                               for path in removed], project=project)
         return stats
 
-    def upload_http(self, dataframe, destination, project=None):
+    def cancel_upload(self, upload, globus=True):
+        """Stop an upload started in the background by upload(overlap=True),
+        after gathering metadata failed. HTTP uploads are expected to have
+        stopped starting new files already, this waits for the rest to finish.
+        Globus tasks are cancelled. Files already uploaded are left in place,
+        and the record is not changed."""
+        try:
+            result = upload.result()
+        except Exception:
+            log.debug('Upload failed before it was cancelled', exc_info=True)
+            return
+        if globus:
+            task_id = result.data['task_id']
+            self.get_transfer_client().cancel_task(task_id)
+            log.warning('Gathering metadata failed, cancelled transfer task '
+                        '{}'.format(task_id))
+        else:
+            log.warning('Gathering metadata failed, stopped the upload after '
+                        '{} files'.format(len(result)))
+
+    def get_delta_files(self, dataframe, destination, new_metadata,
+                        previous_metadata, project=None):
+        """
+        Compare the files in new metadata for a dataframe against its
+        previous record. Returns a tuple of two lists of paths relative to the
+        destination: local files which are new or changed, and files in the
+        previous record which are no longer part of the local dataframe.
+        Files in the previous record outside of the dataframe are ignored,
+        such as when the dataframe is added to an existing record.
+        """
+        short_path = self.build_short_path(dataframe, destination,
+                                           project=project)
+        url = self.get_globus_http_url(short_path, project=project)
+        base_url = os.path.dirname(url) + '/'
+        local = set(rpath for _, rpath in search.iter_subdir_paths(dataframe))
+        modified = [u[len(base_url):] for u in search.get_modified_files(
+            new_metadata.get('files'), previous_metadata.get('files'))]
+        previous = [f['url'][len(base_url):]
+                    for f in previous_metadata.get('files') or []
+                    if f['url'] == url or f['url'].startswith(url + '/')]
+        return ([path for path in modified if path in local],
+                [path for path in previous if path not in local])
+
+    def upload_http(self, dataframe, destination, project=None,
+                    only_files=None, workers=None, cancel=None):
         """Upload to the configured HTTP endpoint for this context/project.
         Executes a simple upload without any metadata or checking the
         destination for existing files. Overwrites any existing dataframe.
-        The project must have a configured http endpoint on petrel
-        """
-        return_values = []
-        for local_path, remote_path in search.get_subdir_paths(dataframe):
-            path = self.get_path(os.path.join(destination, remote_path))
-            rv = self.get_http_client(project).put(path, filename=local_path)
-            return_values.append(rv)
-        return return_values
+        The project must have a configured http endpoint on petrel.
+        If ``only_files`` is given, only files with those paths relative to
+        the destination are uploaded. Files are uploaded ``workers`` at a
+        time, see ``iter_upload_http``. Returns the response for each file,
+        in the order the files are found in the dataframe.
+        """
+        responses = {}
+        for progress in self.iter_upload_http(dataframe, destination,
+                                              project=project,
+                                              only_files=only_files,
+                                              workers=workers, cancel=cancel):
+            log.info('Uploaded {remote_path} ({files_done}/{files_total} '
+                     'files, {bytes_done}/{bytes_total} bytes)'
+                     ''.format(**progress))
+            responses[progress['index']] = progress['response']
+        return [responses[index] for index in sorted(responses)]
+
+    def iter_upload_http(self, dataframe, destination, project=None,
+                         only_files=None, workers=None, cancel=None):
+        """Upload files in a dataframe over HTTP several at a time, sharing a
+        single HTTP client and its pooled connections. Yields a dict as each
+        file finishes, in the order they finish, with the 'index' of the
+        file in the dataframe, its 'local_path', 'remote_path', 'length' and
+        'response', and the progress so far: 'files_done', 'files_total',
+        'bytes_done' and 'bytes_total'. If a file fails, its error is raised
+        and files not yet started are not uploaded.
+        **Parameters**
+        ``dataframe`` (*path-to-file*)
+          Path to a file or directory on the local system
+        ``destination`` (*path-string*)
+          Path to upload on the remote endpoint, relative to the base path set
+          by both the context and project.
+        ``project`` (*string*)
+          The project to use as the base path. Defaults to current project
+        ``only_files`` (*list*)
+          Only upload files with these paths, relative to the destination.
+        ``workers`` (*int*)
+          Most files to upload at once. Defaults to HTTP_UPLOAD_WORKERS
+        ``cancel`` (*threading.Event*)
+          Once set, no more files are started. Files already started finish.
+        **Examples**
+        >>> for progress in pc.iter_upload_http('my_dir', 'foo'):
+        >>>     print(progress['files_done'], progress['files_total'])
+        """
+        only_files = set(only_files) if only_files is not None else None
+        files = [(local_path, remote_path) for local_path, remote_path
+                 in search.iter_subdir_paths(dataframe)
+                 if only_files is None or remote_path in only_files]
+        lengths = [os.stat(local_path).st_size for local_path, _ in files]
+        progress = {'files_done': 0, 'files_total': len(files),
+                    'bytes_done': 0, 'bytes_total': sum(lengths)}
+        http_client = self.get_http_client(project)
+
+        def put(index):
+            local_path, remote_path = files[index]
+            path = self.get_path(os.path.join(destination, remote_path),
+                                 project=project)
+            return http_client.put(path, filename=local_path)
+
+        workers = workers or self.HTTP_UPLOAD_WORKERS
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers) as pool:
+            indexes, pending = iter(range(len(files))), {}
+            try:
+                while True:
+                    # Only queue a few more files than there are workers, so
+                    # an error stops the upload without starting the rest.
+                    if cancel is not None and cancel.is_set():
+                        indexes = iter(())
+                    for index in itertools.islice(indexes,
+                                                  workers * 2 - len(pending)):
+                        pending[pool.submit(put, index)] = index
+                    if not pending:
+                        break
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        index = pending.pop(future)
+                        response = future.result()
+                        progress['files_done'] += 1
+                        progress['bytes_done'] += lengths[index]
+                        yield dict(progress, index=index,
+                                   local_path=files[index][0],
+                                   remote_path=files[index][1],
+                                   length=lengths[index], response=response)
+            finally:
+                for future in pending:
+                    future.cancel()
 
     def get_globus_transfer_paths(self, dataframe, destination, project=None):
         """Returns a list of tuples, with each tuple consisting of a src,
         destination to be used as the 'transfer items' in starting a globus
         transfer."""
+        return list(self.iter_globus_transfer_paths(dataframe, destination,
+                                                    project=project))
+
+    def iter_globus_transfer_paths(self, dataframe, destination,
+                                   project=None):
+        """Generator version of get_globus_transfer_paths, yielding each
+        (src, destination) tuple as the dataframe directory is walked."""
         dframe = self.get_valid_dataframe(dataframe)
-        paths = []
-        for file_path, remote_short_path in search.get_subdir_paths(dframe):
+        for file_path, remote_short_path in search.iter_subdir_paths(dframe):
             rel_dest = os.path.join(destination, remote_short_path)
-            paths.append((file_path, self.get_path(rel_dest, project=project)))
-        return paths
+            yield file_path, self.get_path(rel_dest, project=project)
 
     def upload_globus(self, dataframe, destination, project=None,
                       globus_args=None):
+        """Upload a dataframe to a project using a single Globus Transfer
+        task, with directories sent as one recursive item. A local endpoint
+        must be configured. Returns the transfer result for the task. Use
+        ``upload_globus_tasks`` to send only some files, or to split the
+        upload over several tasks.
+        ** parameters **
+        ``dataframe`` (*path-to-file*)
+          Path to a file on the local system
+        ``destination`` (*path-string*)
+          Path to upload on the remote endpoint, relative to the base path set
+          by both the context and project.
+        ``project`` (*string*)
+          The project to use as the base path. Defaults to current project
+        ``globus_args`` (*dict*)
+          Other arguments to pass to Globus Transfer. Overwrites any defaults.
+          See ``transfer_file`` for more info.
+        """
+        results = self.upload_globus_tasks(dataframe, destination,
+                                           project=project,
+                                           globus_args=globus_args)
+        return results[0]
+
+    def upload_globus_tasks(self, dataframe, destination, project=None,
+                            globus_args=None, recursive=True, max_items=None,
+                            only_files=None):
         """Upload a dataframe to a project using a Globus Transfer. A local
-        endpoint must be configured.
+        endpoint must be configured. Directories are transferred as a single
+        recursive item, unless ``recursive`` is False, in which case each file
+        is its own item and large directories are split over several
+        transfer tasks. Every task is recorded in the transfer log. Returns a
+        list of transfer results, one for each task.
         ** parameters **
         ``dataframe`` (*path-to-file*)
           Path to a file on the local system
@@ -1089,19 +1988,40 @@ class PilotClient(NativeClient):
           Other arguments to pass to Globus Transfer. Overwrites any defaults.
           See ``transfer_file`` for more info.
           https://globus-sdk-python.readthedocs.io/en/stable/clients/transfer/#globus_sdk.TransferClient.submit_transfer  # noqa
+        ``recursive`` (*bool*)
+          Transfer directories as one recursive item instead of per-file
+        ``max_items`` (*int*)
+          Most items in a single transfer task. Defaults to MAX_TRANSFER_ITEMS
+        ``only_files`` (*list*)
+          Only transfer files with these paths, relative to the destination.
+          Each is sent as its own item. No task is submitted if none match.
         """
         log.info('Uploading (Globus) {} to {}'.format(dataframe, destination))
-        result = self.transfer_files(
+        dframe = self.get_valid_dataframe(dataframe)
+        dest = os.path.join(destination, os.path.basename(dframe))
+        if only_files is not None:
+            only_files = set(only_files)
+            paths = [
+                (local_path, self.get_path(os.path.join(destination, rpath),
+                                           project=project))
+                for local_path, rpath in search.iter_subdir_paths(dframe)
+                if rpath in only_files
+            ]
+            if not paths:
+                log.debug('No files to transfer for {}'.format(dframe))
+                return []
+        elif recursive and os.path.isdir(dframe):
+            paths = [(dframe, self.get_path(dest, project=project), True)]
+        else:
+            paths = self.iter_globus_transfer_paths(dframe, destination,
+                                                    project=project)
+        results = self.submit_transfers(
             self.profile.load_option('local_endpoint'),
-            self.get_endpoint(),
-            self.get_globus_transfer_paths(dataframe, destination,
-                                           project=project),
-            **(globus_args or {})
+            self.get_endpoint(project), paths, globus_args=globus_args,
+            max_items=max_items or self.MAX_TRANSFER_ITEMS
         )
-        tl = transfer_log.TransferLog(self.config)
-        dest = os.path.join(destination, os.path.basename(dataframe))
-        tl.add_log(result, dest)
-        return result
+        self.transfer_log.add_logs(results, dest)
+        return results
 
     def transfer_file(self, src_ep, dest_ep, src_path, dest_path,
                       globus_args=None):
@@ -1140,11 +2060,13 @@ class PilotClient(NativeClient):
           Source Globus Endpoint
         ``destination`` (*uuid*)
           Destination Globus Endpoint
-        ``paths`` (*list of two item tuples*)
+        ``paths`` (*list or iterable of two item tuples*)
           A list of items to transfer. Each item must be a tuple with two
           entries, the first the path to the source file, and the second
           the path of the destination. For example:
           [('/users/foo/bar.txt', '~/bar.txt'), ('a.json', '~/a.json')]
+          A third entry of True transfers a directory recursively:
+          [('/users/foo/my_dir', '~/my_dir', True)]
         ``globus_args`` (*dict*)
           Globus Transfer options. Defaults include:
           {
@@ -1156,6 +2078,17 @@ class PilotClient(NativeClient):
           See more options at:
           https://globus-sdk-python.readthedocs.io/en/stable/clients/transfer/#globus_sdk.TransferClient.submit_transfer  # noqa
         """
+        return self.submit_transfers(src_ep, dest_ep, paths,
+                                     globus_args=globus_args)[0]
+
+    def submit_transfers(self, src_ep, dest_ep, paths, globus_args=None,
+                         max_items=None):
+        """Same as ``transfer_files``, but splits the items into several
+        transfer tasks with at most ``max_items`` items each, so very large
+        directories don't produce one huge submission. Items are read from
+        ``paths`` one task at a time. Returns a list of transfer results, one
+        for each task submitted. If max_items is None, a single task is
+        submitted."""
         tc = self.get_transfer_client()
         log.debug('Activating {} and {}'.format(src_ep, dest_ep))
         tc.endpoint_autoactivate(src_ep)
@@ -1167,13 +2100,67 @@ class PilotClient(NativeClient):
             'encrypt_data': True,
         }
         g_defaults.update(globus_args or {})
-        tdata = globus_sdk.TransferData(tc, src_ep, dest_ep, **g_defaults)
-        for src_path, dest_path in paths:
-            log.debug('Transferring {} to {}'.format(src_path, dest_path))
-            tdata.add_item(src_path, dest_path)
-        transfer_result = tc.submit_transfer(tdata)
-        log.debug('Submitted Transfer')
-        return transfer_result
+        paths, results = iter(paths), []
+        while True:
+            items = list(itertools.islice(paths, max_items))
+            if not items and results:
+                break
+            tdata = globus_sdk.TransferData(tc, src_ep, dest_ep, **g_defaults)
+            for src_path, dest_path, *recursive in items:
+                log.debug('Transferring {} to {}'.format(src_path, dest_path))
+                tdata.add_item(src_path, dest_path,
+                               recursive=bool(recursive and recursive[0]))
+            results.append(tc.submit_transfer(tdata))
+            log.debug('Submitted Transfer with {} items'.format(len(items)))
+            if max_items is None:
+                break
+        return results
+
+    def get_transfer_statuses(self, task_ids):
+        """
+        Fetch the current status of specific Globus Transfer tasks. Tasks are
+        looked up by id with a task list filter, TRANSFER_TASK_FILTER_SIZE
+        ids per request, so any task can be found regardless of its age.
+        Returns a dict of task ids to their status. Tasks which could not be
+        found are left out.
+        **Parameters**
+        ``task_ids`` (*list*)
+          Globus Transfer task ids
+        **Examples**
+        >>> pc.get_transfer_statuses(['1ca2aa3c-...'])
+        {'1ca2aa3c-...': 'SUCCEEDED'}
+        """
+        tc = self.get_transfer_client()
+        task_ids, statuses = list(dict.fromkeys(task_ids)), {}
+        for idx in range(0, len(task_ids), self.TRANSFER_TASK_FILTER_SIZE):
+            chunk = task_ids[idx:idx + self.TRANSFER_TASK_FILTER_SIZE]
+            tasks = tc.task_list(filter='task_id:{}'.format(','.join(chunk)),
+                                 limit=len(chunk))
+            for task in tasks:
+                task = getattr(task, 'data', task)
+                statuses[task['task_id']] = (task.get('nice_status') or
+                                             task.get('status'))
+        return statuses
+
+    def wait_for_transfer(self, task_id, polling_interval=None):
+        """
+        Block until a Globus Transfer task has finished, then record its final
+        status in the transfer log. Returns the status, such as 'SUCCEEDED'
+        or 'FAILED'.
+        **Parameters**
+        ``task_id`` (*string*)
+          A Globus Transfer task id
+        ``polling_interval`` (*int*)
+          Seconds between status checks. Defaults to TRANSFER_WAIT_INTERVAL
+        """
+        tc = self.get_transfer_client()
+        interval = polling_interval or self.TRANSFER_WAIT_INTERVAL
+        while not tc.task_wait(task_id, timeout=interval * 6,
+                               polling_interval=interval):
+            log.debug('Still waiting for transfer task {}'.format(task_id))
+        status = tc.get_task(task_id)['status']
+        self.transfer_log.update_log(task_id, status)
+        return status
 
     def download(self, path, project=None, relative=True, globus=False):
         downloader = self.download_globus if globus else self.download_http
@@ -1316,6 +2303,34 @@ class PilotClient(NativeClient):
         delete_result = tc.submit_delete(ddata)
         log.debug(delete_result)
 
+    def delete_files(self, paths, project=None, relative=True):
+        """
+        Delete several files on the remote endpoint for the given project
+        with a single deletion task. Directories are not deleted, see
+        ``delete`` for removing a directory.
+        **Parameters**
+        ``paths`` (*list of path strings*)
+          Paths to files on this project
+        ``project`` (*string*)
+          The project to fetch info for. Defaults to current project
+        ``relative`` (*bool*)
+          If True, prepends the path to the project. If False,
+          does not prepend path but ensures it's in the project's directory
+        **Examples**
+        >>> pc.delete_files(['foo.txt', 'bar/baz.txt'])
+        """
+        tc = self.get_transfer_client()
+        app_name = self.context.get_value('app_name')
+        ddata = globus_sdk.DeleteData(
+            tc, self.get_endpoint(project), notify_on_succeeded=False,
+            label='File Deletion with {}'.format(app_name))
+        for path in paths:
+            ddata.add_item(self.get_path(path, project=project,
+                                         relative=relative))
+        delete_result = tc.submit_delete(ddata)
+        log.debug(delete_result)
+        return delete_result
+
     def validate_subject(self, subject):
         pdata = self.resolve_project(subject)
         if pdata is None:
@@ -92,6 +92,13 @@ def logout(purge):
         click.echo('No user logged in, no tokens to clear.')
     if purge and os.path.exists(pc.config_file):
         os.unlink(pc.config_file)
+        # The fingerprint cache, search mirror and transfer log are each kept
+        # in their own database alongside the config
+        for store in (pc.get_fingerprint_cache(), pc.get_search_mirror(),
+                      pc.transfer_log):
+            store.close()
+            if os.path.exists(store.filename):
+                os.unlink(store.filename)
         click.secho('All local user info and logs have been deleted.',
                     fg='green')
 
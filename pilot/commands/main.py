@@ -6,13 +6,15 @@ import globus_sdk
 from pilot import commands, exc
 from pilot.version import __version__
 from pilot.commands.auth import auth_commands
-from pilot.commands.search import search_commands, delete
-from pilot.commands.transfer import transfer_commands, status_commands, analyze
+from pilot.commands.search import search_commands, delete, mirror_commands
+from pilot.commands.transfer import (
+    transfer_commands, status_commands, analyze, cache_commands
+)
 from pilot.commands.project import project, index
 
 log = logging.getLogger(__name__)
 
-INVOKABLE_WITHOUT_LOGIN = ['login', 'logout', 'version']
+INVOKABLE_WITHOUT_LOGIN = ['login', 'logout', 'version', 'cache']
 
 
 @click.group(invoke_without_command=True)
@@ -77,6 +79,8 @@ cli.add_command(index.index_command)
 
 cli.add_command(search_commands.list_command)
 cli.add_command(search_commands.describe)
+cli.add_command(search_commands.export_command)
+cli.add_command(mirror_commands.mirror_command)
 cli.add_command(delete.delete_command)
 
 cli.add_command(transfer_commands.upload)
@@ -84,6 +88,8 @@ cli.add_command(analyze.analyze)
 cli.add_command(transfer_commands.download)
 cli.add_command(transfer_commands.mkdir)
 cli.add_command(transfer_commands.register)
+cli.add_command(transfer_commands.register_many)
 cli.add_command(status_commands.status_command)
+cli.add_command(cache_commands.cache_command)
 
 cli.add_command(version)
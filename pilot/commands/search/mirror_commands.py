@@ -0,0 +1,41 @@
+import os
+import click
+
+from pilot import commands, exc
+
+
+@click.command(name='mirror', help='Sync or clear the local mirror of search '
+                                   'records used by "list --cached" and '
+                                   '"describe --cached"')
+@click.option('--full', is_flag=True, default=False,
+              help='Fetch every record instead of only recent changes')
+@click.option('--clear', is_flag=True, default=False,
+              help='Remove all mirrored records for the current project')
+def mirror_command(full, clear):
+    pc = commands.get_pilot_client()
+    mirror = pc.get_search_mirror()
+    if mirror is None:
+        click.secho('No config file is in use, the mirror is disabled.',
+                    fg='yellow')
+        return
+    project = pc.project.current
+    if clear:
+        mirror.clear(project)
+        mirror.close()
+        click.secho('Cleared mirrored records for "{}".'.format(project),
+                    fg='green')
+        return
+    mirror.close()
+    try:
+        summary = pc.sync_search_mirror(project, full=full)
+    except exc.PilotClientException as pce:
+        click.secho(str(pce), fg='red')
+        return
+    size = (os.path.getsize(mirror.filename)
+            if os.path.exists(mirror.filename) else 0)
+    sync_type = 'full' if summary['full'] else 'incremental'
+    click.echo('\n'.join('{:16}{}'.format(*line) for line in [
+        ('Mirror File:', mirror.filename), ('Sync:', sync_type),
+        ('Updated:', summary['updated']), ('Removed:', summary['removed']),
+        ('Records:', summary['total']), ('Size (bytes):', size),
+    ]))
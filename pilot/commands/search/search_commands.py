@@ -1,7 +1,9 @@
 import os
 import urllib
 import json
+import gzip
 import logging
+import concurrent.futures
 import click
 from pilot import commands
 from pilot.search_parse import (
@@ -13,10 +15,11 @@ from pilot.search_discovery import get_matching_file
 log = logging.getLogger(__name__)
 
 
-def get_short_path(result):
-    pc = commands.get_pilot_client()
+def get_short_path(result, base_path=None):
+    if base_path is None:
+        base_path = commands.get_pilot_client().get_path('')
     sub = urllib.parse.urlparse(result['subject'])
-    return sub.path.replace(pc.get_path(''), '').lstrip('/')
+    return sub.path.replace(base_path, '').lstrip('/')
 
 
 def get_relative_path_from_entries(entry, file_info):
@@ -71,19 +74,34 @@ def get_location_info(entry):
               help='Only list results relative to project')
 @click.option('--all', 'all_recs', default=False, is_flag=True,
               help='Do not filter on project')
-def list_command(path, output_json, limit, relative, all_recs):
+@click.option('--cached', default=False, is_flag=True,
+              help='List records from the local search mirror')
+def list_command(path, output_json, limit, relative, all_recs, cached):
     # Should require login if there are publicly visible records
     pc = commands.get_pilot_client()
     project = pc.project.current
     search_params = {'limit': limit}
     if all_recs:
         search_params['filters'], relative = [], False
-    search_results = pc.search(project=project, custom_params=search_params)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        # List the directory on Transfer while waiting on Search
+        path_info = None
+        if not output_json:
+            path_info = pool.submit(pc.ls, path, extended=True)
+        if cached and not all_recs:
+            entries = pc.list_entries(path if relative else '',
+                                      project=project, cached=True)
+            search_results = {'gmeta': entries[:limit],
+                              'total': len(entries)}
+        else:
+            search_results = pc.search(project=project,
+                                       custom_params=search_params)
     log.debug(search_results)
     if output_json:
         click.echo(json.dumps(search_results, indent=4))
         return
     path_sub = pc.get_subject_url(path) if relative else path
+    base_path = pc.get_path('')
     curated_results = [r for r in search_results['gmeta']
                        if path_sub in r['subject']]
 
@@ -96,13 +114,14 @@ def list_command(path, output_json, limit, relative, all_recs):
     for result in curated_results:
         # If this path refers to a result in a different base location, skip
         # it, it isn't part of this project
-        if relative and pc.get_path('') not in result['subject']:
+        if relative and base_path not in result['subject']:
             log.debug('Skipping result {}'.format(result['subject']))
             continue
 
         data = dict(parse_result(result['content'][0], items))
         parsed = [data.get(name) for name in items]
-        parsed += [get_short_path(result) if relative else result['subject']]
+        parsed += [get_short_path(result, base_path) if relative
+                   else result['subject']]
         parsed = [str(p) for p in parsed]
 
         output.append(fmt.format(*parsed))
@@ -113,9 +132,8 @@ def list_command(path, output_json, limit, relative, all_recs):
         output = [results, fmt.format(*titles)] + output
         click.echo('\n'.join(output))
 
-    result_names = [os.path.basename(r['subject']) for r in curated_results]
-    path_info = pc.ls(path, extended=True)
-    dirs = [name for name, info in path_info.items()
+    result_names = {os.path.basename(r['subject']) for r in curated_results}
+    dirs = [name for name, info in path_info.result().items()
             if info['type'] == 'dir' and name not in result_names]
     if dirs:
         click.echo('\nDirectories:\n\t{}'.format('\n\t'.join(dirs)))
@@ -123,6 +141,38 @@ def list_command(path, output_json, limit, relative, all_recs):
         click.echo('\nNo Directories in {}'.format(path or '/'))
 
 
+@click.command(name='export',
+               help='Write every record in the project as newline delimited '
+                    'JSON')
+@click.argument('path', type=click.Path(), required=False, default='')
+@click.option('-o', '--output', default='-', type=click.Path(),
+              help='File to write records to. Defaults to stdout')
+@click.option('--gzip/--no-gzip', 'use_gzip', default=None,
+              help='Compress output with gzip. Defaults to on for output '
+                   'files ending in ".gz"')
+@click.option('--relative/--no-relative', default=True,
+              help='Only export results relative to project')
+@click.option('--cached', default=False, is_flag=True,
+              help='Export records from the local search mirror')
+def export_command(path, output, use_gzip, relative, cached):
+    pc = commands.get_pilot_client()
+    if use_gzip is None:
+        use_gzip = output.endswith('.gz')
+    with click.open_file(output, 'wb' if use_gzip else 'w') as out:
+        fh = gzip.open(out, 'wt') if use_gzip else out
+        count = 0
+        for entry in pc.iter_entries(path, relative=relative, cached=cached):
+            fh.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            count += 1
+        if use_gzip:
+            # Writes the gzip trailer, leaving the underlying file open
+            fh.close()
+    log.debug('Exported {} records'.format(count))
+    if output != '-':
+        click.secho('Exported {} records to {}'.format(count, output),
+                    fg='green', err=True)
+
+
 @click.command(help='Output info about a dataset')
 @click.argument('path', type=click.Path())
 @click.option('--json/--no-json', 'output_json', default=False,
@@ -131,10 +181,12 @@ def list_command(path, output_json, limit, relative, all_recs):
               help='Limit number of entities displayed')
 @click.option('--relative/--no-relative', default=True)
 @click.option('--path-is-sub', default=False, is_flag=True)
-def describe(path, output_json, limit, relative, path_is_sub):
+@click.option('--cached', default=False, is_flag=True,
+              help='Look up the record in the local search mirror')
+def describe(path, output_json, limit, relative, path_is_sub, cached):
     pc = commands.get_pilot_client()
     entry = pc.get_search_entry(path, relative=relative,
-                                path_is_sub=path_is_sub)
+                                path_is_sub=path_is_sub, cached=cached)
     if not entry:
         click.echo('Unable to find entry')
         return
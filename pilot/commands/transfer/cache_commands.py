@@ -0,0 +1,34 @@
+import os
+import click
+
+from pilot.commands import get_pilot_client
+
+
+@click.command(name='cache', help='Show or clear the local file fingerprint '
+                                  'cache used by "upload --cache"')
+@click.option('--clear', is_flag=True, default=False,
+              help='Remove all cached file info')
+@click.option('--invalidate', 'paths', multiple=True,
+              type=click.Path(resolve_path=True),
+              help='Remove cached info for a file or directory')
+def cache_command(clear, paths):
+    pc = get_pilot_client()
+    cache = pc.get_fingerprint_cache()
+    if cache is None:
+        click.secho('No config file is in use, caching is disabled.',
+                    fg='yellow')
+        return
+    if clear:
+        removed = cache.invalidate()
+        click.secho('Removed {} cached files.'.format(removed), fg='green')
+    for path in paths:
+        removed = cache.invalidate(path)
+        click.secho('Removed {} cached files under {}.'.format(removed, path),
+                    fg='green')
+    if not clear and not paths:
+        size = (os.path.getsize(cache.filename)
+                if os.path.exists(cache.filename) else 0)
+        click.echo('{:16}{}\n{:16}{}\n{:16}{}'.format(
+            'Cache File:', cache.filename, 'Cached Files:', len(cache),
+            'Size (bytes):', size))
+    cache.close()
@@ -1,61 +1,87 @@
+import time
 import click
 
 from pilot.commands import get_pilot_client
-import globus_sdk
+from pilot.transfer_log import TransferLog
 
-INACTIVE_STATES = ['SUCCEEDED', 'FAILED', 'CANCELED']
+INACTIVE_STATES = TransferLog.INACTIVE_STATES
+# Seconds between checks in watch mode. Checks back off while nothing
+# changes, and speed up again as soon as something does.
+WATCH_MIN_INTERVAL = 2
+WATCH_MAX_INTERVAL = 60
+WATCH_BACKOFF = 1.5
 
 
 def update_tasks(transfer_tasks):
     """
     Update pending Globus Transfer tasks, and save the resulting status to
-    the config. transfer tasks is a list of dicts as returned by
-    config.get_pc.transfer_log()
+    the transfer log. transfer tasks is a list of dicts as returned by
+    pc.transfer_log.get_log(). Returns the number of tasks which changed
+    status.
 
     User must be logged in!
     """
     pc = get_pilot_client()
-    auth = pc.get_authorizers()['transfer.api.globus.org']
-    tc = globus_sdk.TransferClient(authorizer=auth)
-    user_tasks = {r.data['task_id']: r.data for r in
-                  tc.task_list(num_results=100).data}
+    statuses = pc.get_transfer_statuses([t['task_id'] for t in
+                                         transfer_tasks])
     for task in transfer_tasks:
-        task_data = user_tasks.get(task['task_id'])
-        if not task_data:
+        if task['task_id'] not in statuses:
             click.secho('Unable to update status for {}'.format(task['id']),
                         fg='yellow')
-        else:
-            status = task_data.get('nice_status') or task_data.get('status')
-            pc.transfer_log.update_log(task['task_id'], status)
+    return pc.transfer_log.update_logs(statuses)
+
+
+def format_logs(tlogs):
+    ordered_tlogs = []
+    tlog_order = ['id', 'dataframe', 'status', 'start_time', 'task_id']
+    for tlog in tlogs:
+        tlog = dict(tlog, id=str(tlog['id']),
+                    start_time=tlog['start_time'].strftime('%Y-%m-%d %H:%M'))
+        ordered_tlogs.append([tlog[item] for item in tlog_order])
+
+    fmt = '{:4.3}{:30.29}{:10.11}{:18.17}{:37.36}'
+    header_names = ['ID', 'Dataframe', 'Status', 'Start Time', 'Task ID']
+    headers = fmt.format(*header_names)
+    output = '\n'.join([fmt.format(*items) for items in ordered_tlogs])
+    return '{}\n{}'.format(headers, output)
+
+
+def get_pending(tlogs):
+    return [t for t in tlogs if t['status'] not in INACTIVE_STATES]
 
 
 @click.command(help='Check status of transfers', name='status')
 # @click.argument('task', required=False)
 @click.option('-n', 'number', type=int, default=10,
               help='Number of tasks to list')
-def status_command(number):
+@click.option('--watch', is_flag=True, default=False,
+              help='Keep checking until every listed transfer has finished')
+def status_command(number, watch):
     pc = get_pilot_client()
 
-    ordered_tlogs = []
-    tlog_order = ['id', 'dataframe', 'status', 'start_time', 'task_id']
     # Fetch a limmited set of logs by the most recent entries
-    tlogs = pc.transfer_log.get_log()[:number]
-
-    pending_tasks = [t for t in tlogs if t['status'] not in INACTIVE_STATES]
+    tlogs = pc.transfer_log.get_log(limit=number)
+    pending_tasks = get_pending(tlogs)
     if pending_tasks:
         click.secho('Updating tasks...', fg='green')
         update_tasks(pending_tasks)
-        tlogs = pc.transfer_log.get_log()[:number]
-
-    for tlog in tlogs:
-        tlog['id'] = str(tlog['id'])
-        tlog['start_time'] = tlog['start_time'].strftime('%Y-%m-%d %H:%M')
-        ordered_tlogs.append([tlog[item] for item in tlog_order])
+        tlogs = pc.transfer_log.get_log(limit=number)
+        pending_tasks = get_pending(tlogs)
+    click.echo(format_logs(tlogs))
 
-    fmt = '{:4.3}{:30.29}{:10.11}{:18.17}{:37.36}'
-    header_names = ['ID', 'Dataframe', 'Status', 'Start Time', 'Task ID']
-    headers = fmt.format(*header_names)
-    output = '\n'.join([fmt.format(*items) for items in ordered_tlogs])
-
-    click.echo(headers)
-    click.echo(output)
+    interval = WATCH_MIN_INTERVAL
+    while watch and pending_tasks:
+        click.secho('Waiting on {} transfers, next check in {}s (Ctrl-C to '
+                    'stop)'.format(len(pending_tasks), int(interval)),
+                    fg='green')
+        try:
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            return
+        if update_tasks(pending_tasks):
+            interval = WATCH_MIN_INTERVAL
+            tlogs = pc.transfer_log.get_log(limit=number)
+            pending_tasks = get_pending(tlogs)
+            click.echo(format_logs(tlogs))
+        else:
+            interval = min(interval * WATCH_BACKOFF, WATCH_MAX_INTERVAL)
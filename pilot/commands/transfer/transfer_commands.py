@@ -9,6 +9,7 @@ import pilot
 import traceback
 import contextlib
 import pathlib
+import collections
 from pilot.exc import HTTPSClientException, InvalidField, ExitCodes
 from pilot.search_parse import get_size
 from pilot.commands.endpoint_utils import test_local_endpoint
@@ -49,11 +50,32 @@ def load_json(filename):
               help='Analyze the field to collect additional metadata.')
 @click.option('--foreign-keys', 'foreign_keys', type=click.Path(),
               help='File containing links to other search records.')
+@click.option('--workers', type=click.IntRange(min=1), default=1,
+              help='Number of processes used to hash and analyze files.')
+@click.option('--cache/--no-cache', default=False,
+              help='Skip re-scanning files which have not changed since the '
+                   'last upload or register')
+@click.option('--overlap', is_flag=True, default=False,
+              help='Start uploading right away and gather metadata while the '
+                   'upload runs. The record is updated once the upload has '
+                   'finished.')
+@click.option('--delta', is_flag=True, default=False,
+              help='When updating a directory, only upload files which '
+                   'changed since the previous record')
+@click.option('--delete-removed', is_flag=True, default=False,
+              help='With --delta, delete remote files which are no longer in '
+                   'the directory')
 def upload(dataframe, destination, metadata, gcp, update, dry_run,
-           verbose, no_analyze, foreign_keys):
+           verbose, no_analyze, foreign_keys, workers, cache, overlap,
+           delta, delete_removed):
     """
     Create a search entry and upload this file to the GCS Endpoint.
     """
+    if overlap and delta:
+        raise click.UsageError('--overlap cannot be used with --delta')
+    if delete_removed and not delta:
+        raise click.UsageError('--delete-removed can only be used with '
+                               '--delta')
     with pilot_code_handler(dataframe, destination, verbose):
         pc = pilot.commands.get_pilot_client()
         transport = 'globus' if gcp else 'http'
@@ -64,14 +86,22 @@ def upload(dataframe, destination, metadata, gcp, update, dry_run,
         stats = pc.upload(dataframe, destination, metadata=load_json(metadata),
                           globus=gcp, update=update, dry_run=dry_run,
                           skip_analysis=no_analyze,
-                          foreign_keys=load_json(foreign_keys))
+                          foreign_keys=load_json(foreign_keys),
+                          workers=workers, use_cache=cache, overlap=overlap,
+                          delta=delta, delete_removed=delete_removed)
         short_path = os.path.join(destination, basename)
         if dry_run:
             raise pilot.exc.DryRun(stats=stats, verbose=verbose)
-        elif not stats['metadata_modified']:
+        elif not stats['metadata_modified'] and not overlap:
             raise pilot.exc.NoChangesNeeded(fmt=[short_path])
-        click.secho('A transfer has been queued, see `pilot status` for '
-                    'an update of the transfer.', fg='green')
+        elif not stats['metadata_modified']:
+            click.secho('The search record for {} was already up to date.'
+                        ''.format(short_path))
+        if overlap:
+            click.secho('The transfer has finished.', fg='green')
+        else:
+            click.secho('A transfer has been queued, see `pilot status` for '
+                        'an update of the transfer.', fg='green')
         url = pc.get_portal_url(short_path)
         if url:
             click.echo('You can view your new record here: \n{}'.format(url))
@@ -93,8 +123,13 @@ def upload(dataframe, destination, metadata, gcp, update, dry_run,
               help='Analyze the field to collect additional metadata.')
 @click.option('--foreign-keys', 'foreign_keys', type=click.Path(),
               help='File containing links to other search records.')
+@click.option('--workers', type=click.IntRange(min=1), default=1,
+              help='Number of processes used to hash and analyze files.')
+@click.option('--cache/--no-cache', default=False,
+              help='Skip re-scanning files which have not changed since the '
+                   'last upload or register')
 def register(dataframe, destination, metadata, update, dry_run, verbose,
-             no_analyze, foreign_keys):
+             no_analyze, foreign_keys, workers, cache):
     """
     Create a search entry for a pre-existing file
     """
@@ -105,7 +140,8 @@ def register(dataframe, destination, metadata, update, dry_run, verbose,
         stats = pc.register(dataframe, destination,
                             metadata=load_json(metadata), update=update,
                             dry_run=dry_run, skip_analysis=no_analyze,
-                            foreign_keys=load_json(foreign_keys))
+                            foreign_keys=load_json(foreign_keys),
+                            workers=workers, use_cache=cache)
         if dry_run:
             raise pilot.exc.DryRun(stats=stats, verbose=verbose)
         elif not stats['metadata_modified']:
@@ -116,6 +152,59 @@ def register(dataframe, destination, metadata, update, dry_run, verbose,
             click.echo('You can view your new record here: \n{}'.format(url))
 
 
+@click.command(name='register-many',
+               help='Register many existing dataframes listed in a CSV '
+                    'manifest with "dataframe", "destination" and optional '
+                    '"metadata" columns')
+@click.argument('manifest',
+                type=click.Path(exists=True, file_okay=True, dir_okay=False,
+                                readable=True, resolve_path=True))
+@click.option('--journal', type=click.Path(),
+              help='File recording finished items, so a rerun skips them. '
+                   'Defaults to the manifest name with ".journal" added')
+@click.option('-u', '--update/--no-update', default=False,
+              help='Overwrite existing dataframes and increment the version')
+@click.option('--dry-run', is_flag=True, default=False,
+              help='Do checks and validation but do not ingest.')
+@click.option('--verbose', is_flag=True, default=False)
+@click.option('--no-analyze', is_flag=True, default=False,
+              help='Analyze the field to collect additional metadata.')
+@click.option('--workers', type=click.IntRange(min=1), default=1,
+              help='Number of processes used to hash and analyze files.')
+@click.option('--scanners', type=click.IntRange(min=1), default=1,
+              help='Number of dataframes to scan at the same time.')
+@click.option('--cache/--no-cache', default=False,
+              help='Skip re-scanning files which have not changed since the '
+                   'last upload or register')
+def register_many(manifest, journal, update, dry_run, verbose, no_analyze,
+                  workers, scanners, cache):
+    """
+    Create search entries for many pre-existing files
+    """
+    pc = pilot.commands.get_pilot_client()
+    rows = pilot.bulk_register.read_manifest(manifest)
+    journal = journal or manifest + '.journal'
+    click.secho('Registering {} dataframes...'.format(len(rows)))
+    report = pc.register_many(rows, update=update, dry_run=dry_run,
+                              skip_analysis=no_analyze, workers=workers,
+                              scanners=scanners, use_cache=cache,
+                              journal=journal)
+    states = collections.Counter(item['state'] for item in report)
+    for item in report:
+        if item['state'] == 'failed' or verbose:
+            fg = 'red' if item['state'] == 'failed' else None
+            click.secho('{}: {} {}'.format(
+                item['state'], item['dataframe'], item['error'] or ''),
+                fg=fg)
+    click.echo(', '.join('{} {}'.format(count, state)
+                         for state, count in sorted(states.items())))
+    if states['failed']:
+        click.secho('Fix the failed items and run again to retry them, '
+                    'see {}'.format(journal), fg='yellow')
+        sys.exit(ExitCodes.UNCAUGHT_EXCEPTION)
+    click.secho('Success!', fg='green')
+
+
 @contextlib.contextmanager
 def pilot_code_handler(dataframe, destination, verbose):
     """
@@ -65,6 +65,15 @@ class RecordDoesNotExist(PilotClientException):
     pass
 
 
+class IngestFailed(PilotClientException):
+    """Some batches of a batched ingest failed. ``report`` has a dict for
+    every batch, failed or not, with its 'state' and any 'error'."""
+
+    def __init__(self, message, report=None):
+        super().__init__(message)
+        self.report = report or []
+
+
 class PilotCodeException(PilotClientException):
     """Pilot Code Exceptions are a general class for any exception that might
     be thrown during the execution of a pilot command. The main difference from
@@ -176,6 +185,14 @@ class AnalysisException(PilotClientException):
         self.message = message
         self.original_exc_info = exc
 
+    def __reduce__(self):
+        # Tracebacks can't be pickled, which is required to pass this
+        # exception back from manifest worker processes.
+        exc_info = self.original_exc_info
+        if exc_info:
+            exc_info = (exc_info[0], exc_info[1], None)
+        return self.__class__, (self.message, exc_info)
+
 
 class HTTPSClientException(PilotClientException, GlobusAPIError):
     pass
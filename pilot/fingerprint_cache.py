@@ -0,0 +1,140 @@
+"""
+fingerprint_cache.py keeps a local record of checksums, mimetypes, and
+analysis for files which have already been scanned. Files are identified by
+their absolute path, size, modification time, and inode. If none of those
+change, the file is assumed to be the same and the cached info is re-used
+instead of reading the file again.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class FingerprintCache:
+
+    # Drop the least recently scanned files past this many entries
+    DEFAULT_MAX_ENTRIES = 500000
+    # Drop any entries older than this many seconds (Default 90 days)
+    DEFAULT_MAX_AGE = 60 * 60 * 24 * 90
+
+    def __init__(self, filename, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_age=DEFAULT_MAX_AGE):
+        self.filename = filename
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.filename)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS fingerprints ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                'inode INTEGER, analyzed INTEGER, info TEXT, '
+                'updated REAL)'
+            )
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS fingerprints_updated '
+                'ON fingerprints (updated)'
+            )
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def fingerprint(path):
+        """Returns a tuple which identifies a version of the file on disk:
+        (absolute path, size, mtime_ns, inode)"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        return path, st.st_size, st.st_mtime_ns, st.st_ino
+
+    def get(self, fingerprint, algorithms, analyzed=False):
+        """Get cached file info for a fingerprint. Returns None if the file
+        changed since it was cached, the cached info does not include all of
+        the requested checksum algorithms, or `analyzed` was requested but
+        the file was cached without analysis."""
+        path, size, mtime_ns, inode = fingerprint
+        row = self.connection.execute(
+            'SELECT size, mtime_ns, inode, analyzed, info FROM fingerprints '
+            'WHERE path = ?', (path,)
+        ).fetchone()
+        if row is None or tuple(row[:3]) != (size, mtime_ns, inode):
+            return None
+        if analyzed and not row[3]:
+            return None
+        info = json.loads(row[4])
+        if not all(info.get(alg) for alg in algorithms):
+            return None
+        log.debug('Fingerprint cache hit for {}'.format(path))
+        file_info = {alg: info[alg] for alg in algorithms}
+        file_info['mime_type'] = info.get('mime_type')
+        file_info['field_metadata'] = (info.get('field_metadata', {})
+                                       if analyzed else {})
+        return file_info
+
+    def update(self, entries, analyzed=False):
+        """Save file info for many files at once. `entries` is a list of
+        (fingerprint, file_info) tuples, where file_info contains checksums,
+        the 'mime_type' and 'field_metadata'. Old entries are evicted after
+        saving."""
+        rows, now = [], time.time()
+        for fingerprint, file_info in entries:
+            try:
+                info = json.dumps(file_info)
+            except (TypeError, ValueError):
+                log.debug('Unable to cache info for {}'.format(fingerprint[0]),
+                          exc_info=True)
+                continue
+            rows.append(tuple(fingerprint) + (int(analyzed), info, now))
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO fingerprints '
+                '(path, size, mtime_ns, inode, analyzed, info, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+            )
+        self.evict()
+
+    def evict(self):
+        """Remove entries older than max_age, then the oldest entries beyond
+        max_entries."""
+        with self.connection:
+            if self.max_age is not None:
+                self.connection.execute(
+                    'DELETE FROM fingerprints WHERE updated < ?',
+                    (time.time() - self.max_age,)
+                )
+            if self.max_entries is not None:
+                self.connection.execute(
+                    'DELETE FROM fingerprints WHERE path IN ('
+                    'SELECT path FROM fingerprints ORDER BY updated DESC '
+                    'LIMIT -1 OFFSET ?)', (self.max_entries,)
+                )
+
+    def invalidate(self, path=None):
+        """Remove cached info for a file, or all files under a directory.
+        If no path is given, the whole cache is cleared. Returns the number
+        of entries removed."""
+        with self.connection:
+            if path is None:
+                cur = self.connection.execute('DELETE FROM fingerprints')
+            else:
+                path = os.path.abspath(path)
+                prefix = path.rstrip('/') + '/'
+                cur = self.connection.execute(
+                    'DELETE FROM fingerprints WHERE path = ? OR '
+                    'substr(path, 1, ?) = ?', (path, len(prefix), prefix)
+                )
+        return cur.rowcount
+
+    def __len__(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM fingerprints').fetchone()[0]
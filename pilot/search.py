@@ -6,6 +6,7 @@ Globus Search.
 
 import os
 import copy
+import json
 import hashlib
 import urllib
 import difflib
@@ -13,12 +14,19 @@ import pytz
 import datetime
 import jsonschema
 import logging
+import fnmatch
+import functools
+import collections
+import concurrent.futures
 
 from pilot.validation import validate_dataset, validate_user_provided_metadata
 from pilot import analysis
 from pilot.exc import InvalidField, PilotClientException
 
 DEFAULT_HASH_ALGORITHMS = ['sha256', 'md5']
+# Size of the buffer used when reading files for checksums. Larger buffers
+# mean fewer syscalls on big files.
+DEFAULT_HASH_BLOCK_SIZE = 2 ** 20
 DEFAULT_PUBLISHER = 'Argonne National Laboratory'
 # Previously users were required to add certain fields. If we want to add those
 # back, add them here.
@@ -41,6 +49,10 @@ GMETA_ENTRY = {
 }
 
 GROUP_URN_PREFIX = 'urn:globus:groups:id:{}'
+# Globus Search rejects ingest documents larger than 10MB. Batches are kept
+# under this many serialized bytes, leaving room for the request itself.
+MAX_INGEST_BYTES = 9 * 10 ** 6
+MAX_INGEST_ENTRIES = 1000
 
 CORE_PILOT_FIELDS = ['dc', 'project_metadata', 'files']
 # Used for user provided metadata. These fields will be stripped out and used
@@ -59,42 +71,108 @@ def get_formatted_date():
     return datetime.datetime.now(pytz.utc).isoformat().replace('+00:00', 'Z')
 
 
-def suggest_shortname(existing_shortnames, non_existent_shortname):
+class ShortnameIndex:
+    """
+    The short paths of existing records, for resolving foreign key
+    references. Checking whether a short path exists is a set lookup, and
+    suggestions for missing ones only compare against names sharing the most
+    n-grams with it, instead of every existing name.
+    """
 
-    matches = {
-        difflib.SequenceMatcher(None, es, non_existent_shortname).ratio(): es
-        for es in existing_shortnames
-    }
-    suggestion = ''
-    if matches:
-        suggestion = 'Did you mean {}?'.format(
-            matches.get(max(matches.keys()))
-        )
-    return suggestion
+    def __init__(self, shortnames=None, n=3, max_candidates=20):
+        self.n = n
+        self.max_candidates = max_candidates
+        self.names = []
+        self.shortnames = set()
+        self.grams = collections.defaultdict(set)
+        for shortname in shortnames or []:
+            self.add(shortname)
+
+    def __contains__(self, shortname):
+        return shortname in self.shortnames
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_grams(self, name):
+        padded = ' {} '.format(name)
+        return {padded[i:i + self.n]
+                for i in range(max(len(padded) - self.n + 1, 1))}
+
+    def add(self, shortname):
+        if shortname in self.shortnames:
+            return
+        self.shortnames.add(shortname)
+        for gram in self.get_grams(shortname):
+            self.grams[gram].add(len(self.names))
+        self.names.append(shortname)
+
+    def suggest(self, shortname):
+        """Return the existing short path most similar to the given one, or
+        None if nothing is similar."""
+        postings = [self.grams[g] for g in self.get_grams(shortname)
+                    if g in self.grams]
+        # Grams shared by most names say little about similarity, and are
+        # the most expensive to count. Skip them while there are others.
+        rare = [p for p in postings if len(p) <= len(self.names) // 2]
+        overlap = collections.Counter()
+        for posting in rare or postings:
+            overlap.update(posting)
+        candidates = [self.names[idx] for idx, _ in
+                      overlap.most_common(self.max_candidates)]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda name: difflib.SequenceMatcher(
+            None, name, shortname).ratio())
+
+
+def suggest_shortname(existing_shortnames, non_existent_shortname):
+    if not isinstance(existing_shortnames, ShortnameIndex):
+        existing_shortnames = ShortnameIndex(existing_shortnames)
+    match = existing_shortnames.suggest(non_existent_shortname)
+    return 'Did you mean {}?'.format(match) if match else ''
 
 
 def get_foreign_keys(entry_files, foreign_keys, existing_paths):
+    """Add references from foreign_keys to the field definitions of matching
+    field names in entry_files. existing_paths can be any collection of short
+    paths, but pass a ShortnameIndex when resolving more than once. Every
+    reference is checked up front, and a PilotClientException lists all of
+    the references which did not resolve."""
     files = copy.deepcopy(entry_files)
+    field_defs = []
     for filem in files:
-        defs = filem.get('field_metadata', {}).get('field_definitions')
-        if not defs:
-            continue
-        for field_def in defs:
-            foreign_f = field_def.get('name')
-            if not foreign_keys.get(foreign_f):
-                continue
-            ref = copy.deepcopy(foreign_keys[foreign_f]['reference'])
-            if ref['resource'] in existing_paths:
-                field_def['reference'] = ref
-            else:
-                sug = suggest_shortname(existing_paths,
-                                        os.path.basename(ref['resource']))
-                raise Exception('Reference {} did not resolve. {}'
-                                .format(ref['resource'], sug))
+        defs = filem.get('field_metadata', {}).get('field_definitions') or []
+        field_defs.extend(d for d in defs if foreign_keys.get(d.get('name')))
+    check_foreign_keys(foreign_keys, existing_paths,
+                       names={field_def['name'] for field_def in field_defs})
+    for field_def in field_defs:
+        field_def['reference'] = copy.deepcopy(
+            foreign_keys[field_def['name']]['reference'])
     return files
 
 
-def scrape_metadata(dataframe, url, profile, project, skip_analysis=True):
+def check_foreign_keys(foreign_keys, existing_paths, names=None):
+    """Check the references in foreign_keys resolve to existing_paths, or
+    only the references for the field ``names`` if given. Raises a
+    PilotClientException listing every reference which did not resolve."""
+    if not isinstance(existing_paths, ShortnameIndex):
+        existing_paths = ShortnameIndex(existing_paths)
+    names = foreign_keys.keys() if names is None else names
+    unresolved = []
+    for name in sorted(names):
+        resource = foreign_keys[name]['reference']['resource']
+        if resource not in existing_paths:
+            sug = suggest_shortname(existing_paths,
+                                    os.path.basename(resource))
+            unresolved.append('Reference {} did not resolve. {}'
+                              ''.format(resource, sug))
+    if unresolved:
+        raise PilotClientException('\n'.join(unresolved))
+
+
+def scrape_metadata(dataframe, url, profile, project, skip_analysis=True,
+                    workers=None, cache=None):
     """
     Gather metadata on 'dataframe', including generati
     :param dataframe:
@@ -103,6 +181,8 @@ def scrape_metadata(dataframe, url, profile, project, skip_analysis=True):
     :param project:
     :param foreign_keys:
     :param skip_analysis:
+    :param workers: Number of processes used to build the file manifest
+    :param cache: A FingerprintCache for skipping unchanged files
     :return:
     """
     name = profile.name.split(' ')
@@ -113,7 +193,8 @@ def scrape_metadata(dataframe, url, profile, project, skip_analysis=True):
     else:
         formal_name = profile.name
     remote_file_manifest = gen_remote_file_manifest(
-        dataframe, url, skip_analysis=skip_analysis
+        dataframe, url, skip_analysis=skip_analysis, workers=workers,
+        cache=cache
     )
     return {
         'dc': {
@@ -242,6 +323,30 @@ def files_modified(manifest1, manifest2):
     return False
 
 
+def get_modified_files(new_manifest, previous_manifest):
+    """Compare two remote file manifests like files_modified(), but return
+    the urls of files in the new manifest which are not in the previous one,
+    or have a different filename, length or hash. Only hashes present in
+    both entries are compared. Entries without a hash in common can't be
+    shown to match, so they are always treated as modified."""
+    previous = {f['url']: f for f in previous_manifest or []}
+    return [f['url'] for f in new_manifest or []
+            if f['url'] not in previous or
+            file_entry_modified(f, previous[f['url']])]
+
+
+def file_entry_modified(new_entry, old_entry):
+    """Check if two remote file manifest entries for the same url differ
+    by filename, length, or any hash algorithm both of them include. Returns
+    True if they have no hash algorithm in common."""
+    shared = [alg for alg in hashlib.algorithms_available
+              if new_entry.get(alg) and old_entry.get(alg)]
+    if not shared:
+        return True
+    fields = ['filename', 'length'] + shared
+    return any(new_entry.get(fd) != old_entry.get(fd) for fd in fields)
+
+
 def metadata_modified(new_metadata, old_metadata):
     """Check if the new metadata passed in matches the old metadata. Returns
     true if all fields match except for timestamps on dates, which are allowed
@@ -484,44 +589,151 @@ def gen_dc_formats(metadata, formats):
 
 
 def gen_remote_file_manifest(filepath, url, algorithms=DEFAULT_HASH_ALGORITHMS,
-                             skip_analysis=True):
-    manifest_entries = []
-    for subfile, remote_short_path in get_subdir_paths(filepath):
-        rfm = {alg: compute_checksum(subfile, getattr(hashlib, alg)())
-               for alg in algorithms}
-        mimetype = analysis.mimetypes.detect_type(subfile)
-        metadata = (analysis.analyze_dataframe(subfile, mimetype)
-                    if not skip_analysis else {})
-        rfm.update({
-            'filename': os.path.basename(subfile),
-            'url': os.path.join(os.path.dirname(url), remote_short_path),
-            'field_metadata': metadata,
-            'mime_type': mimetype
-        })
-        if os.path.exists(subfile):
-            rfm['length'] = os.stat(subfile).st_size
-        manifest_entries.append(rfm)
-    return manifest_entries
+                             skip_analysis=True, workers=None, cache=None):
+    """Generate a remote file manifest for a file or every file within a
+    directory. If workers is greater than one, files are hashed and analyzed
+    in a pool of that many processes. The order of the manifest is the same
+    regardless of the number of workers. If a FingerprintCache is given,
+    files which haven't changed since they were last scanned are not read
+    again."""
+    subdir_paths = list(iter_subdir_paths(filepath, sort=True))
+    local_paths = [local_path for local_path, _ in subdir_paths]
+    file_infos = [None] * len(local_paths)
+    if cache is not None:
+        fingerprints = [cache.fingerprint(p) for p in local_paths]
+        file_infos = [cache.get(fp, algorithms, analyzed=not skip_analysis)
+                      for fp in fingerprints]
+        # Fingerprints already include the size, don't stat files again
+        lengths = [fp[1] for fp in fingerprints]
+    else:
+        lengths = [os.stat(p).st_size for p in local_paths]
+    missing = [idx for idx, info in enumerate(file_infos) if info is None]
+    analyze = functools.partial(analyze_file, algorithms=algorithms,
+                                skip_analysis=skip_analysis)
+    missing_paths = [local_paths[idx] for idx in missing]
+    if not workers or workers <= 1 or len(missing_paths) <= 1:
+        results = [analyze(path) for path in missing_paths]
+    else:
+        log.debug('Generating manifest for {} files with {} workers'
+                  ''.format(len(missing_paths), workers))
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(analyze, missing_paths))
+    for idx, info in zip(missing, results):
+        file_infos[idx] = info
+    if cache is not None and missing:
+        cache.update([(fingerprints[idx], file_infos[idx]) for idx in missing],
+                     analyzed=not skip_analysis)
+    return [gen_remote_file_manifest_entry(subfile, remote_short_path, url,
+                                           info, length)
+            for (subfile, remote_short_path), info, length
+            in zip(subdir_paths, file_infos, lengths)]
+
+
+def analyze_file(subfile, algorithms=DEFAULT_HASH_ALGORITHMS,
+                 skip_analysis=True):
+    """Hash, detect the mimetype, and optionally analyze a single local file.
+    Returns a dict with a checksum for each algorithm, 'mime_type' and
+    'field_metadata'."""
+    file_info = compute_checksums(subfile, algorithms)
+    mimetype = analysis.mimetypes.detect_type(subfile)
+    file_info['field_metadata'] = (analysis.analyze_dataframe(subfile,
+                                                              mimetype)
+                                   if not skip_analysis else {})
+    file_info['mime_type'] = mimetype
+    return file_info
+
+
+def gen_remote_file_manifest_entry(subfile, remote_short_path, url,
+                                   file_info, length):
+    """Combine info from analyze_file with the location and size of the
+    file to produce a single remote file manifest entry."""
+    rfm = dict(file_info)
+    rfm.update({
+        'filename': os.path.basename(subfile),
+        'url': os.path.join(os.path.dirname(url), remote_short_path),
+        'length': length,
+    })
+    return rfm
 
 
 def get_files(path):
     """Walk a directory to get all files in a directory. """
+    return list(iter_files(path))
+
+
+def iter_files(path, sort=False, include=None, exclude=None):
+    """Walk a directory and yield each file as it is found, without holding
+    the full listing in memory. If path is a file, only the file is yielded.
+    Symlinks to directories are not followed.
+    **Parameters**
+    ``path`` (*path string*)
+      A local file or directory
+    ``sort`` (*bool*)
+      Yield the contents of each directory ordered by name, so the output
+      is the same on every run
+    ``include`` (*list*)
+      Glob patterns. If given, only files with a path relative to ``path``
+      matching one of the patterns are yielded.
+    ``exclude`` (*list*)
+      Glob patterns. Files and directories with a relative path matching
+      any of these are skipped.
+    **Examples**
+    >>> list(iter_files('my_dir', sort=True, include=['*.tsv']))
+    ['my_dir/a.tsv', 'my_dir/folder/b.tsv']
+    """
     if os.path.isfile(path):
-        return [path]
-    else:
-        file_lists = [[os.path.join(dirpath, f) for f in files]
-                      for dirpath, _, files in os.walk(path)]
-        # Flatten list of lists into a single list
-        return [item for sublist in file_lists for item in sublist]
+        name = os.path.basename(path)
+        if path_matches(name, include, exclude):
+            yield path
+        return
+    dirs = [(path, '')]
+    while dirs:
+        dirpath, rel_dir = dirs.pop()
+        try:
+            with os.scandir(dirpath) as scanner:
+                entries = sorted(scanner, key=lambda e: e.name) if sort \
+                    else list(scanner)
+        except OSError:
+            log.debug('Unable to scan {}'.format(dirpath), exc_info=True)
+            continue
+        subdirs = []
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            if entry.is_dir():
+                if not entry.is_symlink() and \
+                        path_matches(rel_path, exclude=exclude):
+                    subdirs.append((entry.path, rel_path))
+            elif path_matches(rel_path, include, exclude):
+                yield entry.path
+        # Reversed so the first subdirectory is popped first
+        dirs.extend(reversed(subdirs))
+
+
+def path_matches(path, include=None, exclude=None):
+    """Check a path against include and exclude glob patterns. Returns True
+    if the path matches any include pattern (or none were given) and does
+    not match any exclude pattern."""
+    if include and not any(fnmatch.fnmatch(path, p) for p in include):
+        return False
+    if exclude and any(fnmatch.fnmatch(path, p) for p in exclude):
+        return False
+    return True
 
 
 def get_subdir_paths(path):
     """Walk a directory to get all files, but return both the real path and
     the relative short_path. the short_path can be passed to the pilot client
     path methods to get the fully resolved remote path of the file."""
+    return list(iter_subdir_paths(path))
+
+
+def iter_subdir_paths(path, sort=False, include=None, exclude=None):
+    """Generator version of get_subdir_paths. Yields (local_path, short_path)
+    tuples as files are found. Accepts the same options as iter_files."""
     local_path = os.path.dirname(path)
-    return [(local_abspath, local_abspath.replace(local_path, '').lstrip('/'))
-            for local_abspath in get_files(path)]
+    for local_abspath in iter_files(path, sort=sort, include=include,
+                                    exclude=exclude):
+        yield local_abspath, local_abspath[len(local_path):].lstrip('/')
 
 
 def compute_checksum(file_path, algorithm, block_size=65536):
@@ -534,3 +746,79 @@ def compute_checksum(file_path, algorithm, block_size=65536):
             buf = open_file.read(block_size)
     open_file.close()
     return algorithm.hexdigest()
+
+
+def compute_checksums(file_path, algorithms=DEFAULT_HASH_ALGORITHMS,
+                      block_size=DEFAULT_HASH_BLOCK_SIZE):
+    """Compute several checksums for a file while only reading it once.
+    Returns a dict mapping each algorithm name to its hex digest.
+    **Parameters**
+    ``file_path`` (*path string*)
+      Path to a file on the local system
+    ``algorithms`` (*list*)
+      Names of hashlib algorithms, such as ['sha256', 'md5']
+    ``block_size`` (*int*)
+      Number of bytes read from the file at a time. A single buffer of this
+      size is reused for the whole file.
+    **Examples**
+    >>> compute_checksums('foo.txt', ['sha256', 'md5'])
+    {'sha256': 'e3b0c442...', 'md5': 'd41d8cd9...'}
+    """
+    hashers = {alg: hashlib.new(alg) for alg in algorithms}
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    with open(os.path.abspath(file_path), 'rb', buffering=0) as open_file:
+        num_read = open_file.readinto(buf)
+        while num_read:
+            chunk = view[:num_read]
+            for hasher in hashers.values():
+                hasher.update(chunk)
+            num_read = open_file.readinto(buf)
+    return {alg: hasher.hexdigest() for alg, hasher in hashers.items()}
+
+
+def split_gmeta_list(gmeta_list_doc, max_bytes=MAX_INGEST_BYTES,
+                     max_entries=MAX_INGEST_ENTRIES):
+    """Split a GMetaList document into several, each with at most
+    max_entries entries and at most max_bytes when serialized to json. An
+    entry too large to fit on its own is put in a batch by itself, and
+    will be rejected by Search."""
+    gmeta = gmeta_list_doc['ingest_data']['gmeta']
+    envelope = copy.deepcopy(gmeta_list_doc)
+    envelope['ingest_data']['gmeta'] = []
+    yield from batch_gmeta_entries(gmeta, envelope, max_bytes=max_bytes,
+                                   max_entries=max_entries)
+    if not gmeta:
+        yield envelope
+
+
+def batch_gmeta_entries(entries, envelope=None, max_bytes=MAX_INGEST_BYTES,
+                        max_entries=MAX_INGEST_ENTRIES):
+    """Group an iterable of GMeta entries into GMetaList documents with the
+    same limits as split_gmeta_list(). Entries are consumed lazily, so a
+    batch can be ingested while later entries are still being built."""
+    envelope = envelope or GMETA_LIST
+    envelope_size = len(json.dumps(envelope).encode('utf-8'))
+
+    def make_doc(entries):
+        doc = copy.deepcopy(envelope)
+        doc['ingest_data']['gmeta'] = entries
+        return doc
+
+    batch, batch_size = [], envelope_size
+    for entry in entries:
+        # Each entry after the first also adds a ', ' separator
+        entry_size = len(json.dumps(entry).encode('utf-8')) + 2
+        if batch and batch_size + entry_size > max_bytes:
+            yield make_doc(batch)
+            batch, batch_size = [], envelope_size
+        if envelope_size + entry_size > max_bytes:
+            log.warning('Search entry {} is larger than the ingest limit of '
+                        '{} bytes'.format(entry.get('subject'), max_bytes))
+        batch.append(entry)
+        batch_size += entry_size
+        if len(batch) >= max_entries:
+            yield make_doc(batch)
+            batch, batch_size = [], envelope_size
+    if batch:
+        yield make_doc(batch)
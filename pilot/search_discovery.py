@@ -5,6 +5,142 @@ import logging
 log = logging.getLogger(__name__)
 
 
+class _Node:
+    __slots__ = ['children', 'entry', 'files']
+
+    def __init__(self):
+        self.children = {}
+        self.entry = None
+        self.files = []
+
+
+def split_path(path):
+    """Split a subject, url or path into its components, ignoring empty
+    components so trailing and repeated slashes don't matter."""
+    return [part for part in path.split('/') if part]
+
+
+class SubjectIndex:
+    """
+    A trie of search entry subjects and the paths of the files within each
+    entry. Finding which entry owns a subject, or which files are under a
+    path, takes one step per path component no matter how many entries are
+    in the index. Build one index to look up many subjects against the same
+    set of entries.
+
+    >>> index = SubjectIndex(pc.list_entries())
+    >>> index.get_owner(pc.get_subject_url('my_dir/foo.txt'))
+      {'subject': 'globus://<endpoint>/<project_path>/my_dir', ...}
+    """
+
+    def __init__(self, entries=None):
+        self.subjects = _Node()
+        self.file_paths = _Node()
+        self.entries = 0
+        for entry in entries or []:
+            self.add(entry)
+
+    def __len__(self):
+        return self.entries
+
+    @staticmethod
+    def _insert(root, parts):
+        node = root
+        for part in parts:
+            node = node.children.setdefault(part, _Node())
+        return node
+
+    def add(self, entry):
+        """Add a search entry. An entry with the same subject as one already
+        in the index replaces it."""
+        node = self._insert(self.subjects, split_path(entry['subject']))
+        if node.entry is None:
+            self.entries += 1
+        node.entry = entry
+        content = entry.get('content') or [{}]
+        for finfo in content[0].get('files', []):
+            path = urllib.parse.urlparse(finfo.get('url', '')).path
+            file_node = self._insert(self.file_paths, split_path(path))
+            file_node.files.append((entry['subject'], finfo))
+
+    def get_owner(self, subject):
+        """Get the entry whose subject is the given subject or the closest
+        directory above it, or None. See get_entry_with_matching_subject()
+        """
+        node, owner = self.subjects, None
+        for part in split_path(subject):
+            node = node.children.get(part)
+            if node is None:
+                break
+            owner = node.entry or owner
+        return owner
+
+    def get_owners(self, subjects):
+        """Same as get_owner() for many subjects at once, returning a dict
+        of each subject to its owning entry or None. Subjects are visited in
+        sorted order so components shared with the previous subject are not
+        walked again."""
+        owners = {}
+        # Each item is the (component, node, owner) reached at that depth
+        path = []
+        for subject in sorted(set(subjects)):
+            parts = split_path(subject)
+            depth = 0
+            while (depth < len(path) and depth < len(parts) and
+                   path[depth][0] == parts[depth]):
+                depth += 1
+            del path[depth:]
+            node, owner = path[-1][1:] if path else (self.subjects, None)
+            for part in parts[depth:]:
+                node = node and node.children.get(part)
+                owner = (node and node.entry) or owner
+                path.append((part, node, owner))
+            owners[subject] = owner
+        return owners
+
+    def iter_files(self, prefix, subject=None):
+        """Iterate over (subject, file info) for every file at or below
+        the path of ``prefix``, which can be a subject, url or plain path.
+        If ``subject`` is given, only files in that entry are included."""
+        node = self.file_paths
+        for part in split_path(urllib.parse.urlparse(prefix).path):
+            node = node.children.get(part)
+            if node is None:
+                return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for file_subject, finfo in node.files:
+                if subject is None or file_subject == subject:
+                    yield file_subject, finfo
+            stack.extend(node.children.values())
+
+    def get_files(self, prefix, subject=None):
+        """List the file info for every file at or below a path. See
+        iter_files()"""
+        return [finfo for _, finfo in self.iter_files(prefix, subject)]
+
+    def get_sub(self, subject, precise=True):
+        """See get_sub_in_collection()"""
+        entry = self.get_owner(subject)
+        if entry is None or precise is False:
+            return entry
+        for _, finfo in self.iter_files(subject, entry['subject']):
+            log.debug('Found specific file in entry: {}'
+                      ''.format(finfo.get('url')))
+            return entry
+
+    def get_subs(self, subjects, precise=True):
+        """Same as get_sub() for many subjects at once, returning a dict of
+        each subject to its entry or None."""
+        owners = self.get_owners(subjects)
+        if precise is True:
+            for sub, owner in owners.items():
+                if owner and not any(self.iter_files(sub, owner['subject'])):
+                    owners[sub] = None
+        return owners
+
+
 def get_sub_in_collection(subject, entries, precise=True):
     """
     Look for a subject in a bunch of search entries.
@@ -17,7 +153,8 @@ def get_sub_in_collection(subject, entries, precise=True):
     ``subject`` (*string*)
       A Globus Search URL
     ``entries`` (*string*)
-      A list of Globus Search GMeta entries.
+      A list of Globus Search GMeta entries, or a SubjectIndex of them. Pass
+      a SubjectIndex when looking up many subjects in the same entries.
     ``precise`` (*bool*)
       If the path given points to a location inside a multi-file directory
       only return the record if the location matches a file.
@@ -27,16 +164,9 @@ def get_sub_in_collection(subject, entries, precise=True):
       returned. If precise=False and the path is my_dir/foo4.txt, the
       "my_dir" record will still be returned.
     """
-    entry = get_entry_with_matching_subject(entries, subject)
-    if entry is None or precise is False:
-        return entry
-    urls = [m.get('url') for m in entry['content'][0].get('files', [])]
-    sub_path = urllib.parse.urlparse(subject).path
-    for url in urls:
-        log.debug('Checking {}'.format(url))
-        if sub_path in url:
-            log.debug('Found specific file in entry: {}'.format(url))
-            return entry
+    if not isinstance(entries, SubjectIndex):
+        entries = SubjectIndex(entries)
+    return entries.get_sub(subject, precise=precise)
 
 
 def get_entry_with_matching_subject(entries, subject):
@@ -54,17 +184,13 @@ def get_entry_with_matching_subject(entries, subject):
     to happen. globus://foo-project-endpoint/foo_subject/bar.txt will return
     a match whether or not 'bar.txt' exists in the 'files' manifest.
     """
-    sub_map, directory = {ent['subject']: ent for ent in entries}, subject
-    # If the given subject is a path within a search entry, this will derive
-    # which subject its part of.
-    while directory and directory not in sub_map.keys():
-        directory = os.path.dirname(directory)
-
-    matches = list(filter(lambda sub: sub == directory, sub_map.keys()))
-    if len(matches) == 1:
-        return sub_map[matches[0]]
-    log.debug('Match Fail: Sub {} matched {}/{} subs, not 1: {}'
-              ''.format(subject, len(matches), len(entries), matches))
+    if not isinstance(entries, SubjectIndex):
+        entries = SubjectIndex(entries)
+    entry = entries.get_owner(subject)
+    if entry is None:
+        log.debug('Match Fail: Sub {} matched none of {} subs'
+                  ''.format(subject, len(entries)))
+    return entry
 
 
 def get_matching_file(url, entry):
@@ -0,0 +1,199 @@
+"""
+search_ingest.py submits ingest documents to Globus Search and tracks the
+resulting tasks in the background. Several tasks can be in flight at once,
+and their status is checked together with a single task list request where
+possible. Checks back off while nothing finishes, so large loads are limited
+by how fast Search processes tasks rather than by polling round-trips.
+"""
+import logging
+import threading
+import concurrent.futures
+
+from pilot import exc
+
+log = logging.getLogger(__name__)
+
+
+class IngestPipeline:
+    """
+    Submit gmeta documents to a search index, with at most ``max_in_flight``
+    ingest tasks submitted but not yet finished. ``submit()`` returns a
+    future which resolves to the finished task document, or raises a
+    PilotClientException if the task failed. Use as a context manager, or
+    call ``join()`` to wait for everything submitted so far.
+
+    >>> with IngestPipeline(sc, index) as pipeline:
+    >>>     for gmeta in gmetas:
+    >>>         pipeline.submit(gmeta)
+    >>> pipeline.get_report()
+    """
+    PENDING_STATES = ['PENDING', 'PROGRESS']
+    DEFAULT_MAX_IN_FLIGHT = 4
+    # Give up on pending tasks after this many checks fail in a row
+    DEFAULT_MAX_POLL_ERRORS = 5
+
+    def __init__(self, search_client, index,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, poll_interval=.2,
+                 max_poll_interval=5.0, backoff=1.5,
+                 max_poll_errors=DEFAULT_MAX_POLL_ERRORS):
+        self.search_client = search_client
+        self.index = index
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.max_poll_errors = max_poll_errors
+        self.poll_errors = 0
+        self.submissions = []
+        self.pending = {}
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.condition = threading.Condition()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_in_flight)
+        self.poller = None
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.join()
+
+    def submit(self, gmeta):
+        """Submit a gmeta document for ingest. Blocks while max_in_flight
+        tasks are still running."""
+        if self.closed:
+            raise RuntimeError('Cannot submit to a closed ingest pipeline')
+        self.slots.acquire()
+        future = concurrent.futures.Future()
+        submission = {'batch': len(self.submissions), 'task_id': None,
+                      'future': future}
+        self.submissions.append(submission)
+        self.executor.submit(self._ingest, gmeta, submission)
+        return future
+
+    def _ingest(self, gmeta, submission):
+        try:
+            result = self.search_client.ingest(self.index, gmeta)
+        except Exception as e:
+            self._finish(submission, error=e)
+            return
+        log.debug('Submitted ingest task {}'.format(result['task_id']))
+        with self.condition:
+            submission['task_id'] = result['task_id']
+            self.pending[result['task_id']] = submission
+            if self.poller is None:
+                self.poller = threading.Thread(target=self._poll_loop,
+                                               daemon=True)
+                self.poller.start()
+            self.condition.notify()
+
+    def _finish(self, submission, task=None, error=None):
+        self.slots.release()
+        if error is not None:
+            submission['future'].set_exception(error)
+        else:
+            submission['future'].set_result(task)
+
+    def _poll_loop(self):
+        interval = self.poll_interval
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                task_ids = list(self.pending)
+            if self.poll(task_ids):
+                interval = self.poll_interval
+            else:
+                interval = min(interval * self.backoff,
+                               self.max_poll_interval)
+            with self.condition:
+                if self.pending:
+                    log.debug('{} search tasks still pending'
+                              ''.format(len(self.pending)))
+                    self.condition.wait(interval)
+
+    def get_task_states(self, task_ids):
+        """Fetch task documents for each of the task ids. When more than one
+        task is pending, they are fetched with one task list request, and
+        only tasks missing from it are fetched individually."""
+        tasks = {}
+        if len(task_ids) > 1:
+            try:
+                task_list = self.search_client.get_task_list(self.index)
+                tasks = {t['task_id']: t for t in task_list['tasks']
+                         if t['task_id'] in task_ids}
+            except Exception:
+                # Only an optimization, each task can still be fetched below
+                log.debug('Failed to list search tasks', exc_info=True)
+        for task_id in task_ids:
+            if task_id not in tasks:
+                tasks[task_id] = self.search_client.get_task(task_id)
+        return tasks
+
+    def poll(self, task_ids):
+        """Check the given tasks once, resolving futures for any which have
+        finished. Returns the number of tasks which finished.
+
+        Errors checking tasks are retried on the following polls, which back
+        off as usual. Only after ``max_poll_errors`` checks fail in a row are
+        the pending tasks failed with the last error."""
+        try:
+            tasks = self.get_task_states(task_ids)
+            self.poll_errors = 0
+        except Exception as e:
+            self.poll_errors += 1
+            if self.poll_errors < self.max_poll_errors:
+                log.warning('Failed to check search tasks ({}/{}), will retry'
+                            ''.format(self.poll_errors, self.max_poll_errors),
+                            exc_info=True)
+                return 0
+            # Tasks can't be tracked without Search, fail them all
+            tasks = {task_id: e for task_id in task_ids}
+        finished = 0
+        for task_id, task in tasks.items():
+            if not isinstance(task, Exception):
+                task = getattr(task, 'data', task)
+                if task['state'] in self.PENDING_STATES:
+                    continue
+            with self.condition:
+                submission = self.pending.pop(task_id)
+            finished += 1
+            if isinstance(task, Exception):
+                self._finish(submission, error=task)
+            elif task['state'] != 'SUCCESS':
+                log.error(task)
+                self._finish(submission, error=exc.PilotClientException(
+                    'Failed to ingest search subject: {}'
+                    ''.format(task.get('message'))))
+            else:
+                self._finish(submission, task=task)
+        return finished
+
+    def join(self):
+        """Wait for every submitted task to finish, then stop the pipeline.
+        Returns a report for each submission, see ``get_report()``."""
+        concurrent.futures.wait([s['future'] for s in self.submissions])
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.executor.shutdown()
+        return self.get_report()
+
+    def get_report(self):
+        """Returns a list of dicts in the order things were submitted, each
+        with the 'batch' number, 'task_id', 'state' ('SUCCESS', 'FAILED' or
+        'PENDING') and an 'error' message if it failed."""
+        report = []
+        for sub in self.submissions:
+            future = sub['future']
+            if not future.done():
+                state, error = 'PENDING', None
+            elif future.exception():
+                state, error = 'FAILED', str(future.exception())
+            else:
+                state, error = 'SUCCESS', None
+            report.append({'batch': sub['batch'], 'task_id': sub['task_id'],
+                           'state': state, 'error': error})
+        return report
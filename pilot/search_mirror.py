@@ -0,0 +1,182 @@
+"""
+search_mirror.py keeps a local copy of the search records for pilot
+projects, so listing and describing records can be answered without a round
+trip to Globus Search. Each record is stored once by subject with its full
+content, alongside indexed columns for the path, version, size, mimetypes
+and last modified date. The mirror is kept up to date incrementally with
+PilotClient.sync_search_mirror().
+"""
+import os
+import json
+import time
+import sqlite3
+import urllib
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class SearchMirror:
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.filename,
+                                               check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS records ('
+                'subject TEXT PRIMARY KEY, project TEXT, path TEXT, '
+                'version TEXT, size INTEGER, mime_types TEXT, '
+                'modified TEXT, content TEXT, synced REAL)'
+            )
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS records_project_path '
+                'ON records (project, path)'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS syncs ('
+                'project TEXT PRIMARY KEY, synced REAL, modified TEXT)'
+            )
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def get_row(project, entry, synced):
+        """Build a database row for a search entry. Indexed columns are taken
+        from the first content item."""
+        content = entry['content'][0] if entry.get('content') else {}
+        files = content.get('files', [])
+        dates = [d.get('date') for d in content.get('dc', {}).get('dates', [])
+                 if d.get('date')]
+        mime_types = sorted({f['mime_type'] for f in files
+                             if f.get('mime_type')})
+        return (
+            entry['subject'],
+            project,
+            urllib.parse.urlparse(entry['subject']).path,
+            content.get('dc', {}).get('version'),
+            sum(f.get('length') or 0 for f in files),
+            json.dumps(mime_types),
+            max(dates) if dates else None,
+            json.dumps(entry.get('content', [])),
+            synced,
+        )
+
+    @staticmethod
+    def get_entry(subject, content):
+        return {'subject': subject, 'content': json.loads(content)}
+
+    def update(self, project, entries, synced=None):
+        """Save or replace search entries for a project. Entries may be any
+        iterable, including a generator of search results. Returns the number
+        of entries saved."""
+        synced = synced or time.time()
+        rows = (self.get_row(project, ent, synced) for ent in entries)
+        with self.connection:
+            cur = self.connection.executemany(
+                'INSERT OR REPLACE INTO records (subject, project, path, '
+                'version, size, mime_types, modified, content, synced) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+        return cur.rowcount
+
+    def remove(self, subjects):
+        """Remove records by subject"""
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM records WHERE subject = ?',
+                [(sub,) for sub in subjects]
+            )
+
+    def prune(self, project, synced_before):
+        """Remove records for a project which were last synced before the
+        given time. After a full sync, these no longer exist in search.
+        Returns the number of records removed."""
+        with self.connection:
+            cur = self.connection.execute(
+                'DELETE FROM records WHERE project = ? AND synced < ?',
+                (project, synced_before)
+            )
+        log.debug('Pruned {} records from {}'.format(cur.rowcount, project))
+        return cur.rowcount
+
+    def clear(self, project=None):
+        """Remove all records and sync history, or only those of a project"""
+        with self.connection:
+            if project is None:
+                self.connection.execute('DELETE FROM records')
+                self.connection.execute('DELETE FROM syncs')
+            else:
+                self.connection.execute(
+                    'DELETE FROM records WHERE project = ?', (project,))
+                self.connection.execute(
+                    'DELETE FROM syncs WHERE project = ?', (project,))
+
+    def get(self, subject):
+        """Get the search entry for an exact subject, or None"""
+        row = self.connection.execute(
+            'SELECT subject, content FROM records WHERE subject = ?',
+            (subject,)
+        ).fetchone()
+        return self.get_entry(*row) if row else None
+
+    def get_parent(self, subject):
+        """Get the entry for the closest directory above a subject which has
+        one, or None."""
+        parents, directory = [], os.path.dirname(subject.rstrip('/'))
+        while directory and directory not in parents and '/' in directory:
+            parents.append(directory)
+            directory = os.path.dirname(directory)
+        if not parents:
+            return None
+        row = self.connection.execute(
+            'SELECT subject, content FROM records WHERE subject IN ({}) '
+            'ORDER BY length(subject) DESC LIMIT 1'
+            ''.format(', '.join('?' * len(parents))), parents
+        ).fetchone()
+        return self.get_entry(*row) if row else None
+
+    def iter_entries(self, project, path=''):
+        """Iterate over entries in a project, ordered by subject, where the
+        subject contains the given path."""
+        cur = self.connection.execute(
+            'SELECT subject, content FROM records WHERE project = ? AND '
+            'instr(subject, ?) > 0 ORDER BY subject', (project, path)
+        )
+        for subject, content in cur:
+            yield self.get_entry(subject, content)
+
+    def count(self, project):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM records WHERE project = ?', (project,)
+        ).fetchone()[0]
+
+    def get_newest_modified(self, project):
+        """The most recent 'Created' or 'Updated' date of any record"""
+        return self.connection.execute(
+            'SELECT max(modified) FROM records WHERE project = ?', (project,)
+        ).fetchone()[0]
+
+    def get_last_sync(self, project):
+        """Returns (sync time, newest modified date) of the last sync for a
+        project, or None if the project was never synced."""
+        row = self.connection.execute(
+            'SELECT synced, modified FROM syncs WHERE project = ?',
+            (project,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def set_last_sync(self, project, synced, modified):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO syncs (project, synced, modified) '
+                'VALUES (?, ?, ?)', (project, synced, modified)
+            )
@@ -1,59 +1,199 @@
+"""
+transfer_log.py keeps a record of Globus Transfer tasks started by pilot, so
+their status can be checked later with 'pilot status'. Logs are kept in an
+sqlite database alongside the config file, indexed by task id and status.
+Older versions of pilot kept logs in the 'transfer_log' section of the config
+itself, those are moved into the database the first time it is opened.
+"""
 import time
+import sqlite3
+import threading
 import datetime
 import logging
 
-from pilot import config
-
 log = logging.getLogger(__name__)
 
 
-class TransferLog(config.ConfigSection):
+class TransferLog:
 
     SECTION = 'transfer_log'
     TRANSFER_LOG_FIELDS = ['dataframe', 'status', 'task_id', 'start_time']
+    # Tasks in these states will not change again, and may be dropped once
+    # they are past the limits below.
+    INACTIVE_STATES = ['SUCCEEDED', 'FAILED', 'CANCELED']
+    # Keep at most this many finished tasks
+    DEFAULT_MAX_ENTRIES = 10000
+    # Drop finished tasks started more than this many seconds ago (1 year)
+    DEFAULT_MAX_AGE = 60 * 60 * 24 * 365
 
-    def _save_log(self, log_id, log_dict):
-        if isinstance(log_dict['start_time'], datetime.datetime):
-            timestamp = log_dict['start_time'].timestamp()
-            log_dict['start_time'] = str(int(timestamp))
-        field_list = [log_dict.get(f) for f in self.TRANSFER_LOG_FIELDS]
-        log_data = ','.join(field_list)
-        self.save_option(str(log_id), log_data)
+    def __init__(self, config, filename=None,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_age=DEFAULT_MAX_AGE):
+        """
+        ``config`` is only used to migrate logs from older versions of pilot.
+        If ``filename`` is None, logs are kept in memory.
+        """
+        self.config = config
+        self.filename = filename or ':memory:'
+        self.max_entries = max_entries
+        self.max_age = max_age
+        # Uploads may log tasks from a worker thread, so the connection is
+        # shared between threads and only used while holding the lock.
+        self.lock = threading.RLock()
+        self._connection = None
 
-    def add_log(self, transfer_result, datapath):
-        cfg = self.config.load()
-        last_id = max([int(i) for i in cfg['transfer_log'].keys()] or [-1])
-        log_id = str(last_id + 1)
-        log_data = [
-            datapath,
-            transfer_result.data['code'],
-            transfer_result.data['task_id'],
-            str(int(time.time()))
-        ]
-        self._save_log(log_id, dict(zip(self.TRANSFER_LOG_FIELDS, log_data)))
-        log.debug('Log saved successfully.')
+    @property
+    def connection(self):
+        with self.lock:
+            if self._connection is None:
+                self._open()
+            return self._connection
 
-    def get_log(self):
-        cfg = self.config.load()
-        if 'transfer_log' not in cfg:
-            return []
+    def _open(self):
+        self._connection = sqlite3.connect(self.filename,
+                                           check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS transfers ('
+            'id INTEGER PRIMARY KEY, dataframe TEXT, status TEXT, '
+            'task_id TEXT, start_time INTEGER)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS transfers_task_id '
+            'ON transfers (task_id)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS transfers_status '
+            'ON transfers (status)'
+        )
+        self.migrate_config_logs()
 
-        logs = []
-        for log_id, data in dict(cfg['transfer_log']).items():
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def migrate_config_logs(self):
+        """Move logs from the 'transfer_log' section of the config into the
+        database, keeping their ids. The section is removed afterwards."""
+        cfg = self.config.load()
+        if self.SECTION not in cfg:
+            return
+        rows = []
+        for log_id, data in dict(cfg[self.SECTION]).items():
             tlog = dict(zip(self.TRANSFER_LOG_FIELDS, data.split(',')))
-            tlog['id'] = int(log_id)
-            timestamp = int(tlog['start_time'])
-            tlog['start_time'] = datetime.datetime.fromtimestamp(timestamp)
-            logs.append(tlog)
-        logs.sort(key=lambda l: l['id'], reverse=True)
-        return logs
+            rows.append((int(log_id), tlog['dataframe'], tlog['status'],
+                         tlog['task_id'], int(tlog['start_time'])))
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO transfers '
+                '(id, dataframe, status, task_id, start_time) '
+                'VALUES (?, ?, ?, ?, ?)', rows
+            )
+        del cfg[self.SECTION]
+        self.config.save(cfg)
+        log.debug('Migrated {} transfer logs out of the config'
+                  ''.format(len(rows)))
+
+    @staticmethod
+    def _to_log(row):
+        tlog = dict(zip(['id'] + TransferLog.TRANSFER_LOG_FIELDS, row))
+        tlog['start_time'] = datetime.datetime.fromtimestamp(
+            tlog['start_time'])
+        return tlog
+
+    def add_log(self, transfer_result, datapath):
+        self.add_logs([transfer_result], datapath)
+
+    def add_logs(self, transfer_results, datapath):
+        """Log several transfer tasks for the same datapath at once. When
+        there is more than one task, each is logged with its part number,
+        such as 'foo/bar (2/3)'."""
+        now = int(time.time())
+        rows = []
+        for num, transfer_result in enumerate(transfer_results, start=1):
+            name = datapath
+            if len(transfer_results) > 1:
+                name = '{} ({}/{})'.format(datapath, num,
+                                           len(transfer_results))
+            rows.append((name, transfer_result.data['code'],
+                         transfer_result.data['task_id'], now))
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT INTO transfers (dataframe, status, task_id, '
+                'start_time) VALUES (?, ?, ?, ?)', rows
+            )
+        self.evict()
+        log.debug('Log saved successfully.')
+
+    def get_log(self, limit=None, status=None):
+        """Get logs, newest first. ``limit`` is the most logs to return,
+        and ``status`` restricts them to tasks with that status."""
+        query = ('SELECT id, dataframe, status, task_id, start_time '
+                 'FROM transfers')
+        params = []
+        if status is not None:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [self._to_log(row) for row in rows]
 
     def get_log_by_task(self, task_id):
-        for tlog in self.get_log():
-            if tlog['task_id'] == task_id:
-                return tlog
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT id, dataframe, status, task_id, start_time '
+                'FROM transfers WHERE task_id = ? ORDER BY id DESC',
+                (task_id,)
+            ).fetchone()
+        return self._to_log(row) if row else None
 
     def update_log(self, task_id, new_status):
-        tlog = self.get_log_by_task(task_id)
-        tlog['status'] = new_status
-        self._save_log(tlog['id'], tlog)
+        self.update_logs({task_id: new_status})
+
+    def update_logs(self, statuses):
+        """Update the status of many tasks at once. ``statuses`` is a dict of
+        task ids to their new status. Returns the number of logs which
+        changed."""
+        with self.lock, self.connection:
+            cur = self.connection.executemany(
+                'UPDATE transfers SET status = ? '
+                'WHERE task_id = ? AND status != ?',
+                [(status, task_id, status)
+                 for task_id, status in statuses.items()]
+            )
+        return cur.rowcount
+
+    def evict(self):
+        """Remove finished tasks older than max_age, then the oldest finished
+        tasks beyond max_entries. Tasks which may still be running are always
+        kept."""
+        inactive = ','.join('?' for _ in self.INACTIVE_STATES)
+        with self.lock, self.connection:
+            if self.max_age is not None:
+                self.connection.execute(
+                    'DELETE FROM transfers WHERE start_time < ? AND '
+                    'status IN ({})'.format(inactive),
+                    [time.time() - self.max_age] + self.INACTIVE_STATES
+                )
+            if self.max_entries is not None:
+                self.connection.execute(
+                    'DELETE FROM transfers WHERE id IN ('
+                    'SELECT id FROM transfers WHERE status IN ({}) '
+                    'ORDER BY id DESC LIMIT -1 OFFSET ?)'.format(inactive),
+                    self.INACTIVE_STATES + [self.max_entries]
+                )
+
+    def compact(self):
+        """Evict old tasks and reclaim the space they used on disk"""
+        self.evict()
+        with self.lock:
+            self.connection.execute('VACUUM')
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM transfers').fetchone()[0]
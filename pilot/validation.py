@@ -6,13 +6,13 @@ BASE_DIR = os.path.dirname(__file__)
 BASE_SCHEMA_DIR = os.path.join(BASE_DIR, 'schemas')
 
 
-def get_schemas():
+def get_schemas(schema_dir=BASE_SCHEMA_DIR):
     schemas = {}
-    files = [f for f in os.listdir(BASE_SCHEMA_DIR)
+    files = [f for f in os.listdir(schema_dir)
              if os.path.splitext(f)[1] == '.json']
 
     for f in files:
-        fname = os.path.join(BASE_SCHEMA_DIR, f)
+        fname = os.path.join(schema_dir, f)
         with open(fname) as fh:
             sname, _ = os.path.splitext(f)
             try:
@@ -22,6 +22,56 @@ def get_schemas():
     return schemas
 
 
+class ValidatorRegistry:
+    """
+    Loads the schemas in a directory once and builds a validator for each
+    one the first time it's needed. Every schema is pre-loaded into the
+    resolver store, so $refs to other schemas in the directory are resolved
+    from memory instead of re-reading files.
+    """
+
+    def __init__(self, schema_dir=BASE_SCHEMA_DIR):
+        self.schema_dir = schema_dir
+        self._schemas = None
+        self._validators = {}
+
+    @property
+    def schemas(self):
+        if self._schemas is None:
+            self._schemas = get_schemas(self.schema_dir)
+        return self._schemas
+
+    def get_uri(self, name):
+        return 'file://{}/{}.json'.format(self.schema_dir, name)
+
+    def get_validator(self, name):
+        if name not in self._validators:
+            schema = self.schemas[name]
+            store = {self.get_uri(n): s for n, s in self.schemas.items()}
+            resolver = jsonschema.RefResolver(base_uri=self.get_uri(name),
+                                              referrer=schema, store=store)
+            cls = jsonschema.validators.validator_for(schema)
+            cls.check_schema(schema)
+            self._validators[name] = cls(schema, resolver=resolver)
+        return self._validators[name]
+
+    def validate(self, name, instance):
+        """Raise the most relevant jsonschema.ValidationError if the instance
+        is invalid, the same as jsonschema.validate()"""
+        validator = self.get_validator(name)
+        error = jsonschema.exceptions.best_match(
+            validator.iter_errors(instance))
+        if error is not None:
+            raise error
+
+    def clear(self):
+        self._schemas = None
+        self._validators = {}
+
+
+registry = ValidatorRegistry()
+
+
 def validate_dataset(dataset):
     validate_json('dataset', dataset)
 
@@ -31,9 +81,4 @@ def validate_user_provided_metadata(metadata):
 
 
 def validate_json(name, json):
-    schema = get_schemas()[name]
-    resolver = jsonschema.RefResolver(
-        base_uri="file://{}/{}".format(BASE_SCHEMA_DIR, name),
-        referrer=name
-    )
-    jsonschema.validate(schema=schema, resolver=resolver, instance=json)
+    registry.validate(name, json)
@@ -0,0 +1,45 @@
+"""
+Measure the cost of validating one search entry against the dataset schema.
+
+    python -m tests.benchmarks.validation [num_entries]
+
+'uncached' builds a new schema registry for every entry, which is what
+validation cost before validators were cached. 'cached' re-uses the
+module registry, as pilot.search.get_gmeta_list does today.
+"""
+import os
+import sys
+import json
+import time
+
+from pilot import validation
+
+ENTRY = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'unit',
+                     'files', 'schemas', 'dataset', 'valid-typical.json')
+
+
+def benchmark(validate, entries):
+    start = time.perf_counter()
+    for entry in entries:
+        validate(entry)
+    return (time.perf_counter() - start) / len(entries)
+
+
+def main(num_entries=1000):
+    with open(ENTRY) as fh:
+        entry = json.load(fh)
+    entries = [entry] * num_entries
+
+    def uncached(entry):
+        validation.ValidatorRegistry().validate('dataset', entry)
+
+    results = [
+        ('uncached', benchmark(uncached, entries)),
+        ('cached', benchmark(validation.validate_dataset, entries)),
+    ]
+    for name, per_entry in results:
+        print('{:<10}{:>10.1f} us/entry'.format(name, per_entry * 10 ** 6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -185,6 +185,7 @@ def mock_cli_basic(monkeypatch, mock_config, mock_projects, mock_contexts):
     pc.profile.config = mock_config
     pc.project.config = mock_config
     pc.project.current = 'foo-project'
+    pc._transfer_log = transfer_log.TransferLog(mock_config)
     # Sanity. This *should* always return True, but will fail if we update
     # tokens at a later time.
     assert pc.is_logged_in()
@@ -194,7 +195,7 @@ def mock_cli_basic(monkeypatch, mock_config, mock_projects, mock_contexts):
 @pytest.fixture
 def mock_transfer_log(monkeypatch):
     add_log = Mock()
-    monkeypatch.setattr(transfer_log.TransferLog, 'add_log', add_log)
+    monkeypatch.setattr(transfer_log.TransferLog, 'add_logs', add_log)
     return add_log
 
 
@@ -221,6 +222,33 @@ def mock_cli(mock_cli_basic, mock_transfer_client, mock_search_client,
     return mock_cli_basic
 
 
+@pytest.fixture
+def mock_search_entries(mock_cli, mock_search_client, monkeypatch):
+    """
+    Serve search entries by subject from the mock search client's
+    get_subject, raising a NotFound error for anything else. Returns a
+    function to set the list of entries.
+    """
+    class NotFound(Exception):
+        code = 'NotFound.Generic'
+
+    monkeypatch.setattr(globus_sdk, 'SearchAPIError', NotFound)
+    # Use the real get_full_search_entry instead of the mock_cli one
+    del mock_cli.get_full_search_entry
+    entries = {}
+
+    def get_subject(index, subject, query_params=None):
+        if subject not in entries:
+            raise NotFound()
+        return entries[subject]
+
+    def set_entries(new_entries):
+        entries.clear()
+        entries.update({ent['subject']: ent for ent in new_entries})
+    mock_search_client.get_subject.side_effect = get_subject
+    return set_entries
+
+
 @pytest.fixture
 def mock_paths(mock_cli):
     short_path = 'test_path'
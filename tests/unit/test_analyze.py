@@ -1,10 +1,13 @@
+import os
 import pytest
 import pandas
+import pyarrow.parquet
 from io import StringIO
+from unittest.mock import Mock
 from pilot.analysis import analyze_dataframe
 from pilot import exc
 
-from tests.unit.mocks import ANALYSIS_MIXED_FILES
+from tests.unit.mocks import ANALYSIS_MIXED_FILES, MIXED_BASE
 
 ANALYZABLE_MIMETYPES = [
     'text/csv', 'text/tab-separated-values',
@@ -115,3 +118,92 @@ def test_analyze_dataframe_with_unknown_mimetype(mixed_tsv):
 def test_analyze_unexpected_error():
     with pytest.raises(exc.AnalysisException):
         analyze_dataframe('does-not-exist', 'text/csv')
+
+
+def test_delimited_file_parsed_once(mixed_tsv, monkeypatch):
+    from pilot.analysis import pandas as pandalyze
+    read_csv = Mock(side_effect=pandas.read_csv)
+    monkeypatch.setattr(pandalyze.pd, 'read_csv', read_csv)
+    ana = analyze_dataframe(mixed_tsv, 'text/tab-separated-values')
+    assert read_csv.call_count == 1
+    assert ana['numrows'] == 99
+    assert ana['previewbytes'] == 75
+    for field in ana['field_definitions']:
+        assert field['format'] == 'default'
+
+
+def test_chunked_analysis_matches_in_memory(mixed_tsv, monkeypatch):
+    from pilot.analysis import pandas as pandalyze
+    full = pandalyze.analyze_delimited(
+        pandalyze.DelimitedFile(mixed_tsv, sep='\t'), chunked=False)
+    monkeypatch.setattr(pandalyze.DelimitedFile, 'CHUNKSIZE', 7)
+    monkeypatch.setattr(pandalyze, 'CHUNKED_ANALYSIS_MIN_BYTES', 0)
+    read_csv = Mock(side_effect=pandas.read_csv)
+    monkeypatch.setattr(pandalyze.pd, 'read_csv', read_csv)
+    chunked = analyze_dataframe(mixed_tsv, 'text/tab-separated-values')
+    assert read_csv.call_args[1]['chunksize'] == 7
+    assert chunked == full
+
+
+def test_streaming_accumulators_merge():
+    from pilot.analysis.streaming import ColumnAccumulator
+    series = pandas.Series(range(1000)).sample(frac=1, random_state=0)
+    whole, first, second = (ColumnAccumulator('n') for _ in range(3))
+    whole.update(series)
+    first.update(series[:400])
+    second.update(series[400:])
+    first.merge(second)
+    assert first.numeric.count == whole.numeric.count == 1000
+    assert first.numeric.mean == pytest.approx(499.5)
+    assert first.numeric.std == pytest.approx(series.std())
+    assert abs(first.numeric.sketch.quantile(.5) - 499.5) < 25
+    assert first.categorical.unique == whole.categorical.unique
+    assert first.categorical.unique == pytest.approx(1000, rel=.02)
+
+    words = ColumnAccumulator('w')
+    words.update(pandas.Series(['a', 'b', 'b', None]))
+    words.update(pandas.Series(['b', 'c']))
+    described = words.describe()
+    assert not words.is_numeric
+    assert described['count'] == 5
+    assert described['unique'] == 3
+    assert (described['top'], described['freq']) == ('b', 3)
+
+
+def test_analyze_parquet_from_footer():
+    from pilot.analysis import pandas as pandalyze
+    filename = os.path.join(MIXED_BASE, 'mixed.parquet')
+    assert pandalyze.analyze_parquet(filename) == pandalyze.analyze(
+        pandas.read_parquet(filename))
+
+    ana = pandalyze.analyze_parquet(filename, sample_bytes=0)
+    assert ana['numrows'] == 99
+    assert ana['numcols'] == 2
+    assert ana['field_definitions'] == [
+        {'name': 'Numbers', 'type': 'float64', 'count': 99, 'min': 1.0,
+         'max': 99.0},
+        {'name': 'Title', 'type': 'string', 'count': 99},
+    ]
+
+
+def test_analyze_parquet_samples_row_groups(tmp_path):
+    from pilot.analysis import pandas as pandalyze
+    filename = str(tmp_path / 'groups.parquet')
+    df = pandas.DataFrame({'n': [float(i) for i in range(1000)],
+                           's': ['a', 'b', 'a', None] * 250})
+    df.to_parquet(filename, row_group_size=100)
+    metadata = pyarrow.parquet.ParquetFile(filename).metadata
+    group_size = metadata.row_group(0).total_byte_size
+
+    sampled = pandalyze.get_parquet_sample_row_groups(metadata,
+                                                      group_size * 3)
+    assert len(sampled) == 3
+    assert sampled[0] == 0 and sampled[-1] == 9
+
+    ana = pandalyze.analyze_parquet(filename, sample_bytes=group_size * 3)
+    numbers, strings = ana['field_definitions']
+    assert (numbers['count'], numbers['min'], numbers['max']) == (1000, 0, 999)
+    assert 'mean' in numbers and '50' in numbers
+    assert strings['count'] == 750
+    assert strings['top'] == 'a'
+    assert strings['frequency'] == 500
@@ -0,0 +1,120 @@
+import os
+import json
+from unittest.mock import Mock
+from click.testing import CliRunner
+from pilot.bulk_register import read_manifest, RegisterJournal
+from pilot.commands.transfer.transfer_commands import register_many
+from tests.unit.mocks import COMMANDS_FILE_BASE_DIR, MULTI_FILE_DIR
+
+EMPTY_TEST_FILE = os.path.join(COMMANDS_FILE_BASE_DIR,
+                               'test_file_zero_length.txt')
+SMALL_TEST_FILE = os.path.join(COMMANDS_FILE_BASE_DIR, 'test_file_small.txt')
+
+
+def test_read_manifest(tmp_path):
+    (tmp_path / 'meta.json').write_text(json.dumps({'title': 'From file'}))
+    manifest = tmp_path / 'manifest.csv'
+    manifest.write_text(
+        'dataframe,destination,metadata\n'
+        'a.csv,foo,meta.json\n'
+        '/abs/b.csv,,"{""title"": ""Inline""}"\n'
+        'c.csv,bar,\n'
+    )
+    assert read_manifest(str(manifest)) == [
+        {'dataframe': str(tmp_path / 'a.csv'), 'destination': 'foo',
+         'metadata': {'title': 'From file'}},
+        {'dataframe': '/abs/b.csv', 'destination': '',
+         'metadata': {'title': 'Inline'}},
+        {'dataframe': str(tmp_path / 'c.csv'), 'destination': 'bar',
+         'metadata': {}},
+    ]
+
+
+def test_journal_survives_partial_lines(tmp_path):
+    filename = str(tmp_path / 'journal')
+    journal = RegisterJournal(filename)
+    journal.record([{'dataframe': 'a.csv', 'destination': 'foo',
+                     'state': 'ingested'},
+                    {'dataframe': 'b.csv', 'destination': 'foo',
+                     'state': 'failed', 'error': 'Oops'}])
+    # Simulate a crash part way through writing a line
+    with open(filename, 'a') as fh:
+        fh.write('{"key": "c.csv')
+    journal = RegisterJournal(filename)
+    assert journal.is_complete('a.csv', 'foo')
+    assert not journal.is_complete('b.csv', 'foo')
+    assert not journal.is_complete('a.csv', 'bar')
+    journal.record([{'dataframe': 'b.csv', 'destination': 'foo',
+                     'state': 'unchanged'}])
+    assert RegisterJournal(filename).is_complete('b.csv', 'foo')
+
+
+def test_register_many(mock_cli, mock_search_client, tmp_path):
+    manifest = [
+        {'dataframe': EMPTY_TEST_FILE, 'destination': 'foo'},
+        {'dataframe': MULTI_FILE_DIR, 'destination': 'foo',
+         'metadata': {'description': 'A directory'}},
+        {'dataframe': SMALL_TEST_FILE, 'destination': 'bar'},
+        {'dataframe': '/does/not/exist.csv', 'destination': 'foo'},
+    ]
+    journal = str(tmp_path / 'journal')
+    report = mock_cli.register_many(manifest, journal=journal, scanners=2,
+                                    max_batch_entries=2)
+    assert [r['state'] for r in report] == ['ingested', 'ingested',
+                                            'ingested', 'failed']
+    assert report[1]['subject'] == mock_cli.get_subject_url('foo/multi_file')
+    # Destinations are checked once each, not once per dataframe
+    assert mock_cli.ls.call_count == 2
+    assert mock_search_client.ingest.call_count == 2
+    assert mock_cli.search.call_count == 1
+
+    report = mock_cli.register_many(manifest, journal=journal)
+    assert [r['state'] for r in report] == ['skipped', 'skipped',
+                                            'skipped', 'failed']
+    assert mock_search_client.ingest.call_count == 2
+
+
+def test_register_many_existing_records(mock_cli, mock_search_client,
+                                        mock_search_results):
+    gmeta = mock_search_results['gmeta'][0]
+    gmeta['subject'] = mock_cli.get_subject_url('foo/test_file_small.txt')
+    mock_cli.search.return_value = mock_search_results
+    manifest = [{'dataframe': SMALL_TEST_FILE, 'destination': 'foo'},
+                {'dataframe': EMPTY_TEST_FILE, 'destination': 'foo'}]
+    report = mock_cli.register_many(manifest)
+    assert [r['state'] for r in report] == ['failed', 'ingested']
+    assert 'Record Exists' in report[0]['error']
+
+    report = mock_cli.register_many(manifest, dry_run=True)
+    assert [r['state'] for r in report] == ['dry_run', 'dry_run']
+
+
+def test_register_many_inside_existing_directory(mock_cli, mock_search_client,
+                                                 mock_search_results):
+    gmeta = mock_search_results['gmeta'][0]
+    gmeta['subject'] = mock_cli.get_subject_url('foo')
+    mock_cli.search.return_value = mock_search_results
+    manifest = [{'dataframe': SMALL_TEST_FILE, 'destination': 'foo'}]
+    report = mock_cli.register_many(manifest, update=True)
+    subject = mock_cli.get_subject_url('foo/test_file_small.txt')
+    assert report[0]['state'] == 'ingested'
+    assert report[0]['subject'] == subject
+    index, ingested = mock_search_client.ingest.call_args[0]
+    assert ingested['ingest_data']['gmeta'][0]['subject'] == subject
+
+    # register() ingests at the same subject
+    mock_cli.get_full_search_entry.return_value = gmeta
+    mock_cli.ingest = Mock()
+    mock_cli.register(SMALL_TEST_FILE, 'foo', update=True)
+    assert mock_cli.ingest.call_args[0][0] == 'foo/test_file_small.txt'
+
+
+def test_register_many_command(mock_cli, mock_search_client, tmp_path):
+    manifest = tmp_path / 'manifest.csv'
+    manifest.write_text('dataframe,destination\n{},foo\n{},foo\n'.format(
+        EMPTY_TEST_FILE, '/does/not/exist.csv'))
+    runner = CliRunner()
+    result = runner.invoke(register_many, [str(manifest)])
+    assert result.exit_code == 1
+    assert '1 failed, 1 ingested' in result.output
+    assert os.path.exists(str(manifest) + '.journal')
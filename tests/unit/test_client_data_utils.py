@@ -1,10 +1,12 @@
 import os
+import time
 import pytest
+import threading
 import globus_sdk
 from unittest.mock import Mock, call, mock_open, patch
-from pilot import globus_clients, exc
+from pilot import globus_clients, exc, search
 from tests.unit.mocks import (MOCK_PROFILE, MOCK_TOKEN_SET,
-                              CLIENT_FILE_BASE_DIR)
+                              CLIENT_FILE_BASE_DIR, MULTI_FILE_DIR)
 from fair_research_login.exc import LoadError
 
 TINY_DATAFRAME = os.path.join(CLIENT_FILE_BASE_DIR, 'tiny_dataframe.tsv')
@@ -76,6 +78,52 @@ def test_upload_http(monkeypatch, mixed_tsv, mock_cli_basic):
                                  filename=TINY_DATAFRAME)
 
 
+def test_upload_http_parallel(monkeypatch, mock_cli_basic):
+    files = list(search.iter_subdir_paths(MULTI_FILE_DIR))
+    started = threading.Barrier(2)
+
+    def put(path, filename=None):
+        # Two files must be in flight at once, and finish in reverse order
+        started.wait(timeout=5)
+        if filename == files[0][0]:
+            time.sleep(0.05)
+        return filename
+
+    monkeypatch.setattr(globus_clients.HTTPFileClient, 'put', Mock(
+        side_effect=put))
+    get_http_client = Mock(wraps=mock_cli_basic.get_http_client)
+    monkeypatch.setattr(mock_cli_basic, 'get_http_client', get_http_client)
+    progress = list(mock_cli_basic.iter_upload_http(MULTI_FILE_DIR, 'dest',
+                                                    workers=2))
+    assert progress[-1]['files_done'] == progress[-1]['files_total'] == 4
+    assert progress[-1]['bytes_done'] == progress[-1]['bytes_total'] == sum(
+        os.stat(f[0]).st_size for f in files)
+    assert [p['index'] for p in progress] != [0, 1, 2, 3]
+    assert get_http_client.call_count == 1
+
+    started.reset()
+    results = mock_cli_basic.upload_http(MULTI_FILE_DIR, 'dest', workers=2)
+    assert results == [f[0] for f in files]
+
+
+def test_upload_http_to_other_project(monkeypatch, mock_cli_basic):
+    put = Mock()
+    monkeypatch.setattr(globus_clients.HTTPFileClient, 'put', put)
+    mock_cli_basic.upload_http(TINY_DATAFRAME, 'destination',
+                               project='foo-project-test')
+    assert put.call_args == call(
+        '/foo_test_folder/destination/tiny_dataframe.tsv',
+        filename=TINY_DATAFRAME)
+
+
+def test_upload_http_error_stops_upload(monkeypatch, mock_cli_basic):
+    put = Mock(side_effect=exc.PilotClientException('Oops'))
+    monkeypatch.setattr(globus_clients.HTTPFileClient, 'put', put)
+    with pytest.raises(exc.PilotClientException):
+        mock_cli_basic.upload_http(MULTI_FILE_DIR, 'dest', workers=1)
+    assert put.call_count < 4
+
+
 def test_download_http(monkeypatch, mixed_tsv, mock_cli_basic, mock_projects):
     response = Mock()
     response.iter_content = ['hello', 'world']
@@ -106,6 +154,43 @@ def test_ingest(monkeypatch, mock_cli_basic, mock_sdk_response):
         mock_cli_basic.ingest('tiny_dataframe.tsv', meta)
 
 
+def test_ingest_gmeta_many(monkeypatch, mock_cli_basic, mock_sdk_response):
+    search_cli = Mock()
+    search_cli.ingest.side_effect = lambda index, gmeta: gmeta
+    mock_sdk_response.data = {'state': 'FAILED', 'message': 'it failed!'}
+    search_cli.get_task.side_effect = lambda tid: (
+        {'state': 'SUCCESS'} if tid == 'foo' else mock_sdk_response)
+    monkeypatch.setattr(mock_cli_basic, 'get_search_client',
+                        Mock(return_value=search_cli))
+    report = mock_cli_basic.ingest_gmeta_many([{'task_id': 'foo'},
+                                               {'task_id': 'bar'}])
+    assert [r['task_id'] for r in report] == ['foo', 'bar']
+    assert [r['state'] for r in report] == ['SUCCESS', 'FAILED']
+    assert search_cli.ingest.call_args[0][0] == 'foo-search-index'
+
+
+def test_ingest_many_batches(monkeypatch, mock_cli_basic, mock_sdk_response):
+    search_cli = Mock()
+    # Use the first subject in each batch as its task id
+    search_cli.ingest.side_effect = lambda index, gmeta: {
+        'task_id': gmeta['ingest_data']['gmeta'][0]['subject']}
+    mock_sdk_response.data = {'state': 'FAILED', 'message': 'too big'}
+    search_cli.get_task.side_effect = lambda tid: (
+        mock_sdk_response if tid.endswith('tiny2.tsv')
+        else {'state': 'SUCCESS'})
+    monkeypatch.setattr(mock_cli_basic, 'get_search_client',
+                        Mock(return_value=search_cli))
+    meta = mock_cli_basic.gather_metadata(TINY_DATAFRAME, '/')
+    content_map = {'tiny{}.tsv'.format(i): meta for i in range(5)}
+    with pytest.raises(exc.IngestFailed) as ingest_failed:
+        mock_cli_basic.ingest_many(content_map, max_batch_entries=2)
+    assert search_cli.ingest.call_count == 3
+    report = ingest_failed.value.report
+    assert [r['entries'] for r in report] == [2, 2, 1]
+    assert [r['state'] for r in report] == ['SUCCESS', 'FAILED', 'SUCCESS']
+    assert 'too big' in str(ingest_failed.value)
+
+
 def test_get_search_entry(monkeypatch, mock_cli_basic):
     search_cli = Mock()
     search_cli.get_subject.return_value = {'content': ['myresult']}
@@ -147,6 +232,21 @@ def test_list_entries(mock_multi_file_result, mock_cli_basic):
     assert len(mock_cli_basic.list_entries('foo/foo/foo')) == 0
 
 
+def test_get_search_entries(mock_multi_file_result, mock_cli_basic):
+    search_cli = Mock()
+    search_cli.post_search.return_value = Mock(data=mock_multi_file_result)
+    mock_cli_basic.get_search_client = Mock(return_value=search_cli)
+    mfr = mock_multi_file_result['gmeta'][0]
+    paths = ['multi_file', 'multi_file/folder/folder2/tsv2.tsv',
+             'multi_file/does_not_exist.csv', 'foo.txt']
+    entries = mock_cli_basic.get_search_entries(paths)
+    assert entries == {paths[0]: mfr, paths[1]: mfr, paths[2]: None,
+                       paths[3]: None}
+    assert search_cli.post_search.call_count == 1
+    entries = mock_cli_basic.get_search_entries(paths, precise=False)
+    assert entries[paths[2]] == mfr
+
+
 def test_get_search_entry_dir(monkeypatch, mock_cli_basic,
                               mock_multi_file_result):
     search_cli = Mock()
@@ -156,12 +256,28 @@ def test_get_search_entry_dir(monkeypatch, mock_cli_basic,
         code = 'NotFound.Generic'
 
     monkeypatch.setattr(globus_sdk, 'SearchAPIError', MockException)
-    search_cli.get_subject.side_effect = globus_sdk.SearchAPIError
-    ps_response = Mock()
-    ps_response.data = mock_multi_file_result
-    search_cli.post_search.return_value = ps_response
+    mf_entry = mock_multi_file_result['gmeta'][0]
+
+    def get_subject(index, subject, query_params=None):
+        if subject == mf_entry['subject']:
+            return mf_entry
+        raise globus_sdk.SearchAPIError()
+    search_cli.get_subject.side_effect = get_subject
     entry = mock_cli_basic.get_search_entry('multi_file/text_metadata.txt')
-    assert entry == mock_multi_file_result['gmeta'][0]['content'][0]
+    assert entry == mf_entry['content'][0]
+    assert not search_cli.post_search.called
+    subjects = [c[0][1] for c in search_cli.get_subject.call_args_list]
+    assert subjects == [mf_entry['subject'] + '/text_metadata.txt',
+                        mf_entry['subject']]
+
+    assert mock_cli_basic.get_search_entry('multi_file/missing.txt') is None
+    assert mock_cli_basic.get_search_entry('other/missing.txt') is None
+    subjects = [c[0][1] for c in search_cli.get_subject.call_args_list]
+    assert subjects[-3:] == [
+        'globus://foo-project-endpoint/foo_folder/other/missing.txt',
+        'globus://foo-project-endpoint/foo_folder/other',
+        'globus://foo-project-endpoint/foo_folder',
+    ]
 
 
 def test_delete_entry_sub(monkeypatch, mock_cli_basic, mock_multi_file_result):
@@ -221,3 +337,55 @@ def test_delete_will_not_delete_above_base_dir(mock_cli_basic,
                                                mock_transfer_client):
     with pytest.raises(exc.DataOutsideProject):
         mock_cli_basic.delete('/', recursive=True, relative=False)
+
+
+def mock_search_pages(total, scroll_total=None):
+    subjects = ['globus://foo-project-endpoint/foo_folder/{}/file{}'.format(
+        'even' if i % 2 == 0 else 'odd', i) for i in range(total)]
+
+    def post_search(index, data):
+        gmeta = [{'subject': s} for s in
+                 subjects[data['offset']:data['offset'] + data['limit']]]
+        return Mock(data={'gmeta': gmeta, 'total': total})
+
+    def scroll(index, data, marker=None):
+        start = int(marker or 0)
+        end = start + data['limit']
+        return Mock(data={'gmeta': [{'subject': s}
+                                    for s in subjects[start:end]],
+                          'has_next_page': end < total, 'marker': str(end)})
+    search_cli = Mock()
+    search_cli.post_search.side_effect = post_search
+    search_cli.scroll.side_effect = scroll
+    return search_cli, subjects
+
+
+def test_iter_search_pages_all_records(monkeypatch, mock_cli_basic):
+    search_cli, subjects = mock_search_pages(250)
+    monkeypatch.setattr(mock_cli_basic, 'get_search_client',
+                        Mock(return_value=search_cli))
+    results = [e['subject'] for e in mock_cli_basic.iter_search()]
+    assert results == subjects
+    assert search_cli.post_search.call_count == 3
+    calls = search_cli.post_search.call_args_list
+    offsets = [c[0][1]['offset'] for c in calls]
+    assert offsets == [0, 100, 200]
+
+    odd = mock_cli_basic.list_entries('odd')
+    assert len(odd) == 125
+    assert all('/odd/' in e['subject'] for e in odd)
+
+    unfetched = mock_cli_basic.iter_search(page_size=10, prefetch=False)
+    assert next(unfetched)['subject'] == subjects[0]
+    assert search_cli.post_search.call_count == 7
+
+
+def test_iter_search_scrolls_large_projects(monkeypatch, mock_cli_basic):
+    search_cli, subjects = mock_search_pages(10001)
+    monkeypatch.setattr(mock_cli_basic, 'get_search_client',
+                        Mock(return_value=search_cli))
+    results = [e['subject'] for e in
+               mock_cli_basic.iter_search(page_size=1000)]
+    assert results == subjects
+    assert search_cli.scroll.call_count == 11
+    assert 'offset' not in search_cli.scroll.call_args[0][1]
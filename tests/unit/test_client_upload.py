@@ -1,10 +1,12 @@
 import os
 import pytest
+import threading
 import json
 from unittest.mock import Mock
 
 import globus_sdk
 import jsonschema
+from pilot import search
 from pilot.search import scrape_metadata
 from pilot import exc, analysis
 from pilot.exc import AnalysisException
@@ -52,11 +54,10 @@ def test_dir_upload(mock_cli, mock_transfer_log):
 
 
 def test_update_mfe_with_file(mock_cli, mock_transfer_log,
-                              mock_multi_file_result):
+                              mock_multi_file_result, mock_search_entries):
     sub = mock_cli.get_subject_url('my_folder/multi_file')
     mock_multi_file_result['gmeta'][0]['subject'] = sub
-    gse = Mock(return_value=mock_multi_file_result['gmeta'])
-    mock_cli.list_entries = gse
+    mock_search_entries(mock_multi_file_result['gmeta'])
     metadata = mock_cli.upload(EMPTY_TEST_FILE, 'my_folder/multi_file',
                                update=True)['new_metadata']
     assert len(mock_multi_file_result['gmeta'][0]['content'][0]['files']) == 4
@@ -68,18 +69,18 @@ def test_update_mfe_with_file(mock_cli, mock_transfer_log,
 
 
 def test_update_mfe_with_dir(mock_cli, mock_transfer_log,
-                             mock_multi_file_result):
+                             mock_multi_file_result, mock_search_entries):
     sub = mock_cli.get_subject_url('my_folder/multi_file')
     mock_multi_file_result['gmeta'][0]['subject'] = sub
-    gse = Mock(return_value=mock_multi_file_result['gmeta'])
-    mock_cli.list_entries = gse
+    mock_search_entries(mock_multi_file_result['gmeta'])
     metadata = mock_cli.upload(MULTI_FILE_DIR, 'my_folder/multi_file',
                                update=True)['new_metadata']
     assert len(mock_multi_file_result['gmeta'][0]['content'][0]['files']) == 4
     assert len(metadata['files']) == 8
 
 
-def test_upload_in_dir_with_similar_record(mock_cli, mock_search_result):
+def test_upload_in_dir_with_similar_record(mock_cli, mock_search_result,
+                                           mock_search_entries):
     """
     This was to fix a bug where uploading similar records would cause conflicts
 
@@ -88,8 +89,7 @@ def test_upload_in_dir_with_similar_record(mock_cli, mock_search_result):
     """
     sub = mock_cli.get_subject_url('my_folder/simple_tsv')
     mock_search_result['subject'] = sub
-    gse = Mock(return_value=[mock_search_result])
-    mock_cli.list_entries = gse
+    mock_search_entries([mock_search_result])
     # should not raise RecordExists Exception
     mock_cli.upload(EMPTY_TEST_FILE, 'my_folder')
 
@@ -106,8 +106,9 @@ def test_upload_to_nonexistant_dir(mock_cli, mock_transfer_error):
         mock_cli.upload(EMPTY_TEST_FILE, 'my_folder')
 
 
-def test_upload_destination_is_record(mock_cli, mock_multi_file_result):
-    mock_cli.search.return_value = mock_multi_file_result
+def test_upload_destination_is_record(mock_cli, mock_multi_file_result,
+                                      mock_search_entries):
+    mock_search_entries(mock_multi_file_result['gmeta'])
     with pytest.raises(exc.RecordExists):
         mock_cli.upload(EMPTY_TEST_FILE, '/multi_file/foo')
 
@@ -140,24 +141,25 @@ def test_upload_validation_error(mock_cli, mock_transfer_log):
         mock_cli.upload(EMPTY_TEST_FILE, 'my_folder', metadata=invalid_m)
 
 
-def test_no_update_needed(mock_cli, mock_transfer_log, mock_search_client):
+def test_no_update_needed(mock_cli, mock_transfer_log, mock_search_client,
+                          mock_search_entries):
     basen = os.path.basename(EMPTY_TEST_FILE)
     url = mock_cli.get_globus_http_url(basen)
     meta = scrape_metadata(EMPTY_TEST_FILE, url, mock_cli.profile,
                            'foo-project')
     entry = {'content': [meta], 'subject': mock_cli.get_subject_url(basen)}
-    mock_cli.list_entries = Mock(return_value=[entry])
+    mock_search_entries([entry])
     mock_cli.upload(EMPTY_TEST_FILE, '/', update=True)
     assert not mock_search_client.ingest.called
     assert not mock_transfer_log.called
 
 
-def test_upload_record_exists(mock_cli):
+def test_upload_record_exists(mock_cli, mock_search_entries):
     url = mock_cli.get_globus_http_url('my_folder/test_file_zero_length.txt')
     sub = mock_cli.get_subject_url('my_folder')
     meta = scrape_metadata(EMPTY_TEST_FILE, url, mock_cli.profile, 'foo')
     entry = {'content': [meta], 'subject': sub}
-    mock_cli.list_entries = Mock(return_value=[entry])
+    mock_search_entries([entry])
     with pytest.raises(exc.RecordExists):
         mock_cli.upload(SMALL_TEST_FILE, 'my_folder')
 
@@ -174,15 +176,12 @@ def test_upload_dry_run(mock_cli):
     assert stats['new_version'] == '1'
 
 
-def test_dataframe_up_to_date(mock_cli, mock_transfer_log, monkeypatch):
+def test_dataframe_up_to_date(mock_cli, mock_transfer_log, monkeypatch,
+                              mock_search_entries):
     """Update metadata but not the actual file"""
     sub = mock_cli.get_subject_url(os.path.basename(EMPTY_TEST_FILE))
     with open(EMTPY_TEST_FILE_META) as f:
-        le = Mock(return_value=[
-            {'content': [json.load(f)],
-             'subject': sub}
-        ])
-        mock_cli.list_entries = le
+        mock_search_entries([{'content': [json.load(f)], 'subject': sub}])
     new_meta = {"custom_metadata_key": "custom_metadata_value"}
     res = mock_cli.upload(EMPTY_TEST_FILE, '/', metadata=new_meta, update=True)
     assert res['record_exists']
@@ -203,3 +202,219 @@ def test_upload_gcp_log(mock_cli, mock_transfer_log):
     mock_cli.get_transfer_client().submit_transfer.return_value = {}
     mock_cli.upload(SMALL_TEST_FILE, 'my_folder', globus=True)
     assert mock_transfer_log.called
+
+
+def test_upload_globus_dir_is_recursive(mock_cli, mock_transfer_client,
+                                        mock_transfer_data, mock_transfer_log):
+    result = mock_cli.upload_globus(MULTI_FILE_DIR, 'my_folder')
+    assert result.data['code'] == 'Accepted'
+    mock_transfer_data.add_item.assert_called_once_with(
+        MULTI_FILE_DIR, mock_cli.get_path('my_folder/multi_file'),
+        recursive=True)
+    mock_transfer_log.assert_called_once_with([result],
+                                              'my_folder/multi_file')
+
+
+def test_upload_globus_splits_file_items(mock_cli, mock_transfer_client,
+                                         mock_transfer_data,
+                                         mock_transfer_log):
+    results = mock_cli.upload_globus_tasks(MULTI_FILE_DIR, 'my_folder',
+                                           recursive=False, max_items=3)
+    assert len(results) == 2
+    assert mock_transfer_client.submit_transfer.call_count == 2
+    assert mock_transfer_data.add_item.call_count == 4
+    assert all(c[1] == {'recursive': False}
+               for c in mock_transfer_data.add_item.call_args_list)
+    mock_transfer_log.assert_called_once_with(results, 'my_folder/multi_file')
+
+
+def test_upload_overlap(mock_cli, mock_search_client, monkeypatch):
+    events, gathering = [], threading.Event()
+    gather_metadata = mock_cli.gather_metadata
+
+    def gather(*args, **kwargs):
+        events.append('gather')
+        gathering.set()
+        return gather_metadata(*args, **kwargs)
+
+    def upload(*args, **kwargs):
+        # Only finishes if metadata is gathered while uploading
+        assert gathering.wait(timeout=5)
+        events.append('upload')
+        return ['upload result']
+
+    monkeypatch.setattr(mock_cli, 'gather_metadata', gather)
+    monkeypatch.setattr(mock_cli, 'upload_http', upload)
+    monkeypatch.setattr(mock_search_client, 'ingest', Mock(
+        side_effect=lambda *a, **kw: events.append('ingest') or
+        {'task_id': 'mock_task_id'}))
+    stats = mock_cli.upload(SMALL_TEST_FILE, 'my_folder', globus=False,
+                            overlap=True)
+    assert stats['upload'] == ['upload result']
+    assert stats['protocol'] == 'http'
+    assert events == ['gather', 'upload', 'ingest']
+
+
+def test_upload_overlap_failed_upload_is_not_ingested(mock_cli,
+                                                      mock_search_client,
+                                                      monkeypatch):
+    monkeypatch.setattr(mock_cli, 'upload_http',
+                        Mock(side_effect=exc.PilotClientException('Oops')))
+    with pytest.raises(exc.PilotClientException):
+        mock_cli.upload(SMALL_TEST_FILE, 'my_folder', globus=False,
+                        overlap=True)
+    assert not mock_search_client.ingest.called
+
+
+def test_upload_overlap_checks_record_first(mock_cli, mock_search_entries,
+                                            monkeypatch):
+    upload_http = Mock()
+    monkeypatch.setattr(mock_cli, 'upload_http', upload_http)
+    url = mock_cli.get_globus_http_url('my_folder/test_file_zero_length.txt')
+    sub = mock_cli.get_subject_url('my_folder')
+    meta = scrape_metadata(EMPTY_TEST_FILE, url, mock_cli.profile, 'foo')
+    mock_search_entries([{'content': [meta], 'subject': sub}])
+    with pytest.raises(exc.RecordExists):
+        mock_cli.upload(SMALL_TEST_FILE, 'my_folder', globus=False,
+                        overlap=True)
+    assert not upload_http.called
+
+
+def test_upload_overlap_checks_metadata_first(mock_cli, monkeypatch):
+    upload_http = Mock()
+    monkeypatch.setattr(mock_cli, 'upload_http', upload_http)
+    with pytest.raises(jsonschema.exceptions.ValidationError):
+        mock_cli.upload(SMALL_TEST_FILE, 'my_folder', globus=False,
+                        overlap=True, metadata={'formats': [1234]})
+    fkeys = {'col': {'reference': {'resource': 'missing.tsv'}}}
+    with pytest.raises(exc.PilotClientException, match='missing.tsv'):
+        mock_cli.upload(SMALL_TEST_FILE, 'my_folder', globus=False,
+                        overlap=True, foreign_keys=fkeys)
+    assert not upload_http.called
+
+
+def test_upload_overlap_cancels_transfer(mock_cli, mock_search_client,
+                                         mock_transfer_client,
+                                         mock_transfer_log, monkeypatch):
+    monkeypatch.setattr(analysis, 'analyze_dataframe', Mock(
+        side_effect=AnalysisException('fail!', None)))
+    with pytest.raises(exc.AnalysisException):
+        mock_cli.upload(EMPTY_TEST_FILE, 'my_folder', overlap=True)
+    task_id = mock_transfer_client.submit_transfer.return_value['task_id']
+    mock_transfer_client.cancel_task.assert_called_once_with(task_id)
+    assert not mock_search_client.ingest.called
+
+
+def test_upload_overlap_waits_for_transfer(mock_cli, mock_search_client,
+                                           mock_transfer_client, monkeypatch):
+    mock_transfer_client.task_wait.side_effect = [False, True]
+    mock_transfer_client.get_task.return_value = {'status': 'SUCCEEDED'}
+    update_log = Mock()
+    monkeypatch.setattr(mock_cli.transfer_log, 'update_log', update_log)
+    stats = mock_cli.upload(EMPTY_TEST_FILE, 'my_folder', overlap=True)
+    assert mock_transfer_client.task_wait.call_count == 2
+    assert mock_search_client.ingest.called
+    update_log.assert_called_once_with(stats['upload'].data['task_id'],
+                                       'SUCCEEDED')
+
+
+def test_upload_overlap_failed_transfer_is_not_ingested(mock_cli,
+                                                        mock_search_client,
+                                                        mock_transfer_client):
+    mock_transfer_client.task_wait.return_value = True
+    mock_transfer_client.get_task.return_value = {'status': 'FAILED'}
+    with pytest.raises(exc.GlobusTransferError):
+        mock_cli.upload(EMPTY_TEST_FILE, 'my_folder', overlap=True)
+    assert not mock_search_client.ingest.called
+
+
+def test_upload_overlap_stops_http_upload(mock_cli, monkeypatch):
+    put = Mock()
+    mock_cli.get_http_client.return_value.put = put
+    cancel = threading.Event()
+    cancel.set()
+    assert mock_cli.upload_http(MULTI_FILE_DIR, 'my_folder',
+                                cancel=cancel) == []
+    assert not put.called
+
+
+def test_upload_overlap_with_delta(mock_cli):
+    with pytest.raises(exc.PilotClientException):
+        mock_cli.upload(MULTI_FILE_DIR, 'my_folder', overlap=True, delta=True)
+
+
+def test_upload_delete_removed_without_delta(mock_cli):
+    with pytest.raises(exc.PilotClientException):
+        mock_cli.upload(MULTI_FILE_DIR, 'my_folder', delete_removed=True)
+
+
+def test_upload_delta(mock_cli, mock_search_entries, mock_transfer_client,
+                      mock_transfer_data, mock_transfer_log):
+    prev = mock_cli.gather_metadata(MULTI_FILE_DIR, 'my_folder')
+    base_url = mock_cli.get_globus_http_url('my_folder')
+    changed, unchanged_files = prev['files'][0], prev['files'][2:]
+    changed['sha256'] = 'outdated'
+    old_url = '{}/multi_file/old.txt'.format(base_url)
+    removed = dict(unchanged_files[0], url=old_url, filename='old.txt')
+    prev['files'] = [changed] + unchanged_files + [removed]
+    mock_search_entries([{
+        'subject': mock_cli.get_subject_url('my_folder/multi_file'),
+        'content': [prev],
+    }])
+    stats = mock_cli.upload(MULTI_FILE_DIR, 'my_folder', update=True,
+                            delta=True, delete_removed=True)
+    new_file = stats['new_metadata']['files'][1]
+    expected = [f['url'][len(base_url) + 1:] for f in (changed, new_file)]
+    assert sorted(stats['delta']['modified']) == sorted(expected)
+    assert stats['delta']['removed'] == ['multi_file/old.txt']
+    sent = [c[0][1] for c in mock_transfer_data.add_item.call_args_list]
+    assert sorted(sent) == sorted(mock_cli.get_path('my_folder/' + p)
+                                  for p in expected)
+    ddata = globus_sdk.DeleteData.return_value
+    ddata.add_item.assert_called_once_with(
+        mock_cli.get_path('my_folder/multi_file/old.txt'))
+    new_urls = [f['url'] for f in stats['new_metadata']['files']]
+    assert old_url not in new_urls
+    assert len(stats['upload']) == 1
+
+
+def test_upload_delta_only_removed(mock_cli, mock_search_entries,
+                                   mock_transfer_client, mock_transfer_data,
+                                   mock_transfer_log):
+    prev = mock_cli.gather_metadata(MULTI_FILE_DIR, 'my_folder')
+    base_url = mock_cli.get_globus_http_url('my_folder')
+    old_url = '{}/multi_file/old.txt'.format(base_url)
+    prev['files'].append(dict(prev['files'][0], url=old_url,
+                              filename='old.txt'))
+    mock_search_entries([{
+        'subject': mock_cli.get_subject_url('my_folder/multi_file'),
+        'content': [prev],
+    }])
+    stats = mock_cli.upload(MULTI_FILE_DIR, 'my_folder', update=True,
+                            delta=True, delete_removed=True)
+    assert stats['delta'] == {'modified': [],
+                              'removed': ['multi_file/old.txt']}
+    assert not mock_transfer_client.submit_transfer.called
+    assert stats['upload'] == {}
+
+
+def test_get_modified_files():
+    prev = [{'url': 'a', 'length': 1, 'sha256': 'x'},
+            {'url': 'b', 'length': 1, 'sha256': 'x'},
+            {'url': 'c', 'length': 1, 'sha256': 'x'}]
+    new = [{'url': 'a', 'length': 1, 'sha256': 'x'},
+           {'url': 'b', 'length': 1, 'sha256': 'y'},
+           {'url': 'd', 'length': 1, 'sha256': 'x'}]
+    assert search.get_modified_files(new, prev) == ['b', 'd']
+
+
+def test_get_modified_files_compares_shared_hashes():
+    prev = [{'url': 'a', 'length': 1, 'md5': 'x'},
+            {'url': 'b', 'length': 1, 'md5': 'x', 'sha256': 'x'},
+            {'url': 'c', 'length': 1, 'md5': 'x', 'sha256': 'x'}]
+    new = [{'url': 'a', 'length': 1, 'sha256': 'x'},
+           {'url': 'b', 'length': 1, 'sha256': 'x'},
+           {'url': 'c', 'length': 1, 'sha256': 'y'}]
+    # 'a' has no hash in common with the old entry, so it can't be trusted
+    # to be the same file even though the length matches
+    assert search.get_modified_files(new, prev) == ['a', 'c']
@@ -33,6 +33,21 @@ def test_auth_logout_purge(monkeypatch, mock_cli):
     assert os.unlink.called
 
 
+def test_auth_logout_purge_removes_databases(monkeypatch, mock_cli,
+                                             tmp_path):
+    config_file = tmp_path / 'pilot.cfg'
+    config_file.write_text('')
+    monkeypatch.setattr(mock_cli, 'config_file', str(config_file))
+    monkeypatch.setattr(mock_cli, '_transfer_log', None)
+    mock_cli.transfer_log.get_log()
+    mock_cli.get_fingerprint_cache().update([])
+    mock_cli.get_search_mirror().count('foo-project')
+    assert len(list(tmp_path.glob('*.db'))) == 3
+    result = CliRunner().invoke(logout, ['--purge'])
+    assert result.exit_code == 0
+    assert list(tmp_path.iterdir()) == []
+
+
 def test_auth_profile(mock_cli, mock_config):
     runner = CliRunner()
     result = runner.invoke(profile_command, [])
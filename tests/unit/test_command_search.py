@@ -1,5 +1,11 @@
 from click.testing import CliRunner
-from pilot.commands.search.search_commands import list_command, describe
+import gzip
+import json
+import threading
+from pilot import commands
+from pilot.commands.search.search_commands import (
+    list_command, describe, export_command
+)
 
 
 def test_list_command(monkeypatch, mock_cli, mock_search_results):
@@ -10,8 +16,58 @@ def test_list_command(monkeypatch, mock_cli, mock_search_results):
     assert result.exit_code == 0
 
 
+def test_list_command_lists_directory_during_search(mock_cli,
+                                                    mock_search_results):
+    entries = [dict(mock_search_results['gmeta'][0],
+                    subject=mock_cli.get_subject_url('file{}'.format(i)))
+               for i in range(50)]
+    listing = threading.Event()
+
+    def search(**kwargs):
+        # Only returns if the directory listing started while searching
+        assert listing.wait(timeout=5)
+        return {'gmeta': entries, 'total': len(entries)}
+
+    def ls(path, extended=False):
+        listing.set()
+        return {'file1': {'type': 'file'}, 'subdir': {'type': 'dir'}}
+
+    mock_cli.search.side_effect = search
+    mock_cli.ls.side_effect = ls
+    runner = CliRunner()
+    result = runner.invoke(list_command, [])
+    assert result.exit_code == 0
+    assert 'Showing 50/50' in result.output
+    assert 'subdir' in result.output
+    assert commands.get_pilot_client.call_count == 1
+
+
 def test_upload_gcp_log(mock_cli, mock_search_result):
     mock_cli.get_full_search_entry.return_value = mock_search_result
     runner = CliRunner()
     result = runner.invoke(describe, ['foo/bar'])
     assert result.exit_code == 0
+
+
+def test_export_command(mock_cli, mock_search_results, tmp_path):
+    entries = [dict(mock_search_results['gmeta'][0],
+                    subject=mock_cli.get_subject_url('file{}'.format(i)))
+               for i in range(150)]
+    mock_cli.search.side_effect = lambda project, index, custom_params: {
+        'gmeta': entries[custom_params['offset']:
+                         custom_params['offset'] + custom_params['limit']],
+        'total': len(entries)}
+    runner = CliRunner()
+    result = runner.invoke(export_command, [])
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert [json.loads(line) for line in lines] == entries
+    assert mock_cli.search.call_count == 2
+
+    output = str(tmp_path / 'records.ndjson.gz')
+    result = runner.invoke(export_command, ['file1', '-o', output])
+    assert result.exit_code == 0
+    with gzip.open(output, 'rt') as fh:
+        exported = [json.loads(line) for line in fh]
+    assert len(exported) == 61
+    assert all('file1' in e['subject'] for e in exported)
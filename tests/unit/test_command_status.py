@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import Mock
+from click.testing import CliRunner
+from pilot.commands.transfer import status_commands
+from pilot.transfer_log import TransferLog
+from tests.unit.mocks import GlobusTransferTaskResponse
+
+# mock_cli stubs out adding logs, but these tests need real ones to update
+ADD_LOGS = TransferLog.add_logs
+
+
+@pytest.fixture
+def status_cli(mock_cli, monkeypatch):
+    monkeypatch.setattr(TransferLog, 'add_logs', ADD_LOGS)
+    monkeypatch.setattr(status_commands, 'get_pilot_client',
+                        Mock(return_value=mock_cli))
+    return mock_cli
+
+
+def mock_task_list(*states):
+    """Answer task_list() filtered by task id with each of the given states
+    in turn, then stay on the last one"""
+    states = list(states)
+
+    def task_list(filter=None, limit=None):
+        status = states.pop(0) if len(states) > 1 else states[0]
+        task_ids = filter.replace('task_id:', '').split(',')
+        return [{'task_id': tid, 'status': status, 'nice_status': None}
+                for tid in task_ids]
+    return Mock(side_effect=task_list)
+
+
+def test_get_transfer_statuses(mock_cli, mock_transfer_client):
+    mock_transfer_client.task_list = mock_task_list('SUCCEEDED')
+    task_ids = ['task{}'.format(i) for i in range(250)]
+    statuses = mock_cli.get_transfer_statuses(task_ids + task_ids[:10])
+    assert statuses == {tid: 'SUCCEEDED' for tid in task_ids}
+    assert mock_transfer_client.task_list.call_count == 3
+
+
+def test_status_updates_pending_logs(status_cli, mock_transfer_client):
+    mock_cli = status_cli
+    results = [GlobusTransferTaskResponse() for _ in range(3)]
+    mock_cli.transfer_log.add_logs(results, 'foo/bar')
+    mock_transfer_client.task_list = mock_task_list('SUCCEEDED')
+    result = CliRunner().invoke(status_commands.status_command, [])
+    assert result.exit_code == 0
+    assert mock_transfer_client.task_list.call_count == 1
+    assert [t['status'] for t in mock_cli.transfer_log.get_log()] == [
+        'SUCCEEDED'] * 3
+
+
+def test_status_watch_backs_off(status_cli, mock_transfer_client,
+                                monkeypatch):
+    mock_cli = status_cli
+    mock_cli.transfer_log.add_log(GlobusTransferTaskResponse(), 'foo/bar')
+    mock_transfer_client.task_list = mock_task_list(
+        'ACTIVE', 'ACTIVE', 'ACTIVE', 'SUCCEEDED')
+    sleep = Mock()
+    monkeypatch.setattr(status_commands.time, 'sleep', sleep)
+    result = CliRunner().invoke(status_commands.status_command, ['--watch'])
+    assert result.exit_code == 0
+    intervals = [c[0][0] for c in sleep.call_args_list]
+    assert intervals == [status_commands.WATCH_MIN_INTERVAL,
+                         status_commands.WATCH_MIN_INTERVAL *
+                         status_commands.WATCH_BACKOFF,
+                         status_commands.WATCH_MIN_INTERVAL *
+                         status_commands.WATCH_BACKOFF ** 2]
+    assert mock_cli.transfer_log.get_log()[0]['status'] == 'SUCCEEDED'
@@ -21,11 +21,18 @@ INVALID_METADATA = os.path.join(COMMANDS_FILE_BASE_DIR,
 
 
 def test_upload(mock_cli, monkeypatch):
-    monkeypatch.setattr(transfer_log.TransferLog, 'add_log', Mock())
+    monkeypatch.setattr(transfer_log.TransferLog, 'add_logs', Mock())
     result = CliRunner().invoke(upload, [EMPTY_TEST_FILE, 'my_folder'])
     assert result.exit_code == ExitCodes.SUCCESS
 
 
+def test_upload_delete_removed_requires_delta(mock_cli):
+    result = CliRunner().invoke(upload, [EMPTY_TEST_FILE, 'my_folder',
+                                         '--delete-removed'])
+    assert result.exit_code == 2
+    assert '--delta' in result.output
+
+
 def test_upload_without_destination(mock_cli):
     mock_cli.ls.return_value = {'foo': {'type': 'dir'},
                                 'bar': {'type': 'file'}}
@@ -76,7 +83,8 @@ def test_upload_validation_error(mock_cli):
     assert result.exit_code == ExitCodes.INVALID_METADATA
 
 
-def test_no_update_needed(mock_cli, mock_search_results):
+def test_no_update_needed(mock_cli, mock_search_results,
+                          mock_search_entries):
     base_name = os.path.basename(EMPTY_TEST_FILE)
     url = mock_cli.get_globus_http_url(base_name)
     sub = mock_cli.get_subject_url(base_name)
@@ -84,14 +92,15 @@ def test_no_update_needed(mock_cli, mock_search_results):
                            'foo-project')
     mock_search_results['gmeta'][0]['content'][0] = meta
     mock_search_results['gmeta'][0]['subject'] = sub
-    mock_cli.list_entries = Mock(return_value=mock_search_results['gmeta'])
+    mock_search_entries(mock_search_results['gmeta'])
     result = CliRunner().invoke(upload, [EMPTY_TEST_FILE, '/',
                                          '--no-gcp', '-u'])
     assert result.exit_code == 0
     assert 'Files and search entry are an exact match.' in result.output
 
 
-def test_upload_record_exists(mock_cli, mock_search_results):
+def test_upload_record_exists(mock_cli, mock_search_results,
+                              mock_search_entries):
     base_name = os.path.basename(EMPTY_TEST_FILE)
     url = mock_cli.get_globus_http_url(base_name)
     sub = mock_cli.get_subject_url(base_name)
@@ -99,7 +108,7 @@ def test_upload_record_exists(mock_cli, mock_search_results):
                            'foo-project')
     mock_search_results['gmeta'][0]['content'][0] = meta
     mock_search_results['gmeta'][0]['subject'] = sub
-    mock_cli.list_entries = Mock(return_value=mock_search_results['gmeta'])
+    mock_search_entries(mock_search_results['gmeta'])
 
     result = CliRunner().invoke(upload, [EMPTY_TEST_FILE, '/', '--no-gcp'])
     assert result.exit_code == ExitCodes.RECORD_EXISTS
@@ -113,20 +122,33 @@ def test_upload_dry_run(mock_cli):
 
 
 def test_dataframe_up_to_date(mock_cli, mock_transfer_log,
-                              mock_search_results):
+                              mock_search_results, mock_search_entries):
     with open(EMTPY_TEST_FILE_META) as f:
         meta = json.load(f)
     base_name = os.path.basename(EMPTY_TEST_FILE)
     sub = mock_cli.get_subject_url(base_name)
     mock_search_results['gmeta'][0]['content'][0] = meta
     mock_search_results['gmeta'][0]['subject'] = sub
-    mock_cli.list_entries = Mock(return_value=mock_search_results['gmeta'])
+    mock_search_entries(mock_search_results['gmeta'])
     result = CliRunner().invoke(upload, [EMPTY_TEST_FILE, '/',
                                          '-u', '-j', CUSTOM_METADATA])
     assert result.exit_code == 0
     assert not globus_sdk.TransferData.called
 
 
+def test_upload_overlap_up_to_date(mock_cli, monkeypatch):
+    monkeypatch.setattr(mock_cli, 'upload', Mock(return_value={
+        'metadata_modified': False}))
+    result = CliRunner().invoke(upload, [EMPTY_TEST_FILE, 'my_folder',
+                                         '--overlap'])
+    assert result.exit_code == 0
+    assert 'already up to date' in result.output
+    assert 'transfer has finished' in result.output
+    result = CliRunner().invoke(upload, [EMPTY_TEST_FILE, 'my_folder',
+                                         '--overlap', '--delta'])
+    assert result.exit_code == 2
+
+
 def test_upload_local_endpoint_not_set(mock_cli, mock_profile):
 
     mock_cli.profile.save_option('local_endpoint', None, section='profile')
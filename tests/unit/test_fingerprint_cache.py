@@ -0,0 +1,93 @@
+import os
+import time
+from unittest.mock import Mock
+from pilot import search
+from pilot.fingerprint_cache import FingerprintCache
+from tests.unit.mocks import MULTI_FILE_DIR
+
+ALGORITHMS = ['sha256', 'md5']
+FILE_INFO = {'sha256': 'abc', 'md5': 'def', 'mime_type': 'text/plain',
+             'field_metadata': {'numrows': 1}}
+
+
+def test_cache_get_and_update(tmp_path):
+    fname = tmp_path / 'foo.txt'
+    fname.write_text('foo')
+    cache = FingerprintCache(str(tmp_path / 'cache.db'))
+    fingerprint = cache.fingerprint(str(fname))
+    assert cache.get(fingerprint, ALGORITHMS) is None
+    cache.update([(fingerprint, FILE_INFO)], analyzed=True)
+    assert cache.get(fingerprint, ALGORITHMS, analyzed=True) == FILE_INFO
+    no_analysis = cache.get(fingerprint, ALGORITHMS, analyzed=False)
+    assert no_analysis['field_metadata'] == {}
+    assert cache.get(fingerprint, ['sha1']) is None
+
+
+def test_cache_miss_on_modified_file(tmp_path):
+    fname = tmp_path / 'foo.txt'
+    fname.write_text('foo')
+    cache = FingerprintCache(str(tmp_path / 'cache.db'))
+    cache.update([(cache.fingerprint(str(fname)), FILE_INFO)])
+    fname.write_text('foobar')
+    assert cache.get(cache.fingerprint(str(fname)), ALGORITHMS) is None
+
+
+def test_cache_miss_without_analysis(tmp_path):
+    fname = tmp_path / 'foo.txt'
+    fname.write_text('foo')
+    cache = FingerprintCache(str(tmp_path / 'cache.db'))
+    fingerprint = cache.fingerprint(str(fname))
+    cache.update([(fingerprint, FILE_INFO)], analyzed=False)
+    assert cache.get(fingerprint, ALGORITHMS, analyzed=True) is None
+
+
+def test_cache_invalidate(tmp_path):
+    cache = FingerprintCache(str(tmp_path / 'cache.db'))
+    entries = [(('/foo/bar.txt', 1, 1, 1), FILE_INFO),
+               (('/foo/baz/moo.txt', 1, 1, 2), FILE_INFO),
+               (('/foobar.txt', 1, 1, 3), FILE_INFO)]
+    cache.update(entries)
+    assert cache.invalidate('/foo') == 2
+    assert len(cache) == 1
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
+
+
+def test_cache_eviction(tmp_path):
+    cache = FingerprintCache(str(tmp_path / 'cache.db'), max_entries=2)
+    for idx in range(4):
+        cache.update([(('/foo{}.txt'.format(idx), 1, 1, idx), FILE_INFO)])
+    assert len(cache) == 2
+    assert cache.get(('/foo3.txt', 1, 1, 3), ALGORITHMS) is not None
+    assert cache.get(('/foo0.txt', 1, 1, 0), ALGORITHMS) is None
+
+    cache.max_age = 60
+    cache.connection.execute('UPDATE fingerprints SET updated = ?',
+                             (time.time() - 120,))
+    cache.evict()
+    assert len(cache) == 0
+
+
+def test_manifest_skips_cached_files(tmp_path, monkeypatch):
+    cache = FingerprintCache(str(tmp_path / 'cache.db'))
+    url = 'https://foo.com/multi_file'
+    first = search.gen_remote_file_manifest(MULTI_FILE_DIR, url, cache=cache)
+    assert len(cache) == 4
+    checksums = Mock()
+    monkeypatch.setattr(search, 'compute_checksums', checksums)
+    stat = Mock(side_effect=os.stat)
+    monkeypatch.setattr(os, 'stat', stat)
+    second = search.gen_remote_file_manifest(MULTI_FILE_DIR, url, cache=cache)
+    assert not checksums.called
+    # Each file is only stat'ed once, for its fingerprint
+    stat_files = [c[0][0] for c in stat.call_args_list
+                  if c[0][0] != MULTI_FILE_DIR]
+    assert len(stat_files) == len(set(stat_files)) == 4
+    assert first == second
+    assert all(entry['length'] for entry in second)
+
+
+def test_client_fingerprint_cache_location(mock_cli):
+    cache = mock_cli.get_fingerprint_cache()
+    cfg_dir = os.path.dirname(mock_cli.config_file)
+    assert os.path.dirname(cache.filename) == cfg_dir
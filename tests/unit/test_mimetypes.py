@@ -1,4 +1,5 @@
 import pytest
+from pilot.analysis import mimetypes
 from pilot.analysis.mimetypes import (
     detect_type, detect_parquet, detect_feather, detect_hdf,
     detect_delimiter_separated_values, get_text_or_binary
@@ -59,3 +60,28 @@ def test_text_or_binary():
         else:
             assert get_text_or_binary(filename) == 'application/octet-stream'
         print('{} Success'.format(mimetype))
+
+
+def test_detect_hdf_signature(tmp_path):
+    hdf = tmp_path / 'data'
+    hdf.write_bytes(b'\0' * 512 + mimetypes.HDF5_SIGNATURE + b'\0' * 64)
+    assert detect_hdf(str(hdf)) == 'application/x-hdf'
+    not_hdf = tmp_path / 'not_data'
+    not_hdf.write_bytes(b'\0' * 4096)
+    assert detect_hdf(str(not_hdf)) is None
+
+
+def test_detectors_cap_each_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(mimetypes, 'MAX_SNIFF_BYTES', 64)
+    big_csv = tmp_path / 'big'
+    big_csv.write_text('a,b,c\n' + '1,2,3\n' * 10000)
+    reads = []
+    real_read_head = mimetypes.read_head
+
+    def read_head(*args, **kwargs):
+        data = real_read_head(*args, **kwargs)
+        reads.append(len(data))
+        return data
+    monkeypatch.setattr(mimetypes, 'read_head', read_head)
+    assert detect_delimiter_separated_values(str(big_csv)) == 'text/csv'
+    assert max(reads) <= 64
@@ -17,8 +17,10 @@ import traceback
 import pytest
 import json
 import jsonschema
+from unittest.mock import Mock
 
-from pilot.validation import get_schemas, BASE_SCHEMA_DIR
+from pilot.validation import (get_schemas, validate_json, ValidatorRegistry,
+                              BASE_SCHEMA_DIR)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 SCHEMA_TEST_FOLDER = os.path.join(BASE_DIR, 'tests', 'unit', 'files',
@@ -83,3 +85,28 @@ def test_validate_sample_schemas(schema_name, filename):
     else:
         raise ValueError('Schema test {}:{} must be prefixed with valid or '
                          'invalid'.format(schema_name, filename))
+
+
+@pytest.mark.parametrize("schema_name,filename", schema_test)
+def test_registry_validates_sample_schemas(schema_name, filename):
+    with open(os.path.join(SCHEMA_TEST_FOLDER, schema_name, filename)) as fh:
+        instance = json.load(fh)
+    if filename.startswith('valid'):
+        validate_json(schema_name, instance)
+    else:
+        with pytest.raises(jsonschema.exceptions.ValidationError):
+            validate_json(schema_name, instance)
+
+
+def test_registry_loads_schemas_once(monkeypatch):
+    load = Mock(side_effect=json.load)
+    monkeypatch.setattr(json, 'load', load)
+    registry = ValidatorRegistry()
+    with open(os.path.join(SCHEMA_TEST_FOLDER, 'dataset',
+                           'valid-typical.json')) as fh:
+        instance = json.loads(fh.read())
+    for _ in range(10):
+        registry.validate('dataset', instance)
+    assert load.call_count == len(schemas)
+    assert registry.get_validator('dataset') is registry.get_validator(
+        'dataset')
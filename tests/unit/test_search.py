@@ -1,7 +1,15 @@
 import os
+import json
+import hashlib
 from pilot.search import (update_metadata, scrape_metadata,
                           get_files, prune_files, get_subdir_paths,
-                          carryover_old_file_metadata)
+                          carryover_old_file_metadata, compute_checksums,
+                          gen_remote_file_manifest, iter_files,
+                          iter_subdir_paths, get_gmeta_list,
+                          split_gmeta_list, get_foreign_keys,
+                          suggest_shortname, ShortnameIndex)
+import pytest
+from pilot.exc import PilotClientException
 from tests.unit.mocks import ANALYSIS_FILE_BASE_DIR, MULTI_FILE_DIR
 
 MIXED_FILE = os.path.join(ANALYSIS_FILE_BASE_DIR, 'mixed.tsv')
@@ -142,6 +150,107 @@ def test_get_subdir_paths_on_dir():
         assert remote_path.startswith(folder_name)
 
 
+def test_iter_files_sorted():
+    files = list(iter_files(MULTI_FILE_DIR, sort=True))
+    rel_paths = [os.path.relpath(f, MULTI_FILE_DIR) for f in files]
+    assert rel_paths == ['text_metadata.txt', 'folder/tinyimage.png',
+                         'folder/tsv1.tsv', 'folder/folder2/tsv2.tsv']
+    assert sorted(files) == sorted(get_files(MULTI_FILE_DIR))
+
+
+def test_iter_files_include_exclude():
+    tsvs = list(iter_files(MULTI_FILE_DIR, include=['*.tsv']))
+    assert {os.path.basename(f) for f in tsvs} == {'tsv1.tsv', 'tsv2.tsv'}
+    no_folder2 = list(iter_files(MULTI_FILE_DIR, exclude=['folder/folder2']))
+    assert len(no_folder2) == 3
+    assert not list(iter_files(MIXED_FILE, exclude=['*.tsv']))
+
+
+def test_iter_subdir_paths_matches_get_subdir_paths():
+    assert (sorted(iter_subdir_paths(MULTI_FILE_DIR)) ==
+            sorted(get_subdir_paths(MULTI_FILE_DIR)))
+
+
 def test_get_subdir_paths_on_file():
     for local_path, remote_path in get_subdir_paths(MIXED_FILE):
         assert os.path.basename(local_path) == remote_path
+
+
+def test_compute_checksums():
+    with open(MIXED_FILE, 'rb') as fh:
+        content = fh.read()
+    expected = {'sha256': hashlib.sha256(content).hexdigest(),
+                'md5': hashlib.md5(content).hexdigest()}
+    assert compute_checksums(MIXED_FILE, ['sha256', 'md5']) == expected
+    # Small buffers should need several reads but produce the same digests
+    assert compute_checksums(MIXED_FILE, ['sha256', 'md5'],
+                             block_size=7) == expected
+
+
+def test_gen_remote_file_manifest_with_workers():
+    url = 'https://foo.com/multi_file'
+    serial = gen_remote_file_manifest(MULTI_FILE_DIR, url)
+    parallel = gen_remote_file_manifest(MULTI_FILE_DIR, url, workers=2)
+    assert len(serial) == 4
+    assert serial == parallel
+
+
+def test_split_gmeta_list():
+    entries = [{'subject': 'foo{}'.format(i), 'content': {'data': 'x' * 50}}
+               for i in range(10)]
+    gmeta = get_gmeta_list(entries, validate=False)
+    full_size = len(json.dumps(gmeta))
+
+    assert list(split_gmeta_list(gmeta)) == [gmeta]
+    batches = list(split_gmeta_list(gmeta, max_entries=3))
+    assert [len(b['ingest_data']['gmeta']) for b in batches] == [3, 3, 3, 1]
+
+    batches = list(split_gmeta_list(gmeta, max_bytes=full_size // 3))
+    assert len(batches) > 3
+    assert all(len(json.dumps(b)) <= full_size // 3 for b in batches)
+    subjects = [e['subject'] for b in batches
+                for e in b['ingest_data']['gmeta']]
+    assert subjects == [e['subject'] for e in entries]
+    assert all(b['ingest_type'] == 'GMetaList' for b in batches)
+
+    # Entries too large for any batch are sent alone
+    batches = list(split_gmeta_list(gmeta, max_bytes=10))
+    assert len(batches) == 10
+
+
+def test_shortname_index_suggestions():
+    existing = ['dir{}/data_{}.csv'.format(i % 10, i) for i in range(1000)]
+    index = ShortnameIndex(existing)
+    assert len(index) == 1000
+    assert 'dir3/data_3.csv' in index
+    assert 'dir3/data_4.csv' not in index
+    assert index.suggest('dir3/data_993.cvs') == 'dir3/data_993.csv'
+    assert suggest_shortname(existing, 'data_993.csv') == \
+        suggest_shortname(index, 'data_993.csv')
+    assert suggest_shortname([], 'data_993.csv') == ''
+
+
+def test_get_foreign_keys():
+    files = [{'field_metadata': {'field_definitions': [
+        {'name': 'id'}, {'name': 'station'}, {'name': 'site'}]}},
+        {'field_metadata': {}}]
+    foreign_keys = {
+        'station': {'reference': {'resource': 'stations.csv'}},
+        'site': {'reference': {'resource': 'sites/sites.csv'}},
+        'unused': {'reference': {'resource': 'does_not_exist.csv'}},
+    }
+    existing = ShortnameIndex(['stations.csv', 'sites/sites.csv'])
+    new_files = get_foreign_keys(files, foreign_keys, existing)
+    fdefs = new_files[0]['field_metadata']['field_definitions']
+    assert 'reference' not in fdefs[0]
+    assert fdefs[1]['reference'] == {'resource': 'stations.csv'}
+    assert fdefs[2]['reference'] == {'resource': 'sites/sites.csv'}
+    assert 'reference' not in files[0]['field_metadata'][
+        'field_definitions'][1]
+
+    # Every unresolved reference is reported at once
+    with pytest.raises(PilotClientException) as err:
+        get_foreign_keys(files, foreign_keys, ['station.csv', 'site.csv'])
+    assert 'stations.csv did not resolve. Did you mean station.csv?' in \
+        str(err.value)
+    assert 'sites/sites.csv did not resolve' in str(err.value)
@@ -1,5 +1,7 @@
 import os
-from pilot.search_discovery import get_sub_in_collection, is_top_level
+from pilot.search_discovery import (
+    get_sub_in_collection, is_top_level, SubjectIndex
+)
 from tests.unit.mocks import CLIENT_FILE_BASE_DIR
 
 MULTI_FILE_METADATA = os.path.join(CLIENT_FILE_BASE_DIR,
@@ -96,3 +98,30 @@ def test_is_top_level(mock_multi_file_result):
     assert is_top_level(entry,
                         '/foo_folder/multi_file/folder/folder2') is False
     assert is_top_level(entry, '/foo_folder/multi_file/does_not_exst') is False
+
+
+def test_subject_index(mock_multi_file_result, mock_cli):
+    gmeta = mock_multi_file_result['gmeta']
+    single = mock_cli.get_subject_url('single.txt')
+    gmeta.append({'subject': single, 'content': [
+        {'files': [{'url': mock_cli.get_globus_http_url('single.txt')}]}]})
+    index = SubjectIndex(gmeta)
+    mf_sub = gmeta[0]['subject']
+    mf_tsv = os.path.join(mf_sub, 'folder/folder2/tsv2.tsv')
+    no_exist = os.path.join(mf_sub, 'does_not_exist.csv')
+    assert len(index) == 2
+    assert index.get_owner(mf_tsv) == gmeta[0]
+    assert index.get_owner(mf_sub + '/') == gmeta[0]
+    assert index.get_owner(mock_cli.get_subject_url('single')) is None
+    assert [f['url'] for f in index.get_files(os.path.dirname(mf_tsv))] == [
+        mock_cli.get_globus_http_url('multi_file/folder/folder2/tsv2.tsv')]
+    assert index.get_files(single) == gmeta[1]['content'][0]['files']
+
+    subjects = [mf_sub, mf_tsv, no_exist, single,
+                mock_cli.get_subject_url('missing.txt')]
+    owners = index.get_owners(subjects)
+    assert owners == {s: index.get_owner(s) for s in subjects}
+    precise = index.get_subs(subjects, precise=True)
+    assert precise == {s: get_sub_in_collection(s, gmeta) for s in subjects}
+    assert precise[no_exist] is None
+    assert index.get_subs(subjects, precise=False)[no_exist] == gmeta[0]
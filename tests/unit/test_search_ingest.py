@@ -0,0 +1,119 @@
+import pytest
+import threading
+from unittest.mock import Mock
+
+from pilot import exc
+from pilot.search_ingest import IngestPipeline
+
+
+class MockSearch:
+    """Search client where each task is PENDING for `polls` checks"""
+
+    def __init__(self, polls=2, failed=()):
+        self.polls = polls
+        self.failed = failed
+        self.tasks = {}
+        self.lock = threading.Lock()
+        self.in_flight = self.max_in_flight = 0
+        self.get_task = Mock(side_effect=self._get_task)
+        self.get_task_list = Mock(side_effect=self._get_task_list)
+
+    def ingest(self, index, gmeta):
+        with self.lock:
+            task_id = 'task-{}'.format(len(self.tasks))
+            self.tasks[task_id] = {'gmeta': gmeta, 'checks': 0}
+            self.in_flight += 1
+            self.max_in_flight = max(self.in_flight, self.max_in_flight)
+        return {'task_id': task_id}
+
+    def _state(self, task_id):
+        with self.lock:
+            task = self.tasks[task_id]
+            task['checks'] += 1
+            if task['checks'] <= self.polls:
+                return {'task_id': task_id, 'state': 'PENDING'}
+            if task['checks'] == self.polls + 1:
+                self.in_flight -= 1
+            if task['gmeta'] in self.failed:
+                return {'task_id': task_id, 'state': 'FAILED',
+                        'message': 'bad document'}
+            return {'task_id': task_id, 'state': 'SUCCESS'}
+
+    def _get_task(self, task_id):
+        return self._state(task_id)
+
+    def _get_task_list(self, index):
+        return {'tasks': [self._state(t) for t in list(self.tasks)]}
+
+
+def test_ingest_pipeline_many_tasks():
+    sc = MockSearch()
+    with IngestPipeline(sc, 'my-index', max_in_flight=3,
+                        poll_interval=.001) as pipeline:
+        futures = [pipeline.submit(n) for n in range(10)]
+    assert all(f.result()['state'] == 'SUCCESS' for f in futures)
+    assert 1 < sc.max_in_flight <= 3
+    assert sc.get_task_list.called
+    report = pipeline.get_report()
+    assert [r['batch'] for r in report] == list(range(10))
+    assert {r['state'] for r in report} == {'SUCCESS'}
+
+
+def test_ingest_pipeline_reports_failures():
+    sc = MockSearch(polls=0, failed=[1])
+    with IngestPipeline(sc, 'my-index', poll_interval=.001) as pipeline:
+        futures = [pipeline.submit(n) for n in range(3)]
+    with pytest.raises(exc.PilotClientException):
+        futures[1].result()
+    states = [r['state'] for r in pipeline.get_report()]
+    assert states == ['SUCCESS', 'FAILED', 'SUCCESS']
+    assert 'bad document' in pipeline.get_report()[1]['error']
+
+
+def test_ingest_pipeline_falls_back_to_get_task(mock_globus_exception):
+    sc = MockSearch(polls=1)
+    sc.get_task_list.side_effect = mock_globus_exception
+    with IngestPipeline(sc, 'my-index', poll_interval=.001) as pipeline:
+        for n in range(4):
+            pipeline.submit(n)
+    assert {r['state'] for r in pipeline.get_report()} == {'SUCCESS'}
+    assert sc.get_task.call_count >= 4
+
+
+def test_ingest_pipeline_submit_error():
+    sc = Mock()
+    sc.ingest.side_effect = ValueError('no connection')
+    with IngestPipeline(sc, 'my-index') as pipeline:
+        future = pipeline.submit({})
+    with pytest.raises(ValueError):
+        future.result()
+    assert pipeline.get_report()[0]['task_id'] is None
+    with pytest.raises(RuntimeError):
+        pipeline.submit({})
+
+
+def test_ingest_pipeline_retries_poll_errors():
+    sc = MockSearch(polls=0)
+    errors = [ConnectionError('blip')] * 2
+
+    def flaky_get_task(task_id):
+        if errors:
+            raise errors.pop()
+        return sc._get_task(task_id)
+    sc.get_task.side_effect = flaky_get_task
+    with IngestPipeline(sc, 'my-index', poll_interval=.001,
+                        max_poll_errors=3) as pipeline:
+        future = pipeline.submit({})
+    assert future.result()['state'] == 'SUCCESS'
+    assert sc.get_task.call_count == 3
+
+
+def test_ingest_pipeline_gives_up_after_poll_errors():
+    sc = MockSearch(polls=0)
+    sc.get_task.side_effect = ConnectionError('search is down')
+    with IngestPipeline(sc, 'my-index', poll_interval=.001,
+                        max_poll_errors=3) as pipeline:
+        future = pipeline.submit({})
+    with pytest.raises(ConnectionError):
+        future.result()
+    assert sc.get_task.call_count == 3
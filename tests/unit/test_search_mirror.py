@@ -0,0 +1,146 @@
+from unittest.mock import Mock
+from click.testing import CliRunner
+from pilot.search_mirror import SearchMirror
+from pilot.commands.search.search_commands import list_command, describe
+from pilot.commands.search.mirror_commands import mirror_command
+
+
+def get_entry(name, date='2020-01-01T00:00:00Z', files=None):
+    subject = 'globus://foo-project-endpoint/foo_folder/{}'.format(name)
+    files = files or [{'url': subject, 'length': 10, 'mime_type': 'text/csv'}]
+    return {'subject': subject, 'content': [{
+        'dc': {'dates': [{'date': date, 'dateType': 'Created'}],
+               'version': '1', 'titles': [{'title': name}]},
+        'files': files,
+    }]}
+
+
+def mock_remote_search(entries):
+    """Answer pc.search() from a list of entries, supporting date range
+    filters, limit and offset"""
+    def search(project=None, index=None, custom_params=None):
+        params = custom_params or {}
+        matches = list(entries)
+        filters = params.get('filters')
+        for sfilter in (filters if isinstance(filters, list) else []):
+            if sfilter['type'] == 'range':
+                since = sfilter['values'][0]['from']
+                matches = [e for e in matches if
+                           e['content'][0]['dc']['dates'][0]['date'] >= since]
+        offset = params.get('offset', 0)
+        page = matches[offset:offset + params.get('limit', 100)]
+        return {'gmeta': page, 'total': len(matches)}
+    return Mock(side_effect=search)
+
+
+def test_mirror_update_and_query(tmp_path):
+    mirror = SearchMirror(str(tmp_path / 'records.db'))
+    entries = [get_entry('a.csv'), get_entry('dir/b.csv'),
+               get_entry('dir/c.csv', date='2020-02-01T00:00:00Z')]
+    assert mirror.update('foo-project', entries) == 3
+    assert mirror.count('foo-project') == 3
+    assert mirror.count('bar-project') == 0
+    assert mirror.get(entries[0]['subject']) == entries[0]
+    assert mirror.get('globus://foo-project-endpoint/missing') is None
+    listed = list(mirror.iter_entries('foo-project', '/foo_folder/dir'))
+    assert [e['subject'] for e in listed] == [e['subject']
+                                              for e in entries[1:]]
+    assert mirror.get_newest_modified('foo-project') == '2020-02-01T00:00:00Z'
+    row = mirror.connection.execute(
+        'SELECT path, version, size, mime_types FROM records '
+        'WHERE subject = ?', (entries[0]['subject'],)).fetchone()
+    assert row == ('/foo_folder/a.csv', '1', 10, '["text/csv"]')
+
+
+def test_mirror_get_parent_and_prune(tmp_path):
+    mirror = SearchMirror(str(tmp_path / 'records.db'))
+    collection = get_entry('dir')
+    mirror.update('foo-project', [collection], synced=1)
+    mirror.update('foo-project', [get_entry('a.csv')], synced=2)
+    child = collection['subject'] + '/nested/foo.txt'
+    assert mirror.get_parent(child) == collection
+    assert mirror.get_parent(get_entry('a.csv')['subject']) is None
+    assert mirror.prune('foo-project', 2) == 1
+    assert mirror.get(collection['subject']) is None
+    mirror.clear()
+    assert mirror.count('foo-project') == 0
+
+
+def test_sync_search_mirror(mock_cli, tmp_path, monkeypatch):
+    monkeypatch.setattr(mock_cli, 'config_file', str(tmp_path / 'pilot.cfg'))
+    entries = [get_entry('a.csv'),
+               get_entry('b.csv', date='2020-02-01T00:00:00Z')]
+    mock_cli.search = mock_remote_search(entries)
+    summary = mock_cli.sync_search_mirror()
+    assert summary == {'project': 'foo-project', 'updated': 2, 'removed': 0,
+                       'full': True, 'total': 2}
+
+    # Only records modified since the newest one in the mirror are fetched,
+    # nothing else is done if they all match the mirror
+    summary = mock_cli.sync_search_mirror()
+    assert summary == {'project': 'foo-project', 'updated': 0, 'removed': 0,
+                       'full': False, 'total': 2}
+    filters = mock_cli.search.call_args_list[-2][1]['custom_params']
+    assert filters['filters'][1]['values'][0]['from'] == \
+        '2020-02-01T00:00:00Z'
+
+    # Deleted records are noticed by count and removed by a full sync
+    entries.pop(0)
+    summary = mock_cli.sync_search_mirror()
+    assert summary['full'] is True
+    assert summary['removed'] == 1
+    subjects = [e['subject'] for e in mock_cli.list_entries(cached=True)]
+    assert subjects == [e['subject'] for e in entries]
+
+
+def test_sync_search_mirror_deleted_and_added(mock_cli, tmp_path,
+                                              monkeypatch):
+    monkeypatch.setattr(mock_cli, 'config_file', str(tmp_path / 'pilot.cfg'))
+    entries = [get_entry('a.csv'),
+               get_entry('b.csv', date='2020-02-01T00:00:00Z')]
+    mock_cli.search = mock_remote_search(entries)
+    mock_cli.sync_search_mirror()
+    # The record count in search stays the same
+    entries[0] = get_entry('c.csv', date='2020-03-01T00:00:00Z')
+    summary = mock_cli.sync_search_mirror()
+    assert summary == {'project': 'foo-project', 'updated': 2, 'removed': 1,
+                       'full': True, 'total': 2}
+    subjects = [e['subject'] for e in mock_cli.list_entries(cached=True)]
+    assert subjects == sorted(e['subject'] for e in entries)
+
+
+def test_cached_search_entry(mock_cli, tmp_path, monkeypatch):
+    monkeypatch.setattr(mock_cli, 'config_file', str(tmp_path / 'pilot.cfg'))
+    mfe = get_entry('dir', files=[
+        {'url': 'globus://foo-project-endpoint/foo_folder/dir/foo.txt'}])
+    mock_cli.search = mock_remote_search([mfe])
+    del mock_cli.get_full_search_entry
+    sub = mfe['subject'] + '/foo.txt'
+    entry = mock_cli.get_full_search_entry(sub, path_is_sub=True,
+                                           cached=True)
+    assert entry == mfe
+    missing = mfe['subject'] + '/bar.txt'
+    assert mock_cli.get_full_search_entry(missing, path_is_sub=True,
+                                          cached=True) is None
+    # Synced once, the second lookup reads only from the mirror
+    assert mock_cli.search.call_count == 1
+
+
+def test_cached_commands(mock_cli, tmp_path, monkeypatch):
+    monkeypatch.setattr(mock_cli, 'config_file', str(tmp_path / 'pilot.cfg'))
+    mock_cli.search = mock_remote_search([get_entry('a.csv')])
+    mock_cli.ls.return_value = {}
+    runner = CliRunner()
+    result = runner.invoke(mirror_command, [])
+    assert result.exit_code == 0
+    assert 'full' in result.output
+    result = runner.invoke(list_command, ['--cached'])
+    assert result.exit_code == 0
+    assert 'a.csv' in result.output
+    del mock_cli.get_full_search_entry
+    result = runner.invoke(describe, ['a.csv', '--cached'])
+    assert result.exit_code == 0
+    assert 'Unable to find entry' not in result.output
+    result = runner.invoke(mirror_command, ['--clear'])
+    assert result.exit_code == 0
+    assert mock_cli.get_search_mirror().count('foo-project') == 0
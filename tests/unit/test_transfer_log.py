@@ -1,17 +1,19 @@
+import concurrent.futures
+import datetime
 from tests.unit.mocks import GlobusTransferTaskResponse
 from pilot.transfer_log import TransferLog
 
 
-def test_add_transfer_log(mock_config):
-    tl = TransferLog(mock_config)
-    cfg = tl.config.load()
-    assert cfg['transfer_log'] == {}
+def test_add_transfer_log(mock_config, tmp_path):
+    filename = str(tmp_path / 'transfers.db')
+    tl = TransferLog(mock_config, filename=filename)
     assert tl.get_log() == []
     gccr = GlobusTransferTaskResponse()
     tl.add_log(gccr, 'foo/bar')
-    assert cfg['transfer_log'] != {}
-    assert list(cfg['transfer_log'].keys()) == ['0']
-    assert cfg['transfer_log']['0'] is not None
+    assert 'transfer_log' not in tl.config.load()
+    tl.close()
+    tlog = TransferLog(mock_config, filename=filename).get_log()
+    assert [t['task_id'] for t in tlog] == [gccr.data['task_id']]
 
 
 def test_get_transfer_log(mock_config):
@@ -33,3 +35,69 @@ def test_update_transfer_log(mock_config):
     tl.update_log(gccr.data['task_id'], 'complete')
     tlog = tl.get_log_by_task(gccr.data['task_id'])
     assert tlog['status'] == 'complete'
+
+
+def test_add_transfer_logs_for_parts(mock_config):
+    tl = TransferLog(mock_config)
+    tl.add_log(GlobusTransferTaskResponse(), 'foo/bar')
+    parts = [GlobusTransferTaskResponse() for _ in range(3)]
+    tl.add_logs(parts, 'foo/baz')
+    tlog = tl.get_log()
+    assert [t['dataframe'] for t in tlog] == [
+        'foo/baz (3/3)', 'foo/baz (2/3)', 'foo/baz (1/3)', 'foo/bar']
+    assert [t['task_id'] for t in tlog[:3]] == [
+        p.data['task_id'] for p in reversed(parts)]
+
+
+def test_update_transfer_logs(mock_config):
+    tl = TransferLog(mock_config)
+    results = [GlobusTransferTaskResponse() for _ in range(3)]
+    tl.add_logs(results, 'foo/bar')
+    task_ids = [r.data['task_id'] for r in results]
+    statuses = {task_ids[0]: 'SUCCEEDED', task_ids[1]: 'Accepted',
+                'missing': 'FAILED'}
+    assert tl.update_logs(statuses) == 1
+    assert tl.get_log_by_task(task_ids[0])['status'] == 'SUCCEEDED'
+    assert tl.get_log_by_task(task_ids[2])['status'] == 'Accepted'
+
+
+def test_migrate_config_transfer_logs(mock_config):
+    cfg = mock_config.load()
+    cfg['transfer_log'] = {'0': 'foo/bar,SUCCEEDED,task0,1577836800',
+                           '1': 'foo/baz,ACTIVE,task1,1577836900'}
+    mock_config.save(cfg)
+    tl = TransferLog(mock_config)
+    tlog = tl.get_log()
+    assert [(t['id'], t['task_id']) for t in tlog] == [(1, 'task1'),
+                                                       (0, 'task0')]
+    assert tlog[1]['start_time'] == datetime.datetime.fromtimestamp(
+        1577836800)
+    assert 'transfer_log' not in mock_config.load()
+    tl.add_log(GlobusTransferTaskResponse(), 'foo/new')
+    assert tl.get_log(limit=1)[0]['id'] == 2
+    assert [t['task_id'] for t in tl.get_log(status='ACTIVE')] == ['task1']
+
+
+def test_transfer_log_eviction(mock_config):
+    tl = TransferLog(mock_config, max_entries=2)
+    results = [GlobusTransferTaskResponse() for _ in range(4)]
+    tl.add_logs(results, 'foo/bar')
+    task_ids = [r.data['task_id'] for r in results]
+    tl.update_logs({tid: 'SUCCEEDED' for tid in task_ids[:3]})
+    tl.compact()
+    # Only finished tasks are dropped, oldest first
+    assert [t['task_id'] for t in tl.get_log()] == [task_ids[3], task_ids[2],
+                                                    task_ids[1]]
+    tl.max_age = -1
+    tl.compact()
+    assert [t['task_id'] for t in tl.get_log()] == [task_ids[3]]
+
+
+def test_transfer_log_used_across_threads(mock_config, tmp_path):
+    tl = TransferLog(mock_config, filename=str(tmp_path / 'transfers.db'))
+    assert tl.get_log() == []
+    # Overlapping uploads log tasks from a worker thread
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        results = [GlobusTransferTaskResponse() for _ in range(8)]
+        list(pool.map(lambda r: tl.add_log(r, 'foo/bar'), results))
+    assert len(tl.get_log()) == 8